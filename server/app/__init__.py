@@ -80,6 +80,25 @@ except Exception as e:
     print(f"Error al conectar a MongoDB Atlas: {e}")
     raise
 
+def init_database():
+    """
+    Crea los índices de las consultas frecuentes (idempotente) y, con
+    MONGO_INDEX_AUDIT activo, audita sus planes. Se ejecuta al arrancar el
+    servidor (run.py) o con `flask --app app ensure-indexes`, nunca al importar
+    la aplicación, para que scripts y pruebas no escriban en MongoDB.
+    """
+    from app.services.db_indexes import ensure_indexes, audit_query_plans
+    results = ensure_indexes(app.config['MONGO_DB'])
+    if os.environ.get('MONGO_INDEX_AUDIT', '').lower() in ('1', 'true', 'yes'):
+        audit_query_plans(app.config['MONGO_DB'])
+    return results
+
+@app.cli.command('ensure-indexes')
+def ensure_indexes_command():
+    """Crea los índices de MongoDB de la aplicación"""
+    for collection, indexes in init_database().items():
+        print(f"{collection}: {', '.join(indexes)}")
+
 # Importación y registro de blueprints
 from app.routes.auth import auth_bp
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -1,27 +1,50 @@
 import os
+import asyncio
 import discord
-from discord.ext import commands
 import logging
 from discord import ButtonStyle, Interaction
 from discord.ui import Button, View
 from app import app  # Importar la instancia de Flask
+from app.discord.gateway import gateway
+from app.discord.dispatcher import OutboundDispatcher
+from app.services.button_ids import encode_button_id, decode_button_id
+from app.services.metrics import histogram, timed
+from concurrent.futures import ThreadPoolExecutor
+import time
 
 # Configurar logger
 logger = logging.getLogger(__name__)
 
-# Token del bot de Discord
-DISCORD_TOKEN = os.environ.get('DISCORD_BOT_TOKEN')
+# Cliente de Discord compartido con DiscordService a través del gateway
+bot = gateway.bot
 
-# Cliente de Discord
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix="!", intents=intents)
-bot.remove_command('help')  # Quitar comando de ayuda por defecto
+# Envíos salientes encolados por canal en el bucle del gateway
+dispatcher = OutboundDispatcher(gateway)
 
 # Variable para rastrear si el bot está inicializado
 bot_initialized = False
 
-# Diccionario para almacenar información sobre interacciones de botones
-button_callbacks = {}
+# Hilos para las actualizaciones de Trello de los botones: nunca se ejecutan en el bucle del gateway
+confirmation_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('CONFIRMATION_WORKERS', 4)),
+    thread_name_prefix='trello-confirmation'
+)
+
+def _button_signing_secret():
+    """
+    Clave con la que se firman los custom_id de los botones: BUTTON_SIGNING_SECRET
+    o, si no está, la SECRET_KEY configurada. Fuera del modo debug no se acepta
+    la clave de desarrollo por defecto, porque cualquiera podría firmar botones.
+    """
+    secret = os.environ.get('BUTTON_SIGNING_SECRET') or os.environ.get('SECRET_KEY')
+    if secret:
+        return secret
+    if os.environ.get('DEBUG', 'True').lower() not in ('true', '1', 't'):
+        raise RuntimeError("Configura BUTTON_SIGNING_SECRET (o SECRET_KEY) para firmar los botones de Discord")
+    logger.warning("BUTTON_SIGNING_SECRET no está configurada; los botones se firman con la clave de desarrollo")
+    return app.config['SECRET_KEY']
+
+BUTTON_SIGNING_SECRET = _button_signing_secret()
 
 def init_discord_bot():
     """
@@ -32,25 +55,15 @@ def init_discord_bot():
     if bot_initialized:
         return True
     
-    if not DISCORD_TOKEN:
-        logger.error("Token de Discord no configurado")
-        return False
-    
     try:
-        # Iniciar el bot en un hilo separado
-        import threading
-        
-        def run_bot():
-            bot.run(DISCORD_TOKEN)
-        
-        bot_thread = threading.Thread(target=run_bot)
-        bot_thread.daemon = True
-        bot_thread.start()
+        # Iniciar la conexión compartida al gateway
+        if not gateway.start():
+            return False
         
         # Consideramos el bot como inicializado
         bot_initialized = True
         
-        @bot.event
+        @bot.listen('on_ready')
         async def on_ready():
             """Evento que se ejecuta cuando el bot está listo"""
             logger.info(f"Bot conectado como {bot.user.name}")
@@ -64,9 +77,10 @@ def init_discord_bot():
                 custom_id = interaction.data.get("custom_id", "")
                 logger.info(f"[Discord] Botón presionado. custom_id={custom_id}, usuario={interaction.user.id}")
                 
-                # Verificar si tenemos un callback registrado para este botón
-                if custom_id in button_callbacks:
-                    callback_data = button_callbacks[custom_id]
+                # Decodificar los datos firmados del botón
+                loop = asyncio.get_running_loop()
+                callback_data = decode_button_id(custom_id, BUTTON_SIGNING_SECRET)
+                if callback_data:
                     logger.info(f"[Discord] Callback encontrado para custom_id={custom_id}: {callback_data}")
                     
                     # Extraer la información necesaria
@@ -81,12 +95,13 @@ def init_discord_bot():
                         ephemeral=True
                     )
                     
-                    # Importar la función para actualizar Trello
-                    from app.routes.integration import update_trello_card_with_confirmation
-                    
                     try:
-                        with app.app_context():
-                            result = update_trello_card_with_confirmation(trello_card_id, user_id, action)
+                        # Ejecutar las llamadas bloqueantes a Trello fuera del bucle del gateway
+                        result = await loop.run_in_executor(
+                            confirmation_executor,
+                            _run_trello_confirmation,
+                            trello_card_id, user_id, action, time.perf_counter()
+                        )
                         logger.info(f"[Discord] Resultado de update_trello_card_with_confirmation: {result}")
                     except Exception as e:
                         logger.error(f"[Discord] Excepción al llamar a update_trello_card_with_confirmation: {e}")
@@ -107,9 +122,6 @@ def init_discord_bot():
                             
                             # Nos aseguramos de que el separador siga presente debajo del mensaje
                             # No necesitamos enviar un nuevo separador porque ya existe uno después de cada mensaje con botón
-                            
-                            # Eliminar el callback ya que ha sido utilizado
-                            del button_callbacks[custom_id]
                         except Exception as e:
                             logger.error(f"[Discord] Error al actualizar el mensaje original: {e}")
                     else:
@@ -125,6 +137,19 @@ def init_discord_bot():
         logger.error(f"Error al inicializar el bot de Discord: {e}")
         return False
 
+def _run_trello_confirmation(trello_card_id, user_id, action, queued_at):
+    """
+    Actualiza Trello tras una confirmación. Se ejecuta en confirmation_executor
+    y registra la espera en cola y la duración de la actualización.
+    """
+    # Importar la función para actualizar Trello
+    from app.routes.integration import update_trello_card_with_confirmation
+    
+    histogram('discord.confirmation.queue_wait').observe(time.perf_counter() - queued_at)
+    with timed('discord.confirmation.trello_update'):
+        with app.app_context():
+            return update_trello_card_with_confirmation(trello_card_id, user_id, action)
+
 async def _create_discord_channel_async(channel_name, guild_id):
     """
     Crea un nuevo canal de texto en Discord (versión asíncrona)
@@ -135,14 +160,15 @@ async def _create_discord_channel_async(channel_name, guild_id):
         if not init_discord_bot():
             logger.error("No se pudo inicializar el bot de Discord")
             return None
-    import asyncio
-    count = 0
+    # Esperar a que el gateway haya cargado la caché de servidores
+    if not await gateway.wait_until_ready_async():
+        logger.error("El gateway de Discord no está listo")
+        return None
     guild = None
-    while not guild and count < 30:
-        guild = bot.get_guild(int(guild_id))
-        if not guild:
-            await asyncio.sleep(1)
-            count += 1
+    try:
+        guild = await gateway.resolve_guild(guild_id)
+    except discord.HTTPException as e:
+        logger.error(f"Error al obtener el servidor de Discord {guild_id}: {e}")
     if not guild:
         logger.error(f"No se pudo obtener el servidor de Discord con ID {guild_id}")
         return None
@@ -168,14 +194,10 @@ def create_discord_channel(channel_name, guild_id):
             logger.error("No se pudo inicializar el bot de Discord")
             return None
     
-    # Planificar la creación del canal en el bucle de eventos de asyncio del bot
-    import asyncio
-    future = asyncio.run_coroutine_threadsafe(_create_discord_channel_async(channel_name, guild_id), bot.loop)
-    
     try:
-        # Esperar el resultado con un timeout
-        return future.result(timeout=30)  # 30 segundos de timeout
-    except asyncio.TimeoutError:
+        # Ejecutar la creación del canal en el bucle del gateway con un timeout
+        return gateway.run_sync(_create_discord_channel_async(channel_name, guild_id), timeout=30)
+    except TimeoutError:
         logger.error("Timeout al crear canal en Discord")
         return None
     except Exception as e:
@@ -192,8 +214,11 @@ async def _send_message_async(channel_id, message):
             return False
     
     try:
-        # Obtener el canal
-        channel = bot.get_channel(int(channel_id))
+        # Obtener el canal (caché del cliente y, si no está, REST)
+        try:
+            channel = await gateway.resolve_channel(channel_id)
+        except discord.NotFound:
+            channel = None
         
         if not channel:
             logger.error(f"No se pudo encontrar el canal con ID: {channel_id}")
@@ -213,6 +238,13 @@ async def _send_message_async(channel_id, message):
         logger.error(f"Error al enviar mensaje a Discord: {e}")
         return False
 
+def queue_message_to_channel(channel_id, message):
+    """
+    Encola un mensaje para un canal de Discord sin bloquear al llamador.
+    Devuelve un Future cuyo resultado es True si el mensaje se envió.
+    """
+    return dispatcher.enqueue(channel_id, lambda: _send_message_async(channel_id, message))
+
 def send_message_to_channel(channel_id, message):
     """
     Función no asíncrona para enviar un mensaje a un canal de Discord
@@ -223,14 +255,10 @@ def send_message_to_channel(channel_id, message):
             logger.error("No se pudo inicializar el bot de Discord")
             return False
     
-    # Planificar el envío del mensaje en el bucle de eventos de asyncio del bot
-    import asyncio
-    future = asyncio.run_coroutine_threadsafe(_send_message_async(channel_id, message), bot.loop)
-    
     try:
-        # Esperar el resultado con un timeout
-        return future.result(timeout=30)  # 30 segundos de timeout
-    except asyncio.TimeoutError:
+        # Encolar el envío y esperar su resultado con un timeout
+        return queue_message_to_channel(channel_id, message).result(timeout=30)
+    except TimeoutError:
         logger.error("Timeout al enviar mensaje a Discord")
         return False
     except Exception as e:
@@ -247,23 +275,18 @@ async def _send_message_with_button_async(channel_id, message, button_label, tre
             return False
     
     try:
-        # Obtener el canal
-        channel = bot.get_channel(int(channel_id))
+        # Obtener el canal (caché del cliente y, si no está, REST)
+        try:
+            channel = await gateway.resolve_channel(channel_id)
+        except discord.NotFound:
+            channel = None
         
         if not channel:
             logger.error(f"No se pudo encontrar el canal con ID: {channel_id}")
             return False
         
-        # Crear un ID único para el botón
-        import uuid
-        button_id = f"confirm_{uuid.uuid4()}"
-        
-        # Registrar el callback para este botón
-        button_callbacks[button_id] = {
-            "trello_card_id": trello_card_id,
-            "user_id": user_id,
-            "action": action
-        }
+        # Codificar los datos del botón en un custom_id firmado: no hace falta guardar estado
+        button_id = encode_button_id(trello_card_id, user_id, action, BUTTON_SIGNING_SECRET)
         
         # Crear el botón
         button = Button(style=ButtonStyle.primary, label=button_label, custom_id=button_id)
@@ -291,6 +314,16 @@ async def _send_message_with_button_async(channel_id, message, button_label, tre
         logger.error(f"Error al enviar mensaje con botón a Discord: {e}")
         return False
 
+def queue_message_with_button(channel_id, message, button_label, trello_card_id, user_id, action="confirm"):
+    """
+    Encola un mensaje con botón para un canal de Discord sin bloquear al llamador.
+    Devuelve un Future cuyo resultado es True si el mensaje se envió.
+    """
+    return dispatcher.enqueue(
+        channel_id,
+        lambda: _send_message_with_button_async(channel_id, message, button_label, trello_card_id, user_id, action)
+    )
+
 def send_message_with_button(channel_id, message, button_label, trello_card_id, user_id, action="confirm"):
     """
     Función no asíncrona para enviar un mensaje con botón a un canal de Discord
@@ -301,17 +334,12 @@ def send_message_with_button(channel_id, message, button_label, trello_card_id,
             logger.error("No se pudo inicializar el bot de Discord")
             return False
     
-    # Planificar el envío del mensaje en el bucle de eventos de asyncio del bot
-    import asyncio
-    future = asyncio.run_coroutine_threadsafe(
-        _send_message_with_button_async(channel_id, message, button_label, trello_card_id, user_id, action),
-        bot.loop
-    )
-    
     try:
-        # Esperar el resultado con un timeout
-        return future.result(timeout=30)  # 30 segundos de timeout
-    except asyncio.TimeoutError:
+        # Encolar el envío y esperar su resultado con un timeout
+        return queue_message_with_button(
+            channel_id, message, button_label, trello_card_id, user_id, action
+        ).result(timeout=30)
+    except TimeoutError:
         logger.error("Timeout al enviar mensaje con botón a Discord")
         return False
     except Exception as e:
@@ -0,0 +1,112 @@
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import threading
+import time
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+# Límite de Discord para mensajes por canal: 5 mensajes cada 5 segundos
+CHANNEL_RATE = 5
+CHANNEL_PERIOD = 5.0
+
+class OutboundDispatcher:
+    """
+    Despachador de envíos salientes a Discord con una cola FIFO por canal.
+
+    Los envíos se encolan desde cualquier hilo sin bloquearlo y se ejecutan
+    en el bucle del gateway. Cada canal tiene su propia tarea consumidora,
+    de modo que los mensajes de un canal salen en orden y a un ritmo que no
+    agota su bucket de rate limit, mientras que canales distintos avanzan en
+    paralelo.
+    """
+    def __init__(self, gateway, rate=CHANNEL_RATE, period=CHANNEL_PERIOD):
+        """
+        Args:
+            gateway: DiscordGateway en cuyo bucle se ejecutan los envíos
+            rate: Número máximo de envíos por canal dentro de `period`
+            period: Ventana en segundos del límite por canal
+        """
+        self.gateway = gateway
+        self.rate = rate
+        self.period = period
+
+        # Estado que solo se toca desde el bucle del gateway
+        self._queues = {}
+        self._sent_at = {}
+
+        self._lock = threading.Lock()
+        self.counters = {'queued': 0, 'sent': 0, 'failed': 0}
+
+    def enqueue(self, channel_id, job):
+        """
+        Encola un envío para un canal sin esperar a que se complete.
+
+        Args:
+            channel_id: ID del canal de Discord de destino
+            job: Función sin argumentos que devuelve la corrutina del envío
+
+        Returns:
+            concurrent.futures.Future con el resultado de la corrutina
+        """
+        handle = concurrent.futures.Future()
+        if not self.gateway.start():
+            handle.set_exception(RuntimeError("El gateway de Discord no está disponible"))
+            return handle
+        with self._lock:
+            self.counters['queued'] += 1
+        self.gateway.loop.call_soon_threadsafe(self._put, str(channel_id), job, handle)
+        return handle
+
+    def _put(self, channel_id, job, handle):
+        queue = self._queues.get(channel_id)
+        if queue is None:
+            queue = self._queues[channel_id] = collections.deque()
+            asyncio.ensure_future(self._drain(channel_id, queue))
+        queue.append((job, handle))
+
+    async def _pace(self, channel_id):
+        """
+        Espera lo necesario para no superar `rate` envíos por `period` en el canal
+        """
+        sent_at = self._sent_at.setdefault(channel_id, collections.deque(maxlen=self.rate))
+        if len(sent_at) == self.rate:
+            wait = sent_at[0] + self.period - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        sent_at.append(time.monotonic())
+
+    async def _drain(self, channel_id, queue):
+        """
+        Consume la cola de un canal hasta vaciarla
+        """
+        await self.gateway.wait_until_ready_async()
+        while queue:
+            job, handle = queue.popleft()
+            if not handle.set_running_or_notify_cancel():
+                continue
+            await self._pace(channel_id)
+            try:
+                result = await job()
+            except Exception as e:
+                logger.error(f"Error en envío a Discord para el canal {channel_id}: {e}")
+                with self._lock:
+                    self.counters['failed'] += 1
+                handle.set_exception(e)
+                continue
+            with self._lock:
+                self.counters['sent' if result is not False else 'failed'] += 1
+            handle.set_result(result)
+        # Cola vacía: liberar el canal; el siguiente envío creará otro consumidor
+        del self._queues[channel_id]
+
+    def stats(self):
+        """
+        Devuelve los contadores de envíos y los mensajes pendientes por canal
+        """
+        with self._lock:
+            counters = dict(self.counters)
+        counters['pending'] = {channel_id: len(queue) for channel_id, queue in list(self._queues.items())}
+        return counters
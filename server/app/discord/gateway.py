@@ -0,0 +1,166 @@
+import os
+import asyncio
+import logging
+import threading
+import discord
+from discord.ext import commands
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+# Tiempo máximo de espera por defecto para operaciones síncronas (segundos)
+DEFAULT_TIMEOUT = 30
+
+class DiscordGateway:
+    """
+    Conexión única al gateway de Discord compartida por toda la aplicación.
+
+    Posee el bot, su bucle de eventos y el hilo que lo ejecuta, y expone una
+    señal de disponibilidad para que el código síncrono (rutas de Flask,
+    polling) y el asíncrono esperen a que la caché del cliente esté cargada.
+    """
+    def __init__(self, token):
+        self.token = token
+
+        # Solo los intents que usa la aplicación: servidores, canales y miembros
+        intents = discord.Intents.default()
+        intents.guilds = True
+        intents.members = True
+
+        self.bot = commands.Bot(command_prefix='!', intents=intents)
+        self.bot.remove_command('help')  # Quitar comando de ayuda por defecto
+        self.bot.add_listener(self._on_ready, 'on_ready')
+
+        self.loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+        # Contadores de búsquedas resueltas desde la caché del cliente o por REST
+        self.lookups = {
+            'guild': {'hits': 0, 'misses': 0},
+            'channel': {'hits': 0, 'misses': 0}
+        }
+
+    async def _on_ready(self):
+        logger.info(f"Gateway de Discord listo como {self.bot.user}")
+        self._ready.set()
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    def start(self):
+        """
+        Inicia la conexión al gateway en un hilo propio si no está iniciada
+        """
+        with self._lock:
+            if self._thread is not None:
+                return True
+            if not self.token:
+                logger.error("Token de Discord no configurado")
+                return False
+
+            self.loop = asyncio.new_event_loop()
+
+            def run_bot():
+                asyncio.set_event_loop(self.loop)
+                try:
+                    self.loop.run_until_complete(self.bot.start(self.token))
+                except Exception as e:
+                    logger.error(f"El gateway de Discord se detuvo: {e}")
+                finally:
+                    self._ready.clear()
+
+            self._thread = threading.Thread(target=run_bot, name='discord-gateway')
+            self._thread.daemon = True
+            self._thread.start()
+            return True
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout=DEFAULT_TIMEOUT):
+        """
+        Bloquea hasta que el gateway esté listo. Devuelve False si vence el tiempo.
+        """
+        if not self.start():
+            return False
+        return self._ready.wait(timeout)
+
+    async def wait_until_ready_async(self, timeout=DEFAULT_TIMEOUT):
+        """
+        Versión asíncrona de wait_until_ready, utilizable desde el bucle del bot
+        """
+        if self._ready.is_set():
+            return True
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._ready.wait, timeout)
+
+    def submit(self, coro):
+        """
+        Planifica una corrutina en el bucle del gateway y devuelve un Future concurrente
+        """
+        if not self.start():
+            coro.close()
+            raise RuntimeError("El gateway de Discord no está disponible")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run_sync(self, coro, timeout=DEFAULT_TIMEOUT, wait_ready=True):
+        """
+        Ejecuta una corrutina en el bucle del gateway desde código síncrono y
+        espera su resultado
+        """
+        if wait_ready and not self.wait_until_ready(timeout):
+            coro.close()
+            raise TimeoutError("El gateway de Discord no está listo")
+        return self.submit(coro).result(timeout=timeout)
+
+    async def resolve_guild(self, guild_id):
+        """
+        Obtiene un servidor desde la caché del cliente y solo recurre a REST
+        (fetch_guild) si no está en ella
+        """
+        guild = self.bot.get_guild(int(guild_id))
+        if guild is not None:
+            self.lookups['guild']['hits'] += 1
+            return guild
+        self.lookups['guild']['misses'] += 1
+        return await self.bot.fetch_guild(int(guild_id))
+
+    async def resolve_channel(self, channel_id):
+        """
+        Obtiene un canal desde la caché del cliente y solo recurre a REST
+        (fetch_channel) si no está en ella
+        """
+        channel = self.bot.get_channel(int(channel_id))
+        if channel is not None:
+            self.lookups['channel']['hits'] += 1
+            return channel
+        self.lookups['channel']['misses'] += 1
+        return await self.bot.fetch_channel(int(channel_id))
+
+    def lookup_stats(self):
+        """
+        Devuelve los aciertos y fallos de caché de las búsquedas de servidores y canales
+        """
+        stats = {}
+        for kind, counters in self.lookups.items():
+            total = counters['hits'] + counters['misses']
+            stats[kind] = {
+                'hits': counters['hits'],
+                'misses': counters['misses'],
+                'hit_ratio': round(counters['hits'] / total, 4) if total else None
+            }
+        stats['ready'] = self.is_ready()
+        return stats
+
+# Instancia compartida
+gateway = DiscordGateway(os.environ.get('DISCORD_BOT_TOKEN'))
+
+def get_gateway():
+    """
+    Obtiene el gateway de Discord compartido, iniciándolo si es necesario
+    """
+    gateway.start()
+    return gateway
@@ -0,0 +1,34 @@
+import hashlib
+import json
+
+# Versión del algoritmo de hash. Se incrementa cada vez que cambia el
+# contenido que se hashea, para que una instantánea con un hash antiguo se
+# vuelva a tomar como base en lugar de notificarse como una actualización.
+#   1: etiquetas y adjuntos como listas ordenadas, con duplicados
+#   2: etiquetas y adjuntos sin duplicados
+HASH_VERSION = 2
+
+def content_hash(card):
+    """
+    Calcula un hash del contenido comparable de una tarjeta de Trello.
+    Dos tarjetas con el mismo hash no tienen cambios que notificar.
+
+    El hash lleva delante la versión del algoritmo (`"2:..."`).
+    """
+    content = [
+        card.get('name', ''),
+        card.get('desc', ''),
+        card.get('idList', ''),
+        card.get('due'),
+        sorted(card.get('idMembers') or []),
+        sorted({label.get('name', '') for label in card.get('labels') or [] if label.get('name')}),
+        sorted({(a.get('id') or '', a.get('name') or '') for a in card.get('attachments') or []})
+    ]
+    encoded = json.dumps(content, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return f"{HASH_VERSION}:{hashlib.sha1(encoded).hexdigest()}"
+
+def is_current_hash(value):
+    """
+    Indica si un hash guardado se calculó con la versión actual del algoritmo
+    """
+    return bool(value) and value.startswith(f"{HASH_VERSION}:")
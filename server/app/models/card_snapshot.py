@@ -0,0 +1,104 @@
+from datetime import datetime
+from bson import ObjectId
+from app.models.card_hash import content_hash
+
+class CardSnapshot:
+    """
+    Modelo para la instantánea de una tarjeta de Trello que usa el polling
+    para detectar cambios. Se guarda en su propia colección (`card_snapshots`)
+    para no interferir con los estados de `card_states`, que pertenecen a la
+    revisión manual de cambios pendientes.
+    """
+    def __init__(self, **kwargs):
+        self._id = kwargs.get('_id', None)
+        self.integration_id = kwargs.get('integration_id', None)
+        self.card_id = kwargs.get('card_id', '')
+        self.name = kwargs.get('name', '')
+        self.id_list = kwargs.get('id_list', '')
+        self.description = kwargs.get('description', '')
+        self.labels = kwargs.get('labels', [])
+        self.due = kwargs.get('due', None)
+        self.members = kwargs.get('members', [])
+        self.attachments = kwargs.get('attachments', [])
+        self.short_url = kwargs.get('short_url', '')
+        self.date_last_activity = kwargs.get('date_last_activity', None)
+        self.content_hash = kwargs.get('content_hash', None)
+        self.updated_at = kwargs.get('updated_at', datetime.utcnow())
+        # Versión de la tarjeta anterior a una actualización que todavía no se
+        # ha notificado, y desde cuándo. Solo los gestiona SnapshotStore, por
+        # eso no forman parte de to_dict().
+        self.pending_update = kwargs.get('pending_update', None)
+        self.pending_since = kwargs.get('pending_since', None)
+
+    def to_dict(self):
+        """
+        Convierte el objeto a un diccionario para almacenar en MongoDB
+        """
+        return {
+            '_id': self._id,
+            'integration_id': self.integration_id,
+            'card_id': self.card_id,
+            'name': self.name,
+            'id_list': self.id_list,
+            'description': self.description,
+            'labels': self.labels,
+            'due': self.due,
+            'members': self.members,
+            'attachments': self.attachments,
+            'short_url': self.short_url,
+            'date_last_activity': self.date_last_activity,
+            'content_hash': self.content_hash,
+            'updated_at': self.updated_at
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Crea una instancia de CardSnapshot a partir de un diccionario
+        """
+        return cls(**data)
+
+    @staticmethod
+    def compute_hash(card):
+        """
+        Calcula el hash del contenido relevante de una tarjeta de Trello
+        """
+        return content_hash(card)
+
+    @classmethod
+    def from_trello_card(cls, integration_id, card):
+        """
+        Crea una instantánea compacta a partir de una tarjeta de la API de Trello
+        """
+        return cls(
+            integration_id=ObjectId(str(integration_id)),
+            card_id=card['id'],
+            name=card.get('name', ''),
+            id_list=card.get('idList', ''),
+            description=card.get('desc', ''),
+            labels=[{'id': label.get('id'), 'name': label.get('name', '')} for label in card.get('labels', [])],
+            due=card.get('due'),
+            members=list(card.get('idMembers', [])),
+            attachments=[{'id': a.get('id'), 'name': a.get('name')} for a in card.get('attachments', [])],
+            short_url=card.get('shortUrl', ''),
+            date_last_activity=card.get('dateLastActivity'),
+            content_hash=cls.compute_hash(card),
+            updated_at=datetime.utcnow()
+        )
+
+    def to_trello_card(self):
+        """
+        Reconstruye la tarjeta con el formato de la API de Trello para comparar cambios
+        """
+        return {
+            'id': self.card_id,
+            'name': self.name,
+            'desc': self.description,
+            'idList': self.id_list,
+            'idMembers': list(self.members or []),
+            'labels': list(self.labels or []),
+            'attachments': list(self.attachments or []),
+            'due': self.due,
+            'shortUrl': self.short_url,
+            'dateLastActivity': self.date_last_activity
+        }
@@ -19,6 +19,8 @@ class Integration:
         self.trello_board_name = kwargs.get('trello_board_name', '')
         self.trello_board_url = kwargs.get('trello_board_url', '')
         self.polling_interval = kwargs.get('polling_interval', 300)  # 5 minutos por defecto
+        self.snapshot_list_ids = kwargs.get('snapshot_list_ids', None)  # Listas vistas en el último polling
+        self.actions_cursor = kwargs.get('actions_cursor', None)  # Fecha de la última acción de Trello aplicada
 
     def to_dict(self):
         """
@@ -36,7 +38,9 @@ class Integration:
             'last_check': self.last_check,
             'trello_board_name': self.trello_board_name,
             'trello_board_url': self.trello_board_url,
-            'polling_interval': self.polling_interval
+            'polling_interval': self.polling_interval,
+            'snapshot_list_ids': self.snapshot_list_ids,
+            'actions_cursor': self.actions_cursor
         }
     
     @classmethod
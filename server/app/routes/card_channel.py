@@ -2,11 +2,13 @@ from flask import Blueprint, request, jsonify, current_app
 from bson.objectid import ObjectId
 from app.models.card_channel_mapping import CardChannelMapping
 from app.routes.integration import token_required, get_trello_service, get_discord_service
-from app.routes.debug import get_discord_user_id, get_trello_member_details
+from app.routes.debug import get_discord_user_ids, get_trello_member_details
+from app.services.mapping_index import notify_mappings_changed
 from datetime import datetime
-from app.discord.bot import send_message_to_channel, create_discord_channel, send_message_with_button
+from app.discord.bot import create_discord_channel, queue_message_to_channel, queue_message_with_button
 from app.routes.auth import token_required
 from app.models.user_mapping import UserMapping
+from app.services.trello_client import trello_http
 
 card_channel_bp = Blueprint('card_channel', __name__)
 
@@ -33,7 +35,6 @@ def get_trello_lists(current_user_id, integration_id):
     """
     try:
         import os
-        import requests
         db = current_app.config['MONGO_DB']
         integration = db.integrations.find_one({
             '_id': ObjectId(integration_id),
@@ -50,7 +51,7 @@ def get_trello_lists(current_user_id, integration_id):
             'token': token,
             'fields': 'id,name,closed'
         }
-        response = requests.get(url, params=params)
+        response = trello_http.get(url, params=params)
         if response.status_code != 200:
             current_app.logger.error(f"Error al obtener listas de Trello: {response.text}")
             return jsonify({'message': f'Error al obtener listas de Trello: {response.text}'}), 500
@@ -100,7 +101,6 @@ def create_list_channel_mapping(current_user_id, integration_id):
     """
     try:
         import os
-        import requests
         data = request.json
         if not data or 'trello_list_id' not in data or 'discord_channel_id' not in data:
             return jsonify({'message': 'Datos incompletos'}), 400
@@ -127,17 +127,19 @@ def create_list_channel_mapping(current_user_id, integration_id):
         trello_board_id = integration['trello_board_id']
         api_key = os.environ.get('TRELLO_API_KEY')
         token = os.environ.get('TRELLO_TOKEN')
-        url = f"https://api.trello.com/1/boards/{trello_board_id}/lists"
-        params = {
-            'key': api_key,
-            'token': token,
-            'fields': 'id,name,closed'
-        }
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            current_app.logger.error(f"Error al obtener listas de Trello: {response.text}")
-            return jsonify({'message': f'Error al obtener listas de Trello: {response.text}'}), 500
-        lists_data = response.json()
+        # Listas del tablero y tarjetas de la lista en una sola llamada a /batch
+        (lists_status, lists_data), (cards_status, cards) = trello_http.batch([
+            trello_http.batch_route(f"boards/{trello_board_id}/lists", fields='id,name,closed'),
+            trello_http.batch_route(
+                f"lists/{data['trello_list_id']}/cards",
+                fields='id,name,desc,idList,idMembers,dateLastActivity,shortUrl,due,labels',
+                attachments='true',
+                attachment_fields='id,name,url,bytes,date'
+            )
+        ], params={'key': api_key, 'token': token})
+        if lists_status != 200:
+            current_app.logger.error(f"Error al obtener listas de Trello: HTTP {lists_status}")
+            return jsonify({'message': f'Error al obtener listas de Trello: HTTP {lists_status}'}), 500
         current_app.logger.info(f"ID de lista recibido: {data['trello_list_id']}")
         current_app.logger.info(f"IDs de listas obtenidas: {[l.get('id') for l in lists_data]}")
         list_obj = next((l for l in lists_data if l.get('id') == data['trello_list_id']), None)
@@ -158,6 +160,7 @@ def create_list_channel_mapping(current_user_id, integration_id):
             created_automatically=False
         )
         mapping_id = db.card_channel_mappings.insert_one(list_channel_mapping.to_dict()).inserted_id
+        notify_mappings_changed(db)
         if not mapping_id or not ObjectId.is_valid(mapping_id):
             current_app.logger.error(f"Error al crear mapeo: ID generado inválido: {mapping_id}")
             return jsonify({'message': 'Error al crear el mapeo: ID generado inválido'}), 500
@@ -176,28 +179,19 @@ def create_list_channel_mapping(current_user_id, integration_id):
         # Obtener y procesar todas las tarjetas existentes en esta lista
         try:
             current_app.logger.info(f"Procesando tarjetas existentes para la lista {data['trello_list_id']}")
-            # Obtener tarjetas de esta lista
-            cards_url = f"https://api.trello.com/1/lists/{data['trello_list_id']}/cards"
-            cards_params = {
-                'key': api_key,
-                'token': token,
-                'fields': 'id,name,desc,idList,idMembers,dateLastActivity,shortUrl,due,labels',
-                'attachments': 'true',
-                'attachment_fields': 'id,name,url,bytes,date',
-            }
-            cards_response = requests.get(cards_url, params=cards_params)
-            if cards_response.status_code == 200:
-                cards = cards_response.json()
+            if cards_status == 200:
                 current_app.logger.info(f"Se encontraron {len(cards)} tarjetas en la lista {data['trello_list_id']}")
                 
-                # Procesar cada tarjeta como si fuera nueva
+                # Procesar cada tarjeta como si fuera nueva; los mensajes se encolan
+                # en el despachador de Discord y se envían en segundo plano
+                pending_messages = []
                 for card in cards:
                     try:
                         # Si la tarjeta tiene asignados, enviar mensaje con botón de confirmación
-                        assigned_discord_users = [get_discord_user_id(mid) for mid in card.get('idMembers', []) if get_discord_user_id(mid)]
+                        assigned_discord_users = get_discord_user_ids(card.get('idMembers', []))
                         if assigned_discord_users:
                             for member_id in card.get('idMembers', []):
-                                discord_user_id = get_discord_user_id(member_id)
+                                discord_user_id = assigned_discord_users.get(member_id)
                                 if discord_user_id:
                                     confirmation_message = (
                                         f"📄 **Tarea:** {card['name']}\n"
@@ -221,14 +215,14 @@ def create_list_channel_mapping(current_user_id, integration_id):
                                     if card.get('shortUrl'):
                                         confirmation_message += f"📌 **Enlace a la tarjeta:** {card.get('shortUrl')}\n"
                                     confirmation_message += "\nPor favor, confirma que vista esta asignación haciendo clic en el botón:"
-                                    send_message_with_button(
+                                    pending_messages.append(queue_message_with_button(
                                         data['discord_channel_id'],
                                         confirmation_message,
                                         "Confirmar asignación",
                                         card['id'],
                                         discord_user_id,
                                         "confirm"
-                                    )
+                                    ))
                         else:
                             # Si no hay asignados, solo enviar mensaje informativo
                             message = f"**Tarjeta existente en Trello**\n"
@@ -250,12 +244,13 @@ def create_list_channel_mapping(current_user_id, integration_id):
                                         message += f"- {adj.get('name', 'Archivo')}\n"
                             if card.get('shortUrl'):
                                 message += f"\n📌 **Enlace a la tarjeta:** {card.get('shortUrl')}\n"
-                            send_message_to_channel(data['discord_channel_id'], message)
+                            pending_messages.append(queue_message_to_channel(data['discord_channel_id'], message))
                     except Exception as e:
                         current_app.logger.error(f"Error al procesar tarjeta {card.get('id')}: {e}")
                         continue
+                current_app.logger.info(f"{len(pending_messages)} mensajes encolados para el canal {data['discord_channel_id']}")
             else:
-                current_app.logger.error(f"Error al obtener tarjetas de la lista: HTTP {cards_response.status_code}")
+                current_app.logger.error(f"Error al obtener tarjetas de la lista: HTTP {cards_status}")
         except Exception as e:
             current_app.logger.error(f"Error al procesar tarjetas existentes: {e}")
             # No retornamos error, continuamos con el proceso principal
@@ -321,6 +316,9 @@ def delete_list_channel_mapping(current_user_id, mapping_id):
             current_app.logger.warning(f"Usuario {current_user_id} no autorizado para eliminar el mapeo {mapping_id}")
             return jsonify({'message': 'No autorizado para eliminar este mapeo'}), 403
         delete_result = db.card_channel_mappings.delete_one({'_id': mapping_object_id})
+        # Solo los mapeos de lista forman parte del índice de mapeos
+        if mapping.get('trello_list_id'):
+            notify_mappings_changed(db)
         if delete_result.deleted_count == 0:
             current_app.logger.error(f"Error al eliminar mapeo: no se eliminó ningún documento con ID {mapping_id}")
             return jsonify({'message': 'No se pudo eliminar el mapeo'}), 500
@@ -1,28 +1,50 @@
 from flask import Blueprint, jsonify, current_app, request
 from app.routes.integration import get_trello_service
-import requests
 import os
-import threading
-import time
 from datetime import datetime, timedelta
 import json
-from app.discord.bot import send_message_to_channel, create_discord_channel, send_message_with_button
+from app.discord.bot import create_discord_channel, queue_message_to_channel, queue_message_with_button, dispatcher
+from app.discord.gateway import gateway
 from app.models.user_mapping import UserMapping
 from app.models.card_channel_mapping import CardChannelMapping
+from app.models.card_snapshot import CardSnapshot
+from app.models.card_hash import is_current_hash
+from app.services import board_cards
+from app.services import card_diff
+from app.services import metrics
+from app.services.trello_client import trello_http
+from app.services.board_cache import board_cache
+from app.services.db_indexes import audit_query_plans
+from app.services.mapping_index import get_mapping_index, notify_mappings_changed
+from app.services.card_diff import diff_cards
 import re
 from app.services.discord_service import DiscordService
 
+from app.services.polling_scheduler import PollingScheduler
+from app.services.snapshot_store import SnapshotStore
+from app.services.update_coalescer import UpdateCoalescer
+
 debug_bp = Blueprint('debug', __name__)
 
-# Variable global para almacenar el estado anterior de las tarjetas
-previous_cards_state = {}
-# Variable para controlar el hilo de polling
-polling_active = False
-# ID del tablero de Trello que estamos monitoreando
+# Número máximo de acciones por consulta; si se alcanza se hace una sincronización completa
+TRELLO_ACTIONS_LIMIT = 1000
+# Antigüedad máxima del cursor de acciones antes de forzar una sincronización completa
+TRELLO_ACTIONS_CURSOR_MAX_AGE_HOURS = int(os.environ.get('TRELLO_ACTIONS_CURSOR_MAX_AGE_HOURS', 24))
+# Acciones de Trello que modifican las listas del tablero
+LIST_ACTION_TYPES = ('createList', 'updateList', 'moveListToBoard', 'moveListFromBoard')
+# Ventana en segundos para agrupar varias actualizaciones de una tarjeta en un solo mensaje
+CARD_UPDATE_COALESCE_SECONDS = int(os.environ.get('CARD_UPDATE_COALESCE_SECONDS', 60))
+# Margen tras la ventana a partir del cual una actualización persistida sin notificar se da por perdida
+PENDING_UPDATE_GRACE_SECONDS = 120
+
+# Último tablero solicitado desde el endpoint de monitoreo (compatibilidad con el cliente)
 monitored_board_id = None
 
-# Estado global para listas y tarjetas
-previous_lists_state = {}
+# Planificador compartido que realiza el polling de todas las integraciones activas
+polling_scheduler = None
+
+# Agrupador compartido de actualizaciones de tarjetas
+update_coalescer = None
 
 def format_date_spanish(date_str):
     """
@@ -57,11 +79,11 @@ def get_trello_cards(board_id):
         query = {
             'key': api_key,
             'token': token,
-            'fields': 'id,name,desc,idList,idMembers,dateLastActivity,shortUrl,due,labels',
+            'fields': 'id,name,desc,idBoard,idList,idMembers,dateLastActivity,shortUrl,due,labels',
             'attachments': 'true',
             'attachment_fields': 'id,name,url,bytes,date',
         }
-        response = requests.get(cards_url, headers=headers, params=query)
+        response = trello_http.get(cards_url, headers=headers, params=query)
         if response.status_code != 200:
             current_app.logger.error(f"Error al obtener tarjetas: HTTP {response.status_code}")
             return None
@@ -70,10 +92,146 @@ def get_trello_cards(board_id):
         current_app.logger.error(f"Error en get_trello_cards: {e}")
         return None
 
-def get_trello_member_details(member_id):
+def get_trello_cards_by_id(card_ids):
     """
-    Obtiene detalles de un miembro específico de Trello
+    Obtiene varias tarjetas de Trello con los mismos campos que get_trello_cards,
+    en llamadas a /batch de hasta 10 tarjetas.
+    Devuelve un diccionario {card_id: tarjeta}, con False para las tarjetas que ya
+    no existen, o None si alguna no se pudo obtener.
+    """
+    card_ids = list(card_ids)
+    if not card_ids:
+        return {}
+    try:
+        api_key = os.environ.get('TRELLO_API_KEY')
+        token = os.environ.get('TRELLO_TOKEN')
+        if not api_key or not token:
+            current_app.logger.error("Credenciales de Trello no configuradas")
+            return None
+        routes = [
+            trello_http.batch_route(
+                f"cards/{card_id}",
+                fields='id,name,desc,idList,idBoard,idMembers,dateLastActivity,shortUrl,due,labels,closed',
+                attachments='true',
+                attachment_fields='id,name,url,bytes,date'
+            )
+            for card_id in card_ids
+        ]
+        results = trello_http.batch(routes, params={'key': api_key, 'token': token})
+        cards = {}
+        for card_id, (status, card) in zip(card_ids, results):
+            if status == 404:
+                cards[card_id] = False
+            elif status != 200 or not card:
+                current_app.logger.error(f"Error al obtener tarjeta {card_id}: HTTP {status}")
+                return None
+            else:
+                cards[card_id] = card
+        return cards
+    except Exception as e:
+        current_app.logger.error(f"Error en get_trello_cards_by_id: {e}")
+        return None
+
+def get_trello_board_actions(board_id, since, limit=TRELLO_ACTIONS_LIMIT):
+    """
+    Obtiene las acciones de un tablero posteriores al cursor indicado (más recientes primero).
     """
+    try:
+        api_key = os.environ.get('TRELLO_API_KEY')
+        token = os.environ.get('TRELLO_TOKEN')
+        if not api_key or not token:
+            current_app.logger.error("Credenciales de Trello no configuradas")
+            return None
+        actions_url = f"https://api.trello.com/1/boards/{board_id}/actions"
+        headers = {"Accept": "application/json"}
+        query = {
+            'key': api_key,
+            'token': token,
+            'since': since,
+            'limit': limit,
+            'filter': 'all',
+            'fields': 'id,type,date,data',
+            'memberCreator': 'false'
+        }
+        response = trello_http.get(actions_url, headers=headers, params=query)
+        if response.status_code != 200:
+            current_app.logger.error(f"Error al obtener acciones del tablero: HTTP {response.status_code}")
+            return None
+        return response.json()
+    except Exception as e:
+        current_app.logger.error(f"Error en get_trello_board_actions: {e}")
+        return None
+
+def format_trello_date(date_obj):
+    """
+    Formatea un datetime UTC con el formato de fecha que usa la API de Trello
+    """
+    return date_obj.strftime('%Y-%m-%dT%H:%M:%S.') + f"{date_obj.microsecond // 1000:03d}Z"
+
+def get_trello_actions_cursor(board_id):
+    """
+    Obtiene el cursor desde el que continuar tras una sincronización completa,
+    tomado del reloj de Trello y no del servidor: la fecha de la acción más
+    reciente del tablero o, si no tiene ninguna, la de creación del tablero
+    (los IDs de Trello llevan su marca de tiempo). Devuelve None si hubo un error.
+    """
+    actions = get_trello_board_actions(board_id, None, limit=1)
+    if actions is None:
+        return None
+    if actions:
+        return actions[0]['date']
+    if len(board_id) != 24:
+        return None
+    try:
+        return format_trello_date(datetime.utcfromtimestamp(int(board_id[:8], 16)))
+    except ValueError:
+        return None
+
+def is_actions_cursor_stale(cursor, last_check):
+    """
+    Indica si el cursor de acciones no sirve para una sincronización incremental.
+
+    La antigüedad se mide desde la última sincronización (`last_check`) y no
+    desde la fecha del cursor, que en un tablero sin actividad puede ser antigua
+    sin dejar de ser válida.
+    """
+    if not cursor or not last_check:
+        return True
+    return datetime.utcnow() - last_check > timedelta(hours=TRELLO_ACTIONS_CURSOR_MAX_AGE_HOURS)
+
+def summarize_board_actions(actions):
+    """
+    Reduce una lista de acciones de Trello a los cambios que hay que aplicar.
+
+    Returns:
+        Tupla (card_ids, removed_card_ids, lists_changed)
+    """
+    card_ids = set()
+    removed_card_ids = set()
+    lists_changed = False
+    for action in actions:
+        action_type = action.get('type', '')
+        data = action.get('data', {})
+        card = data.get('card')
+        if action_type in ('deleteCard', 'moveCardFromBoard'):
+            if card and card.get('id'):
+                removed_card_ids.add(card['id'])
+            continue
+        if card and card.get('id'):
+            card_ids.add(card['id'])
+        if action_type in LIST_ACTION_TYPES:
+            lists_changed = True
+    # Una tarjeta eliminada no se vuelve a consultar aunque tenga acciones previas
+    return card_ids - removed_card_ids, removed_card_ids, lists_changed
+
+def get_board_member_directory(board_id):
+    """
+    Obtiene los miembros de un tablero desde la caché o, si no están, con una
+    sola llamada a /boards/{id}/members. Devuelve None si hubo un error.
+    """
+    members = board_cache.get_members(board_id)
+    if members is not None:
+        return members
     try:
         api_key = os.environ.get('TRELLO_API_KEY')
         token = os.environ.get('TRELLO_TOKEN')
@@ -82,46 +240,77 @@ def get_trello_member_details(member_id):
             current_app.logger.error("Credenciales de Trello no configuradas")
             return None
         
-        member_url = f"https://api.trello.com/1/members/{member_id}"
-        headers = {
-            "Accept": "application/json"
-        }
+        members_url = f"https://api.trello.com/1/boards/{board_id}/members"
         query = {
             'key': api_key,
             'token': token,
             'fields': 'id,username,fullName'
         }
-        
-        response = requests.get(member_url, headers=headers, params=query)
+        response = trello_http.get(members_url, headers={"Accept": "application/json"}, params=query)
         
         if response.status_code != 200:
-            current_app.logger.error(f"Error al obtener miembro: HTTP {response.status_code}")
+            current_app.logger.error(f"Error al obtener miembros del tablero {board_id}: HTTP {response.status_code}")
             return None
         
-        return response.json()
+        board_cache.set_members(board_id, response.json())
+        return board_cache.get_members(board_id)
     except Exception as e:
-        current_app.logger.error(f"Error en get_trello_member_details: {e}")
+        current_app.logger.error(f"Error en get_board_member_directory: {e}")
         return None
 
-def get_discord_user_id(trello_user_id):
+def get_trello_member_details(member_id, board_id=None):
     """
-    Obtiene el ID de usuario de Discord mapeado a un usuario de Trello
+    Obtiene detalles de un miembro específico de Trello
+    """
+    return get_trello_members_details([member_id], board_id).get(member_id)
+
+def get_trello_members_details(member_ids, board_id=None):
     """
+    Obtiene los detalles de varios miembros de Trello. Primero se consulta el
+    directorio de miembros en caché (cargando el del tablero si se indica);
+    los que no están se piden en llamadas a /batch.
+    Devuelve un diccionario {member_id: miembro}; los que fallan no aparecen.
+    """
+    member_ids = list(dict.fromkeys(member_ids))
+    if not member_ids:
+        return {}
+    members = {}
+    missing = []
+    for member_id in member_ids:
+        member = board_cache.find_member(member_id)
+        if member:
+            members[member_id] = member
+        else:
+            missing.append(member_id)
+    if missing and board_id and get_board_member_directory(board_id) is not None:
+        for member_id in list(missing):
+            member = board_cache.find_member(member_id)
+            if member:
+                members[member_id] = member
+                missing.remove(member_id)
+    if not missing:
+        return members
     try:
-        db = current_app.config['MONGO_DB']
+        api_key = os.environ.get('TRELLO_API_KEY')
+        token = os.environ.get('TRELLO_TOKEN')
         
-        # Buscar en la base de datos el mapeo de usuario
-        user_mapping = db.user_mappings.find_one({'trello_user_id': trello_user_id})
+        if not api_key or not token:
+            current_app.logger.error("Credenciales de Trello no configuradas")
+            return members
         
-        if user_mapping and 'discord_user_id' in user_mapping:
-            current_app.logger.info(f"Mapeo encontrado: Usuario Trello {trello_user_id} -> Usuario Discord {user_mapping['discord_user_id']}")
-            return user_mapping['discord_user_id']
-        else:
-            current_app.logger.info(f"No se encontró mapeo para el usuario de Trello: {trello_user_id}")
-            return None
+        # Miembros que ya no están en el tablero (p. ej. quitados de una tarjeta y del tablero)
+        routes = [trello_http.batch_route(f"members/{member_id}", fields='id,username,fullName') for member_id in missing]
+        results = trello_http.batch(routes, params={'key': api_key, 'token': token})
+        for member_id, (status, member) in zip(missing, results):
+            if status == 200 and member:
+                board_cache.remember_member(member)
+                members[member_id] = member
+            else:
+                current_app.logger.error(f"Error al obtener miembro {member_id}: HTTP {status}")
+        return members
     except Exception as e:
-        current_app.logger.error(f"Error al obtener mapeo de usuario: {e}")
-        return None
+        current_app.logger.error(f"Error en get_trello_members_details: {e}")
+        return members
 
 def get_discord_channel_id(trello_card_id):
     """
@@ -198,7 +387,7 @@ def get_trello_lists(board_id):
             'token': token,
             'fields': 'id,name,closed'
         }
-        response = requests.get(lists_url, headers=headers, params=query)
+        response = trello_http.get(lists_url, headers=headers, params=query)
         if response.status_code != 200:
             current_app.logger.error(f"Error al obtener listas: HTTP {response.status_code}")
             return None
@@ -207,16 +396,33 @@ def get_trello_lists(board_id):
         current_app.logger.error(f"Error en get_trello_lists: {e}")
         return None
 
+def get_discord_user_ids(trello_user_ids):
+    """
+    Resuelve de una vez los usuarios de Discord mapeados a varios usuarios de Trello
+
+    Returns:
+        Diccionario {trello_user_id: discord_user_id} solo con los usuarios mapeados
+    """
+    try:
+        index = get_mapping_index(current_app._get_current_object())
+        discord_users = {}
+        for trello_user_id in trello_user_ids:
+            discord_user_id = index.discord_user_id(trello_user_id)
+            if discord_user_id:
+                discord_users[trello_user_id] = discord_user_id
+        current_app.logger.info(f"Mapeos encontrados para {len(discord_users)} de {len(trello_user_ids)} usuarios de Trello")
+        return discord_users
+    except Exception as e:
+        current_app.logger.error(f"Error al obtener mapeos de usuarios: {e}")
+        return {}
+
 def get_discord_channel_id_by_list(trello_list_id):
     """
     Obtiene el ID del canal de Discord mapeado a una lista de Trello
     """
     try:
-        db = current_app.config['MONGO_DB']
-        mapping = db.card_channel_mappings.find_one({'trello_list_id': trello_list_id})
-        if mapping and 'discord_channel_id' in mapping:
-            return mapping['discord_channel_id']
-        return None
+        # Buscar el mapeo de lista-canal en el índice en memoria
+        return get_mapping_index(current_app._get_current_object()).channel_for_list(trello_list_id)
     except Exception as e:
         current_app.logger.error(f"Error al obtener mapeo de lista-canal: {e}")
         return None
@@ -245,81 +451,191 @@ def save_list_channel_mapping(trello_list_id, trello_list_name, discord_channel_
         else:
             db.card_channel_mappings.insert_one(mapping_data)
             current_app.logger.info(f"Nuevo mapeo creado: Lista {trello_list_id} -> Canal {discord_channel_id}")
+        notify_mappings_changed(db)
         return True
     except Exception as e:
         current_app.logger.error(f"Error al guardar mapeo de lista-canal: {e}")
         return False
 
-def detect_and_process_trello_changes():
+def process_new_lists(integration, current_lists_dict, known_list_ids):
     """
-    Detecta cambios en listas y tarjetas de Trello y realiza las acciones correspondientes.
+    Crea un canal de Discord para cada lista nueva del tablero y guarda su mapeo.
     """
-    global previous_lists_state, previous_cards_state, polling_active, monitored_board_id
-    from flask import current_app
-    if not monitored_board_id:
-        current_app.logger.info("No hay tablero configurado para monitorear")
-        print("No hay tablero configurado para monitorear")
+    for list_id, lst in current_lists_dict.items():
+        if list_id not in known_list_ids:
+            current_app.logger.info(f"Nueva lista detectada: {lst['name']} (ID: {list_id})")
+            if 'discord_server_id' not in integration:
+                current_app.logger.error("No se encontró el discord_server_id para este board")
+                continue
+            guild_id = integration['discord_server_id']
+            # Crear canal de Discord y mapear
+            channel_name = f"{lst['name'].lower().replace(' ', '-')[:90]}"
+            safe_name = re.sub(r'[^a-zA-Z0-9_-]', '-', channel_name)
+            current_app.logger.info(f"Intentando crear canal de Discord: {safe_name} en servidor {guild_id}")
+            discord_channel_id = create_discord_channel(safe_name, guild_id)
+            if discord_channel_id:
+                current_app.logger.info(f"Canal de Discord creado exitosamente: {discord_channel_id}")
+                save_list_channel_mapping(list_id, lst['name'], discord_channel_id)
+            else:
+                current_app.logger.error(f"ERROR: No se pudo crear canal de Discord para la lista {list_id}")
+
+def process_card_changes(previous_cards, cards):
+    """
+    Compara tarjetas actuales con su instantánea y notifica las nuevas.
+
+    Returns:
+        Tupla (changed_cards, updates): las tarjetas cuya instantánea debe
+        actualizarse y las actualizaciones (card_id, old_card, new_card) que se
+        entregan al agrupador con queue_card_updates una vez persistidas.
+    """
+    changed_cards = []
+    updates = []
+    for card in cards:
+        card_id = card['id']
+        previous = previous_cards.get(card_id)
+        if previous is None:
+            current_app.logger.info(f"Nueva tarjeta detectada: {card['name']} (ID: {card_id})")
+            process_new_card_list_based(card)
+            changed_cards.append(card)
+        elif not is_current_hash(previous.content_hash):
+            # Hash de una versión anterior del algoritmo: se compara campo a campo
+            # y la tarjeta se toma como nueva base con el hash actual
+            if diff_cards(previous.to_trello_card(), card):
+                current_app.logger.info(f"Tarjeta actualizada: {card['name']} (ID: {card_id})")
+                updates.append((card_id, previous.to_trello_card(), card))
+            changed_cards.append(card)
+        elif previous.content_hash != CardSnapshot.compute_hash(card):
+            current_app.logger.info(f"Tarjeta actualizada: {card['name']} (ID: {card_id})")
+            updates.append((card_id, previous.to_trello_card(), card))
+            changed_cards.append(card)
+    return changed_cards, updates
+
+def pending_updates_of(updates):
+    """
+    Versiones anteriores de las actualizaciones, para persistirlas como pendientes
+    """
+    return {card_id: old_card for card_id, old_card, _ in updates}
+
+def queue_card_updates(integration_id, updates):
+    """
+    Entrega al agrupador las actualizaciones ya persistidas como pendientes
+    """
+    coalescer = get_update_coalescer()
+    for card_id, old_card, new_card in updates:
+        coalescer.add(card_id, old_card, new_card, integration_id)
+
+def recover_pending_updates(integration_id, previous_cards):
+    """
+    Vuelve a agrupar las actualizaciones persistidas que nadie ha notificado,
+    por ejemplo porque el proceso se reinició dentro de la ventana. Solo se
+    recuperan las que llevan pendientes más que la ventana y un margen, para
+    no duplicar las que otro trabajador está a punto de enviar.
+    """
+    coalescer = get_update_coalescer()
+    limit = datetime.utcnow() - timedelta(seconds=CARD_UPDATE_COALESCE_SECONDS + PENDING_UPDATE_GRACE_SECONDS)
+    for card_id, snapshot in previous_cards.items():
+        if not snapshot.pending_update or not snapshot.pending_since or snapshot.pending_since > limit:
+            continue
+        if coalescer.is_pending(card_id):
+            continue
+        current_app.logger.info(f"Recuperando actualización pendiente de la tarjeta {card_id}")
+        coalescer.add(card_id, snapshot.pending_update, snapshot.to_trello_card(), integration_id)
+
+def full_sync_trello_board(integration, store, known_list_ids, previous_cards, cursor):
+    """
+    Sincronización completa: descarga todas las listas y tarjetas del tablero.
+    """
+    board_id = integration['trello_board_id']
+    current_lists = get_trello_lists(board_id)
+    current_cards = get_trello_cards(board_id)
+    if current_lists is None or current_cards is None:
+        current_app.logger.warning(f"No se pudieron obtener listas o tarjetas actuales del tablero {board_id}")
         return
-    try:
-        current_app.logger.info(f"Verificando cambios en el tablero {monitored_board_id}")
-        print(f"Verificando cambios en el tablero {monitored_board_id}")
-        # Obtener estado actual de listas y tarjetas
-        current_lists = get_trello_lists(monitored_board_id)
-        current_cards = get_trello_cards(monitored_board_id)
-        if not current_lists or not current_cards:
-            current_app.logger.warning("No se pudieron obtener listas o tarjetas actuales")
-            print("No se pudieron obtener listas o tarjetas actuales")
+    current_lists_dict = {lst['id']: lst for lst in current_lists if not lst.get('closed', False)}
+    current_cards_dict = {card['id']: card for card in current_cards}
+    # --- PRIMERA EJECUCIÓN ---
+    if known_list_ids is None:
+        store.save(integration['_id'], current_lists_dict.keys(), current_cards_dict.values(), cursor=cursor)
+        current_app.logger.info(f"Estado inicial almacenado para el tablero {board_id}: {len(current_lists_dict)} listas, {len(current_cards_dict)} tarjetas")
+        return
+    # --- DETECTAR NUEVAS LISTAS ---
+    process_new_lists(integration, current_lists_dict, known_list_ids)
+    # --- DETECTAR NUEVAS TARJETAS Y ACTUALIZACIONES ---
+    changed_cards, updates = process_card_changes(previous_cards, current_cards_dict.values())
+    removed_card_ids = set(previous_cards) - set(current_cards_dict)
+    # Actualizar estado; las actualizaciones se agrupan solo cuando ya están persistidas
+    store.save(integration['_id'], current_lists_dict.keys(), changed_cards, removed_card_ids,
+               cursor=cursor, pending_updates=pending_updates_of(updates))
+    queue_card_updates(integration['_id'], updates)
+
+def incremental_sync_trello_board(integration, store, known_list_ids, previous_cards, actions):
+    """
+    Sincronización incremental: aplica solo las tarjetas y listas afectadas por las acciones
+    registradas desde el último cursor.
+    """
+    board_id = integration['trello_board_id']
+    cursor = max(action['date'] for action in actions) if actions else integration.get('actions_cursor')
+    card_ids, removed_card_ids, lists_changed = summarize_board_actions(actions)
+    list_ids = known_list_ids
+    if lists_changed:
+        current_lists = get_trello_lists(board_id)
+        if current_lists is None:
+            current_app.logger.warning(f"No se pudieron obtener las listas del tablero {board_id}")
             return
         current_lists_dict = {lst['id']: lst for lst in current_lists if not lst.get('closed', False)}
-        current_cards_dict = {card['id']: card for card in current_cards}
-        # --- PRIMERA EJECUCIÓN ---
-        if not previous_lists_state or not previous_cards_state:
-            previous_lists_state = current_lists_dict
-            previous_cards_state = current_cards_dict
-            print(f"Estado inicial almacenado: {len(current_lists_dict)} listas, {len(current_cards_dict)} tarjetas")
-            return
-        # --- DETECTAR NUEVAS LISTAS ---
-        for list_id, lst in current_lists_dict.items():
-            if list_id not in previous_lists_state:
-                current_app.logger.info(f"Nueva lista detectada: {lst['name']} (ID: {list_id})")
-                print(f"Nueva lista detectada: {lst['name']} (ID: {list_id})")
-                # Obtener integración para el board actual
-                db = current_app.config['MONGO_DB']
-                integration = db.integrations.find_one({'trello_board_id': monitored_board_id})
-                if not integration or 'discord_server_id' not in integration:
-                    current_app.logger.error("No se encontró la integración o el discord_server_id para este board")
-                    print("No se encontró la integración o el discord_server_id para este board")
-                    continue
-                guild_id = integration['discord_server_id']
-                # Crear canal de Discord y mapear
-                channel_name = f"{lst['name'].lower().replace(' ', '-')[:90]}"
-                safe_name = re.sub(r'[^a-zA-Z0-9_-]', '-', channel_name)
-                current_app.logger.info(f"Intentando crear canal de Discord: {safe_name} en servidor {guild_id}")
-                discord_channel_id = create_discord_channel(safe_name, guild_id)
-                if discord_channel_id:
-                    current_app.logger.info(f"Canal de Discord creado exitosamente: {discord_channel_id}")
-                    save_list_channel_mapping(list_id, lst['name'], discord_channel_id)
-                else:
-                    current_app.logger.error(f"ERROR: No se pudo crear canal de Discord para la lista {list_id}")
-                    print(f"ERROR: No se pudo crear canal de Discord para la lista {list_id}")
-        # --- DETECTAR NUEVAS TARJETAS Y ACTUALIZACIONES ---
-        for card_id, card in current_cards_dict.items():
-            if card_id not in previous_cards_state:
-                current_app.logger.info(f"Nueva tarjeta detectada: {card['name']} (ID: {card_id})")
-                print(f"Nueva tarjeta detectada: {card['name']} (ID: {card_id})")
-                process_new_card_list_based(card)
-            else:
-                if card.get('dateLastActivity') != previous_cards_state[card_id].get('dateLastActivity'):
-                    current_app.logger.info(f"Tarjeta actualizada: {card['name']} (ID: {card_id})")
-                    print(f"Tarjeta actualizada: {card['name']} (ID: {card_id})")
-                    process_updated_card_list_based(previous_cards_state[card_id], card)
-        # Actualizar estado
-        previous_lists_state = current_lists_dict
-        previous_cards_state = current_cards_dict
+        process_new_lists(integration, current_lists_dict, known_list_ids)
+        list_ids = current_lists_dict.keys()
+    fetched = get_trello_cards_by_id(card_ids)
+    if fetched is None:
+        # Error transitorio: no avanzar el cursor para reintentar en la próxima ejecución
+        current_app.logger.warning(f"No se pudieron obtener las tarjetas modificadas del tablero {board_id}; se reintentará")
+        return
+    cards = []
+    for card_id, card in fetched.items():
+        if card is False or card.get('closed') or card.get('idBoard') != board_id:
+            removed_card_ids.add(card_id)
+            continue
+        cards.append(card)
+    current_app.logger.info(f"Sincronización incremental del tablero {board_id}: {len(actions)} acciones, {len(cards)} tarjetas consultadas")
+    changed_cards, updates = process_card_changes(previous_cards, cards)
+    removed_card_ids &= set(previous_cards)
+    store.save(integration['_id'], list_ids, changed_cards, removed_card_ids,
+               cursor=cursor, pending_updates=pending_updates_of(updates))
+    queue_card_updates(integration['_id'], updates)
+
+def detect_and_process_trello_changes(integration):
+    """
+    Detecta cambios en listas y tarjetas del tablero de una integración y realiza las acciones correspondientes.
+
+    Si existe una instantánea y un cursor de acciones reciente, solo se consultan las
+    acciones del tablero desde ese cursor; en otro caso se hace una sincronización completa.
+    """
+    board_id = integration.get('trello_board_id')
+    if not board_id:
+        current_app.logger.info("La integración no tiene tablero configurado para monitorear")
+        return
+    try:
+        current_app.logger.info(f"Verificando cambios en el tablero {board_id}")
+        # Cargar la última instantánea persistida de esta integración
+        store = SnapshotStore(current_app.config['MONGO_DB'])
+        known_list_ids, previous_cards = store.load(integration['_id'])
+        recover_pending_updates(integration['_id'], previous_cards)
+        cursor = integration.get('actions_cursor')
+        if known_list_ids is not None and not is_actions_cursor_stale(cursor, integration.get('last_check')):
+            actions = get_trello_board_actions(board_id, cursor)
+            if actions is not None and len(actions) < TRELLO_ACTIONS_LIMIT:
+                # Descartar las acciones ya aplicadas en la ejecución anterior
+                actions = [action for action in actions if action.get('date', '') > cursor]
+                incremental_sync_trello_board(integration, store, known_list_ids, previous_cards, actions)
+                return
+            current_app.logger.info(f"Cursor de acciones no utilizable para el tablero {board_id}; sincronización completa")
+        # El cursor se toma antes de descargar el tablero: las acciones posteriores
+        # se vuelven a aplicar en la siguiente ejecución en lugar de perderse
+        full_sync_trello_board(integration, store, known_list_ids, previous_cards, get_trello_actions_cursor(board_id))
     except Exception as e:
-        print(f"Error en detect_and_process_trello_changes: {e}")
+        current_app.logger.error(f"Error en detect_and_process_trello_changes: {e}")
         import traceback
-        print(traceback.format_exc())
+        current_app.logger.error(traceback.format_exc())
 
 def process_new_card_list_based(card):
     """
@@ -332,10 +648,10 @@ def process_new_card_list_based(card):
             print(f"No se encontró canal de Discord para la lista {trello_list_id}")
             return
         # Si la tarjeta tiene asignados, enviar mensaje con botón de confirmación
-        assigned_discord_users = [get_discord_user_id(mid) for mid in card.get('idMembers', []) if get_discord_user_id(mid)]
+        assigned_discord_users = get_discord_user_ids(card.get('idMembers', []))
         if assigned_discord_users:
             for member_id in card['idMembers']:
-                discord_user_id = get_discord_user_id(member_id)
+                discord_user_id = assigned_discord_users.get(member_id)
                 if discord_user_id:
                     confirmation_message = (
                         f"📄 **Tarea:** {card['name']}\n"
@@ -359,7 +675,7 @@ def process_new_card_list_based(card):
                     if card.get('shortUrl'):
                         confirmation_message += f"\n📌 **Enlace a la tarjeta:** {card.get('shortUrl')}\n"
                     confirmation_message += "\nPor favor, confirma que vista esta asignación haciendo clic en el botón:"
-                    send_message_with_button(
+                    queue_message_with_button(
                         discord_channel_id,
                         confirmation_message,
                         "Confirmar asignación",
@@ -388,7 +704,7 @@ def process_new_card_list_based(card):
                         message += f"- {adj.get('name', 'Archivo')}\n"
             if card.get('shortUrl'):
                 message += f"\n📌 **Enlace a la tarjeta:** {card.get('shortUrl')}\n"
-            send_message_to_channel(discord_channel_id, message)
+            queue_message_to_channel(discord_channel_id, message)
         print(f"Mensaje de nueva tarjeta enviado al canal de la lista {trello_list_id}")
     except Exception as e:
         print(f"ERROR en process_new_card_list_based: {e}")
@@ -406,45 +722,44 @@ def process_updated_card_list_based(old_card, new_card):
             print(f"No se encontró canal de Discord para la lista {trello_list_id}")
             return
         cambios = []
-        if old_card.get('name', '') != new_card.get('name', ''):
-            cambios.append(f"📄 *Título cambiado:* '{old_card.get('name', '')}' → '{new_card.get('name', '')}'")
-        if old_card.get('desc', '') != new_card.get('desc', ''):
-            nueva_desc = new_card.get('desc', '').strip()
-            if nueva_desc:
-                cambios.append(f"⚠️ *Descripción actualizada para tarea '{new_card.get('name')}':* {nueva_desc}")
-            else:
-                cambios.append(f"⚠️ *Descripción eliminada para tarea '{new_card.get('name')}'*")
-        if old_card.get('due') != new_card.get('due'):
-            old_due_fmt = format_date_spanish(old_card.get('due')) if old_card.get('due') else 'Sin fecha'
-            new_due_fmt = format_date_spanish(new_card.get('due')) if new_card.get('due') else 'Sin fecha'
-            cambios.append(f"📅 *Fecha límite cambiada para la tarea '{new_card.get('name')}':* '{old_due_fmt}' → '{new_due_fmt}'")
-        old_labels = set(label.get('name', '') for label in old_card.get('labels', []) if label.get('name'))
-        new_labels = set(label.get('name', '') for label in new_card.get('labels', []) if label.get('name'))
-        added_labels = new_labels - old_labels
-        removed_labels = old_labels - new_labels
-        if added_labels:
-            cambios.append(f"🏷️ *Etiqueta añadida para tarea '{new_card.get('name')}':* {', '.join(added_labels)}")
-        if removed_labels:
-            cambios.append(f"🏷️ *Etiqueta eliminada para tarea '{new_card.get('name')}':* {', '.join(removed_labels)}")
-        old_attachments = set((a.get('id'), a.get('name')) for a in old_card.get('attachments', []))
-        new_attachments = set((a.get('id'), a.get('name')) for a in new_card.get('attachments', []))
-        added_attachments = new_attachments - old_attachments
-        removed_attachments = old_attachments - new_attachments
-        if added_attachments:
-            cambios.append(f"📎 *Adjunto añadido para tarea '{new_card.get('name')}':*\n" + '\n'.join(f"- {name}" for (_id, name) in added_attachments))
-        if removed_attachments:
-            cambios.append(f"📎 *Adjunto eliminado para tarea '{new_card.get('name')}':*\n" + '\n'.join(f"- {name}" for (_id, name) in removed_attachments))
-        old_members = set(old_card.get('idMembers', []))
-        new_members = set(new_card.get('idMembers', []))
-        nuevos_asignados = new_members - old_members
-        removidos = old_members - new_members
+        nuevos_asignados = ()
+        removidos = ()
+        for change in diff_cards(old_card, new_card):
+            if change.field == card_diff.FIELD_NAME:
+                cambios.append(f"📄 *Título cambiado:* '{change.old}' → '{change.new}'")
+            elif change.field == card_diff.FIELD_DESC:
+                nueva_desc = (change.new or '').strip()
+                if nueva_desc:
+                    cambios.append(f"⚠️ *Descripción actualizada para tarea '{new_card.get('name')}':* {nueva_desc}")
+                else:
+                    cambios.append(f"⚠️ *Descripción eliminada para tarea '{new_card.get('name')}'*")
+            elif change.field == card_diff.FIELD_DUE:
+                old_due_fmt = format_date_spanish(change.old) if change.old else 'Sin fecha'
+                new_due_fmt = format_date_spanish(change.new) if change.new else 'Sin fecha'
+                cambios.append(f"📅 *Fecha límite cambiada para la tarea '{new_card.get('name')}':* '{old_due_fmt}' → '{new_due_fmt}'")
+            elif change.field == card_diff.FIELD_LABELS:
+                if change.added:
+                    cambios.append(f"🏷️ *Etiqueta añadida para tarea '{new_card.get('name')}':* {', '.join(change.added)}")
+                if change.removed:
+                    cambios.append(f"🏷️ *Etiqueta eliminada para tarea '{new_card.get('name')}':* {', '.join(change.removed)}")
+            elif change.field == card_diff.FIELD_ATTACHMENTS:
+                if change.added:
+                    cambios.append(f"📎 *Adjunto añadido para tarea '{new_card.get('name')}':*\n" + '\n'.join(f"- {name}" for (_id, name) in change.added))
+                if change.removed:
+                    cambios.append(f"📎 *Adjunto eliminado para tarea '{new_card.get('name')}':*\n" + '\n'.join(f"- {name}" for (_id, name) in change.removed))
+            elif change.field == card_diff.FIELD_MEMBERS:
+                nuevos_asignados = change.added
+                removidos = change.removed
         if cambios or nuevos_asignados or removidos:
             message = ""
             if cambios:
                 message += "\n".join(cambios) + "\n"
+            # Detalles de todos los miembros afectados en una sola llamada a /batch
+            trello_members = get_trello_members_details(list(nuevos_asignados) + list(removidos), new_card.get('idBoard'))
+            discord_users = get_discord_user_ids(nuevos_asignados)
             for member_id in nuevos_asignados:
-                trello_member = get_trello_member_details(member_id)
-                discord_user_id = get_discord_user_id(member_id)
+                trello_member = trello_members.get(member_id)
+                discord_user_id = discord_users.get(member_id)
                 if discord_user_id:
                     confirmation_message = (
                         f"📄 **Tarea:** {new_card['name']}\n"
@@ -468,7 +783,7 @@ def process_updated_card_list_based(old_card, new_card):
                     if new_card.get('shortUrl'):
                         confirmation_message += f"\n📌 **Enlace a la tarjeta:** {new_card.get('shortUrl')}\n"
                     confirmation_message += "\nPor favor, confirma que vista esta asignación haciendo clic en el botón:"
-                    send_message_with_button(
+                    queue_message_with_button(
                         discord_channel_id,
                         confirmation_message,
                         "Confirmar asignación",
@@ -480,13 +795,13 @@ def process_updated_card_list_based(old_card, new_card):
                     if trello_member:
                         message += f"🙋‍♂️ Nuevo asignado: {trello_member.get('fullName', 'Desconocido')} (no mapeado a Discord)\n"
             for member_id in removidos:
-                trello_member = get_trello_member_details(member_id)
+                trello_member = trello_members.get(member_id)
                 if trello_member:
                     message += f"🙋‍♂️ Ya no asignado: {trello_member.get('fullName', 'Desconocido')}\n"
             message = message.strip()
             if message:
                 print(f"Enviando mensaje de actualización al canal {discord_channel_id}")
-                send_message_to_channel(discord_channel_id, message)
+                queue_message_to_channel(discord_channel_id, message)
         else:
             print("No se detectaron cambios significativos. No se enviará mensaje general.")
         print(f"Procesamiento de tarjeta actualizada completado: {new_card['id']}")
@@ -495,58 +810,57 @@ def process_updated_card_list_based(old_card, new_card):
         import traceback
         print(traceback.format_exc())
 
-def polling_thread(app=None):
+def get_polling_scheduler(app=None):
     """
-    Función que se ejecuta en un hilo separado para realizar el polling de Trello
+    Obtiene el planificador de polling compartido, creándolo si es necesario
     """
-    global polling_active
-    
-    if app is None:
-        print("ERROR: No se proporcionó la instancia de la aplicación al hilo de polling")
-        return
-    
-    print(f"Iniciando hilo de polling de Trello con app={app}")
-    
-    with app.app_context():
-        current_app.logger.info("=== HILO DE POLLING INICIADO ===")
-        current_app.logger.info(f"polling_active: {polling_active}")
-        current_app.logger.info(f"monitored_board_id: {monitored_board_id}")
-    
-    while polling_active:
-        try:
-            # Con aplicación Flask como contexto
-            with app.app_context():
-                current_app.logger.debug("Ejecutando detect_and_process_trello_changes...")
-                detect_and_process_trello_changes()
-        except Exception as e:
-            # Capturar cualquier excepción para evitar que el hilo se detenga
-            print(f"Error en el hilo de polling: {e}")
-            with app.app_context():
-                current_app.logger.error(f"Error en el hilo de polling: {e}")
-            import traceback
-            print(traceback.format_exc())
-            with app.app_context():
-                current_app.logger.error(traceback.format_exc())
-        
-        # Esperar 10 segundos antes de la siguiente verificación
-        time.sleep(10)
-    
-    print("Hilo de polling de Trello detenido")
-    with app.app_context():
-        current_app.logger.info("=== HILO DE POLLING DETENIDO ===")
+    global polling_scheduler
+    if polling_scheduler is None:
+        if app is None:
+            app = current_app._get_current_object()
+        polling_scheduler = PollingScheduler(
+            app,
+            detect_and_process_trello_changes,
+            max_workers=int(os.environ.get('POLLING_WORKERS', 4))
+        )
+    return polling_scheduler
+
+def get_update_coalescer(app=None):
+    """
+    Obtiene el agrupador de actualizaciones de tarjetas compartido, creándolo si es necesario
+    """
+    global update_coalescer
+    if update_coalescer is None:
+        if app is None:
+            app = current_app._get_current_object()
+        update_coalescer = UpdateCoalescer(
+            app,
+            process_updated_card_list_based,
+            window_seconds=CARD_UPDATE_COALESCE_SECONDS,
+            on_done=clear_pending_update
+        )
+    return update_coalescer
+
+def clear_pending_update(card_id, integration_id):
+    """
+    Borra la actualización pendiente de la instantánea una vez notificada
+    """
+    if integration_id is not None:
+        SnapshotStore(current_app.config['MONGO_DB']).clear_pending(integration_id, card_id)
 
 @debug_bp.route('/trello/start-monitoring/<board_id>', methods=['POST'])
 def start_monitoring(board_id):
     """
-    Inicia el monitoreo de un tablero específico de Trello
+    Inicia el monitoreo de Trello. El planificador vigila todas las integraciones
+    activas; el tablero indicado se marca como activo para incluirlo en el polling.
+
+    El polling trabaja sobre integraciones, así que un tablero sin ninguna
+    integración no se puede monitorear: en ese caso se responde 404 en lugar
+    de dar por iniciado un monitoreo que nunca consultaría el tablero.
     """
-    global polling_active, monitored_board_id
+    global monitored_board_id
     
-    if polling_active:
-        return jsonify({
-            'status': 'warning',
-            'message': 'El monitoreo ya está activo. Detén el monitoreo actual antes de iniciar uno nuevo.'
-        }), 400
+    scheduler = get_polling_scheduler()
     
     try:
         # Verificar que el tablero existe
@@ -564,7 +878,7 @@ def start_monitoring(board_id):
         headers = {"Accept": "application/json"}
         query = {'key': api_key, 'token': token}
         
-        response = requests.get(board_url, headers=headers, params=query)
+        response = trello_http.get(board_url, headers=headers, params=query)
         
         if response.status_code != 200:
             return jsonify({
@@ -573,20 +887,22 @@ def start_monitoring(board_id):
                 'details': response.text
             }), 400
         
-        # El tablero existe, iniciar el monitoreo
-        monitored_board_id = board_id
-        polling_active = True
-        
-        # Obtener la instancia de la aplicación actual para pasarla al hilo
-        app = current_app._get_current_object()
+        db = current_app.config['MONGO_DB']
+        result = db.integrations.update_many(
+            {'trello_board_id': board_id},
+            {'$set': {'active': True, 'updated_at': datetime.utcnow()}}
+        )
+        if result.matched_count == 0:
+            return jsonify({
+                'status': 'error',
+                'message': f'No existe ninguna integración para el tablero {board_id}'
+            }), 404
         
-        # Iniciar el hilo de polling pasando la aplicación
-        polling_thread_instance = threading.Thread(target=polling_thread, args=(app,))
-        polling_thread_instance.daemon = True  # El hilo se cerrará cuando el programa principal termine
-        polling_thread_instance.start()
+        monitored_board_id = board_id
         
-        # Esperar 1 segundo para asegurarse de que el hilo inicie correctamente
-        time.sleep(1)
+        # Iniciar el planificador o recargar las integraciones si ya estaba en marcha
+        if not scheduler.start():
+            scheduler.refresh()
         
         return jsonify({
             'status': 'success',
@@ -606,17 +922,20 @@ def stop_monitoring():
     """
     Detiene el monitoreo de Trello
     """
-    global polling_active, monitored_board_id
+    global monitored_board_id
+    
+    scheduler = get_polling_scheduler()
     
-    if not polling_active:
+    if not scheduler.running:
         return jsonify({
             'status': 'warning',
             'message': 'No hay monitoreo activo para detener'
         }), 400
     
     try:
-        # Detener el hilo de polling
-        polling_active = False
+        # Detener el planificador de polling y enviar las actualizaciones pendientes
+        scheduler.stop()
+        get_update_coalescer().flush_all()
         monitored_board_id = None
         
         return jsonify({
@@ -636,14 +955,15 @@ def monitoring_status():
     """
     Obtiene el estado actual del monitoreo
     """
-    global polling_active, monitored_board_id
+    scheduler_status = get_polling_scheduler().status()
     
-    current_app.logger.info(f"Estado del monitoreo consultado - Active: {polling_active}, Board: {monitored_board_id}")
+    current_app.logger.info(f"Estado del monitoreo consultado - Active: {scheduler_status['active']}, Integraciones: {len(scheduler_status['integrations'])}")
     
     return jsonify({
         'status': 'success',
-        'active': polling_active,
+        'active': scheduler_status['active'],
         'monitored_board_id': monitored_board_id,
+        'monitored_boards': [i['trello_board_id'] for i in scheduler_status['integrations']],
         'timestamp': datetime.utcnow().isoformat()
     }), 200
 
@@ -652,13 +972,19 @@ def monitoring_debug():
     """
     Obtiene información detallada para debugging del monitoreo
     """
-    global polling_active, monitored_board_id, previous_lists_state, previous_cards_state
+    scheduler_status = get_polling_scheduler().status()
     
     debug_info = {
-        'polling_active': polling_active,
+        'polling_active': scheduler_status['active'],
         'monitored_board_id': monitored_board_id,
-        'previous_lists_count': len(previous_lists_state) if previous_lists_state else 0,
-        'previous_cards_count': len(previous_cards_state) if previous_cards_state else 0,
+        'scheduler': scheduler_status,
+        'snapshot_cards_count': current_app.config['MONGO_DB'].card_snapshots.estimated_document_count(),
+        'discord_lookups': gateway.lookup_stats(),
+        'discord_dispatcher': dispatcher.stats(),
+        'update_coalescer': get_update_coalescer().stats(),
+        'trello_http': trello_http.stats(),
+        'mapping_index': get_mapping_index(current_app._get_current_object()).stats(),
+        'latency': metrics.snapshot(),
         'timestamp': datetime.utcnow().isoformat()
     }
     
@@ -670,7 +996,7 @@ def monitoring_debug():
             debug_info['trello_connectivity'] = {
                 'lists_available': len(current_lists) if current_lists else 0,
                 'cards_available': len(current_cards) if current_cards else 0,
-                'connection_ok': bool(current_lists and current_cards)
+                'connection_ok': current_lists is not None and current_cards is not None
             }
         except Exception as e:
             debug_info['trello_connectivity'] = {
@@ -685,6 +1011,18 @@ def monitoring_debug():
         'debug_info': debug_info
     }), 200
 
+@debug_bp.route('/mongo/index-audit', methods=['GET'])
+def mongo_index_audit():
+    """
+    Ejecuta explain() sobre las consultas frecuentes y señala las que hacen COLLSCAN
+    """
+    report = audit_query_plans(current_app.config['MONGO_DB'])
+    return jsonify({
+        'status': 'success',
+        'collscans': sum(1 for entry in report if entry.get('collscan')),
+        'queries': report
+    }), 200
+
 # Rutas originales de debug.py
 @debug_bp.route('/trello/check-credentials', methods=['GET'])
 def check_trello_credentials():
@@ -735,7 +1073,7 @@ def get_boards():
             'fields': 'id,name,url,closed,desc'
         }
         
-        response = requests.get(url, headers=headers, params=query)
+        response = trello_http.get(url, headers=headers, params=query)
         
         if response.status_code != 200:
             current_app.logger.error(f"Error al obtener tableros de Trello: {response.text}")
@@ -787,68 +1125,24 @@ def get_board_details(board_id):
                 'message': 'Credenciales de Trello no configuradas'
             }), 400
         
-        # Hacer solicitud HTTP para obtener detalles del tablero
-        board_url = f"https://api.trello.com/1/boards/{board_id}"
-        headers = {
-            "Accept": "application/json"
-        }
-        query = {
-            'key': api_key,
-            'token': token,
-            'fields': 'id,name,url,desc'
-        }
-        
-        board_response = requests.get(board_url, headers=headers, params=query)
-        
-        if board_response.status_code != 200:
-            current_app.logger.error(f"Error al obtener el tablero {board_id}: {board_response.text}")
-            return jsonify({
-                'status': 'error',
-                'message': f'Error al obtener el tablero: HTTP {board_response.status_code}',
-                'details': board_response.text
-            }), 500
-        
-        board_data = board_response.json()
-        
-        # Obtener listas del tablero
-        lists_url = f"https://api.trello.com/1/boards/{board_id}/lists"
-        lists_query = {
-            'key': api_key,
-            'token': token,
-            'fields': 'id,name,closed'
-        }
-        
-        lists_response = requests.get(lists_url, headers=headers, params=lists_query)
-        
-        if lists_response.status_code != 200:
-            current_app.logger.error(f"Error al obtener listas del tablero {board_id}: {lists_response.text}")
-            return jsonify({
-                'status': 'error',
-                'message': f'Error al obtener listas del tablero: HTTP {lists_response.status_code}',
-                'details': lists_response.text
-            }), 500
-        
-        lists_data = lists_response.json()
-        
-        # Obtener miembros del tablero
-        members_url = f"https://api.trello.com/1/boards/{board_id}/members"
-        members_query = {
-            'key': api_key,
-            'token': token,
-            'fields': 'id,username,fullName'
-        }
+        # Tablero, listas y miembros en una sola llamada a /batch
+        routes = [
+            trello_http.batch_route(f"boards/{board_id}", fields='id,name,url,desc'),
+            trello_http.batch_route(f"boards/{board_id}/lists", fields='id,name,closed'),
+            trello_http.batch_route(f"boards/{board_id}/members", fields='id,username,fullName')
+        ]
+        results = trello_http.batch(routes, params={'key': api_key, 'token': token})
         
-        members_response = requests.get(members_url, headers=headers, params=members_query)
+        for what, (status, _body) in zip(('el tablero', 'listas del tablero', 'miembros del tablero'), results):
+            if status != 200:
+                current_app.logger.error(f"Error al obtener {what} {board_id}: HTTP {status}")
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Error al obtener {what}: HTTP {status}'
+                }), 500
         
-        if members_response.status_code != 200:
-            current_app.logger.error(f"Error al obtener miembros del tablero {board_id}: {members_response.text}")
-            return jsonify({
-                'status': 'error',
-                'message': f'Error al obtener miembros del tablero: HTTP {members_response.status_code}',
-                'details': members_response.text
-            }), 500
-        
-        members_data = members_response.json()
+        (_, board_data), (_, lists_data), (_, members_data) = results
+        board_cache.set_members(board_id, members_data)
         
         # Formatear la respuesta
         lists = []
@@ -901,53 +1195,23 @@ def get_board_cards(board_id):
                 'message': 'Credenciales de Trello no configuradas'
             }), 400
         
-        # Hacer solicitud HTTP para obtener tarjetas del tablero
-        cards_url = f"https://api.trello.com/1/boards/{board_id}/cards"
-        headers = {
-            "Accept": "application/json"
-        }
-        query = {
-            'key': api_key,
-            'token': token,
-            'fields': 'id,name,desc,url,shortUrl,closed,idList,idBoard,due,labels'
-        }
-        
-        response = requests.get(cards_url, headers=headers, params=query)
-        
-        if response.status_code != 200:
-            current_app.logger.error(f"Error al obtener tarjetas del tablero {board_id}: {response.text}")
+        try:
+            formatted_cards = board_cards.get_board_cards(board_id)
+        except board_cards.TrelloRequestError as e:
+            current_app.logger.error(f"Error al obtener tarjetas del tablero {board_id}: {e.details}")
             return jsonify({
                 'status': 'error',
-                'message': f'Error al obtener tarjetas: HTTP {response.status_code}',
-                'details': response.text
+                'message': str(e),
+                'details': e.details
             }), 500
         
-        cards_data = response.json()
-        
-        if not cards_data:
+        if not formatted_cards:
             return jsonify({
                 'status': 'success',
                 'message': 'No se encontraron tarjetas en este tablero',
                 'cards': []
             }), 200
         
-        # Formatear la respuesta
-        formatted_cards = []
-        for card in cards_data:
-            formatted_cards.append({
-                'id': card.get('id'),
-                'name': card.get('name'),
-                'description': card.get('desc', ''),
-                'url': card.get('url'),
-                'short_url': card.get('shortUrl'),
-                'closed': card.get('closed', False),
-                'id_list': card.get('idList'),
-                'id_board': card.get('idBoard'),
-                'due': card.get('due'),
-                'labels': [{'id': label.get('id'), 'name': label.get('name', ''), 'color': label.get('color', '')} 
-                          for label in card.get('labels', [])]
-            })
-        
         return jsonify({
             'status': 'success',
             'count': len(formatted_cards),
@@ -988,7 +1252,7 @@ def check_trello_credentials_detailed():
             'token': token
         }
         
-        response = requests.get(url, headers=headers, params=query)
+        response = trello_http.get(url, headers=headers, params=query)
         
         # Verificar la respuesta
         if response.status_code == 200:
@@ -1,13 +1,20 @@
 from flask import Blueprint, request, jsonify, current_app
 from bson.objectid import ObjectId
+from pymongo import UpdateOne
 import jwt
 from app.models.integration import Integration
 from app.models.user_mapping import UserMapping
 from app.models.card_channel_mapping import CardChannelMapping
 from app.services.trello_service import TrelloService
 from app.services.discord_service import DiscordService
+from app.services import board_cards
+from app.services import card_diff
+from app.services.card_diff import diff_cards
+from app.services.metrics import timed
+from app.services.board_cache import board_cache
+from app.services.trello_client import trello_http
+from app.services.mapping_index import notify_mappings_changed
 import os
-import requests
 from datetime import datetime
 from trello import TrelloClient
 from app.discord.bot import create_discord_channel, send_message_to_channel, send_message_with_button
@@ -30,7 +37,8 @@ def get_trello_service():
     
     return TrelloClient(
         api_key=api_key,
-        token=token
+        token=token,
+        http_service=trello_http
     )
 
 def get_discord_service():
@@ -268,12 +276,16 @@ def delete_integration(current_user_id, integration_id):
         try:
             card_states_result = db.card_states.delete_many({'integration_id': ObjectId(integration_id)})
             current_app.logger.info(f"Se eliminaron {card_states_result.deleted_count} registros de estados de tarjetas para la integración {integration_id}")
+
+            snapshots_result = db.card_snapshots.delete_many({'integration_id': ObjectId(integration_id)})
+            current_app.logger.info(f"Se eliminaron {snapshots_result.deleted_count} instantáneas de tarjetas para la integración {integration_id}")
             
             mappings_result = db.user_mappings.delete_many({'integration_id': ObjectId(integration_id)})
             current_app.logger.info(f"Se eliminaron {mappings_result.deleted_count} mapeos de usuarios para la integración {integration_id}")
             
             card_mappings_result = db.card_channel_mappings.delete_many({'integration_id': ObjectId(integration_id)})
             current_app.logger.info(f"Se eliminaron {card_mappings_result.deleted_count} mapeos de tarjetas para la integración {integration_id}")
+            notify_mappings_changed(db)
         except Exception as e:
             # No fallamos la operación principal si falla la eliminación de registros relacionados
             current_app.logger.error(f"Error al eliminar registros relacionados para la integración {integration_id}: {e}")
@@ -311,7 +323,7 @@ def test_trello_connection():
             'token': token
         }
         
-        response = requests.get(url, headers=headers, params=query)
+        response = trello_http.get(url, headers=headers, params=query)
         
         # Verificar la respuesta
         if response.status_code == 200:
@@ -363,18 +375,14 @@ def check_integration_updates(current_user_id, integration_id):
         
         # Obtener las tarjetas actuales del tablero
         try:
-            cards_response = requests.get(
-                f"{os.environ.get('WEBHOOK_BASE_URL')}/api/debug/trello/board/{integration['trello_board_id']}/cards",
-                headers={"Accept": "application/json"}
-            )
-            
-            if cards_response.status_code != 200:
+            # Solo se comparan nombre y lista: pedir esos campos reduce la respuesta de tableros grandes
+            try:
+                current_cards = board_cards.get_board_cards(integration['trello_board_id'], fields='id,name,idList')
+            except board_cards.TrelloRequestError as e:
                 return jsonify({
                     'message': 'Error al obtener tarjetas actuales',
-                    'details': cards_response.text
+                    'details': e.details
                 }), 500
-                
-            current_cards = cards_response.json().get('cards', [])
             
             # Obtener el estado anterior de las tarjetas
             previous_cards = list(db.card_states.find({
@@ -388,6 +396,9 @@ def check_integration_updates(current_user_id, integration_id):
             new_cards = []
             modified_cards = []
             moved_cards = []
+            # Escrituras acumuladas para enviarlas en un único bulk_write
+            operations = []
+            now = datetime.utcnow()
             
             # Comprobar cambios
             for card in current_cards:
@@ -401,51 +412,54 @@ def check_integration_updates(current_user_id, integration_id):
                         'card_id': card['id'],
                         'name': card['name'],
                         'id_list': card['id_list'],
-                        'last_modified': datetime.utcnow(),
+                        'last_modified': now,
                         'is_processed': False  # Marcar como no procesada
                     }
-                    db.card_states.insert_one(card_state)
+                    # Upsert por (integration_id, card_id): dos comprobaciones simultáneas
+                    # no chocan con el índice único, la segunda no hace nada
+                    operations.append(UpdateOne(
+                        {'integration_id': card_state['integration_id'], 'card_id': card_state['card_id']},
+                        {'$setOnInsert': card_state},
+                        upsert=True
+                    ))
                 else:
                     # Tarjeta existente - comprobar cambios
                     prev_state = previous_cards_dict[card['id']]
+                    changes = diff_cards(
+                        {'name': prev_state.get('name', ''), 'idList': prev_state.get('id_list', '')},
+                        {'name': card['name'], 'idList': card['id_list']},
+                        fields=(card_diff.FIELD_NAME, card_diff.FIELD_LIST)
+                    )
                     
-                    if prev_state['name'] != card['name']:
-                        # Nombre modificado
-                        modified_cards.append({
-                            'card': card,
-                            'previous': prev_state,
-                            'change_type': 'name'
-                        })
-                        
-                        # Actualizar estado
-                        db.card_states.update_one(
-                            {'_id': prev_state['_id']},
-                            {'$set': {
-                                'name': card['name'],
-                                'last_modified': datetime.utcnow(),
-                                'is_processed': False
-                            }}
-                        )
+                    # Un cambio de nombre y un movimiento de lista se guardan en una sola actualización
+                    updated_fields = {}
+                    for change in changes:
+                        if change.field == card_diff.FIELD_NAME:
+                            # Nombre modificado
+                            modified_cards.append({
+                                'card': card,
+                                'previous': prev_state,
+                                'change_type': 'name'
+                            })
+                            updated_fields['name'] = card['name']
+                        elif change.field == card_diff.FIELD_LIST:
+                            # Tarjeta movida a otra lista
+                            moved_cards.append({
+                                'card': card,
+                                'previous': prev_state,
+                                'change_type': 'list',
+                                'from_list': change.old,
+                                'to_list': change.new
+                            })
+                            updated_fields['id_list'] = card['id_list']
                     
-                    if prev_state['id_list'] != card['id_list']:
-                        # Tarjeta movida a otra lista
-                        moved_cards.append({
-                            'card': card,
-                            'previous': prev_state,
-                            'change_type': 'list',
-                            'from_list': prev_state['id_list'],
-                            'to_list': card['id_list']
-                        })
-                        
-                        # Actualizar estado
-                        db.card_states.update_one(
-                            {'_id': prev_state['_id']},
-                            {'$set': {
-                                'id_list': card['id_list'],
-                                'last_modified': datetime.utcnow(),
-                                'is_processed': False
-                            }}
-                        )
+                    if updated_fields:
+                        updated_fields.update({'last_modified': now, 'is_processed': False})
+                        operations.append(UpdateOne({'_id': prev_state['_id']}, {'$set': updated_fields}))
+            
+            # Guardar todos los cambios en una sola ida y vuelta a la base de datos
+            if operations:
+                db.card_states.bulk_write(operations, ordered=False)
             
             # Actualizar la fecha de última comprobación
             db.integrations.update_one(
@@ -522,18 +536,12 @@ def get_pending_changes(current_user_id, integration_id):
         
         # Obtener información sobre las listas
         try:
-            lists_response = requests.get(
-                f"{os.environ.get('WEBHOOK_BASE_URL')}/api/debug/trello/board/{integration['trello_board_id']}/details",
-                headers={"Accept": "application/json"}
-            )
+            lists_data = board_cards.get_board_lists(integration['trello_board_id'])
+            lists_dict = {lst['id']: lst['name'] for lst in lists_data}
             
-            if lists_response.status_code == 200:
-                lists_data = lists_response.json().get('lists', [])
-                lists_dict = {lst['id']: lst['name'] for lst in lists_data}
-                
-                # Añadir nombres de listas a las tarjetas
-                for card in pending_cards:
-                    card['list_name'] = lists_dict.get(card['id_list'], 'Lista desconocida')
+            # Añadir nombres de listas a las tarjetas
+            for card in pending_cards:
+                card['list_name'] = lists_dict.get(card['id_list'], 'Lista desconocida')
         except Exception as e:
             current_app.logger.warning(f"Error al obtener nombres de listas: {e}")
             # No fallamos la operación completa por esto
@@ -745,6 +753,105 @@ def map_card_channel():
             'message': f'Error al mapear tarjeta-canal: {str(e)}'
         }), 500
 
+# Nombre y color de la etiqueta que marca las tarjetas confirmadas
+CONFIRMED_LABEL_NAME = 'Confirmado'
+CONFIRMED_LABEL_COLOR = 'green'
+
+def get_card_board_id(card_id, api_key, token):
+    """
+    Obtiene el tablero de una tarjeta, consultando Trello solo si no está en caché
+    """
+    board_id = board_cache.get_card_board(card_id)
+    if board_id:
+        return board_id
+    card_details_url = f"https://api.trello.com/1/cards/{card_id}"
+    card_details_params = {
+        'key': api_key,
+        'token': token,
+        'fields': 'idBoard'
+    }
+    with timed('trello.confirmation.card_details'):
+        card_response = trello_http.get(card_details_url, params=card_details_params)
+    if card_response.status_code != 200:
+        current_app.logger.error(f"[Trello] Error al obtener el tablero de la tarjeta {card_id}: HTTP {card_response.status_code}")
+        return None
+    board_id = card_response.json().get('idBoard')
+    board_cache.set_card_board(card_id, board_id)
+    return board_id
+
+def get_confirmed_label_id(board_id, api_key, token):
+    """
+    Obtiene (o crea) la etiqueta "Confirmado" de un tablero.
+    Devuelve (label_id, desde_cache).
+    """
+    label_id = board_cache.find_label(board_id, CONFIRMED_LABEL_NAME, CONFIRMED_LABEL_COLOR)
+    if label_id:
+        return label_id, True
+    
+    labels_url = f"https://api.trello.com/1/boards/{board_id}/labels"
+    labels_params = {
+        'key': api_key,
+        'token': token,
+        'fields': 'id,name,color'
+    }
+    with timed('trello.confirmation.board_labels'):
+        labels_response = trello_http.get(labels_url, params=labels_params)
+    if labels_response.status_code != 200:
+        current_app.logger.error(f"[Trello] Error al obtener las etiquetas del tablero {board_id}: HTTP {labels_response.status_code}")
+        return None, False
+    board_cache.set_labels(board_id, labels_response.json())
+    label_id = board_cache.find_label(board_id, CONFIRMED_LABEL_NAME, CONFIRMED_LABEL_COLOR)
+    if label_id:
+        return label_id, False
+    
+    # Si no existe, crear la etiqueta
+    create_label_params = {
+        'key': api_key,
+        'token': token,
+        'name': CONFIRMED_LABEL_NAME,
+        'color': CONFIRMED_LABEL_COLOR,
+        'idBoard': board_id
+    }
+    current_app.logger.info(f"[Trello] Creando etiqueta {CONFIRMED_LABEL_NAME} en el tablero {board_id}")
+    with timed('trello.confirmation.create_label'):
+        create_label_response = trello_http.post("https://api.trello.com/1/labels", params=create_label_params)
+    if create_label_response.status_code != 200:
+        current_app.logger.error(f"[Trello] No se pudo crear la etiqueta: HTTP {create_label_response.status_code}")
+        return None, False
+    label = create_label_response.json()
+    board_cache.add_label(board_id, label)
+    return label.get('id'), False
+
+def add_confirmed_label(card_id, api_key, token):
+    """
+    Añade la etiqueta "Confirmado" a una tarjeta. Con la caché caliente es una
+    sola llamada a Trello.
+    """
+    board_id = get_card_board_id(card_id, api_key, token)
+    if not board_id:
+        return False
+    label_id, from_cache = get_confirmed_label_id(board_id, api_key, token)
+    if not label_id:
+        return False
+    
+    add_label_url = f"https://api.trello.com/1/cards/{card_id}/idLabels"
+    with timed('trello.confirmation.add_label'):
+        add_label_response = trello_http.post(add_label_url, params={'key': api_key, 'token': token, 'value': label_id})
+    if add_label_response.status_code != 200 and from_cache:
+        # La etiqueta en caché puede haberse borrado: recargar y reintentar una vez
+        current_app.logger.warning(f"[Trello] Etiqueta en caché {label_id} rechazada (HTTP {add_label_response.status_code}); recargando etiquetas")
+        board_cache.invalidate_labels(board_id)
+        label_id, _ = get_confirmed_label_id(board_id, api_key, token)
+        if not label_id:
+            return False
+        with timed('trello.confirmation.add_label'):
+            add_label_response = trello_http.post(add_label_url, params={'key': api_key, 'token': token, 'value': label_id})
+    if add_label_response.status_code != 200:
+        current_app.logger.error(f"[Trello] Error al añadir etiqueta a la tarjeta: HTTP {add_label_response.status_code}")
+        return False
+    current_app.logger.info(f"[Trello] Etiqueta {CONFIRMED_LABEL_NAME} añadida a la tarjeta {card_id}")
+    return True
+
 # Función para actualizar una tarjeta de Trello cuando un usuario confirma
 def update_trello_card_with_confirmation(card_id, user_id, action="confirm"):
     """
@@ -782,80 +889,22 @@ def update_trello_card_with_confirmation(card_id, user_id, action="confirm"):
             }
             current_app.logger.info(f"[Trello] Enviando comentario a {comment_url} con params {comment_params}")
             
-            comment_response = requests.post(comment_url, params=comment_params)
+            with timed('trello.confirmation.comment'):
+                comment_response = trello_http.post(comment_url, params=comment_params)
             current_app.logger.info(f"[Trello] Respuesta de comentario: status={comment_response.status_code}, body={comment_response.text}")
             
             if comment_response.status_code != 200:
                 current_app.logger.error(f"[Trello] Error al añadir comentario a la tarjeta: HTTP {comment_response.status_code}")
                 return False
             
-            # Opcionalmente, añadir una etiqueta verde a la tarjeta
-            card_details_url = f"https://api.trello.com/1/cards/{card_id}"
-            card_details_params = {
-                'key': api_key,
-                'token': token,
-                'fields': 'idBoard'
-            }
-            current_app.logger.info(f"[Trello] Obteniendo detalles de la tarjeta: {card_details_url} params={card_details_params}")
-            card_response = requests.get(card_details_url, params=card_details_params)
-            current_app.logger.info(f"[Trello] Respuesta detalles tarjeta: status={card_response.status_code}, body={card_response.text}")
+            # La acción de comentario devuelta ya indica el tablero de la tarjeta
+            try:
+                board_cache.set_card_board(card_id, comment_response.json().get('data', {}).get('board', {}).get('id'))
+            except ValueError:
+                pass
             
-            if card_response.status_code == 200:
-                board_id = card_response.json().get('idBoard')
-                
-                # Obtener o crear una etiqueta verde de "Confirmado"
-                labels_url = f"https://api.trello.com/1/boards/{board_id}/labels"
-                labels_params = {
-                    'key': api_key,
-                    'token': token
-                }
-                current_app.logger.info(f"[Trello] Obteniendo etiquetas del tablero: {labels_url} params={labels_params}")
-                labels_response = requests.get(labels_url, params=labels_params)
-                current_app.logger.info(f"[Trello] Respuesta etiquetas: status={labels_response.status_code}, body={labels_response.text}")
-                
-                if labels_response.status_code == 200:
-                    labels = labels_response.json()
-                    confirmed_label_id = None
-                    
-                    # Buscar una etiqueta verde con nombre "Confirmado"
-                    for label in labels:
-                        if label.get('color') == 'green' and label.get('name') == 'Confirmado':
-                            confirmed_label_id = label.get('id')
-                            break
-                    
-                    # Si no existe, crear la etiqueta
-                    if not confirmed_label_id:
-                        create_label_url = f"https://api.trello.com/1/labels"
-                        create_label_params = {
-                            'key': api_key,
-                            'token': token,
-                            'name': 'Confirmado',
-                            'color': 'green',
-                            'idBoard': board_id
-                        }
-                        current_app.logger.info(f"[Trello] Creando etiqueta: {create_label_url} params={create_label_params}")
-                        create_label_response = requests.post(create_label_url, params=create_label_params)
-                        current_app.logger.info(f"[Trello] Respuesta crear etiqueta: status={create_label_response.status_code}, body={create_label_response.text}")
-                        
-                        if create_label_response.status_code == 200:
-                            confirmed_label_id = create_label_response.json().get('id')
-                        else:
-                            current_app.logger.error(f"[Trello] No se pudo crear la etiqueta: HTTP {create_label_response.status_code}")
-                    
-                    # Añadir la etiqueta a la tarjeta
-                    if confirmed_label_id:
-                        add_label_url = f"https://api.trello.com/1/cards/{card_id}/idLabels"
-                        add_label_params = {
-                            'key': api_key,
-                            'token': token,
-                            'value': confirmed_label_id
-                        }
-                        current_app.logger.info(f"[Trello] Añadiendo etiqueta a la tarjeta: {add_label_url} params={add_label_params}")
-                        add_label_response = requests.post(add_label_url, params=add_label_params)
-                        current_app.logger.info(f"[Trello] Respuesta añadir etiqueta: status={add_label_response.status_code}, body={add_label_response.text}")
-                        
-                        if add_label_response.status_code != 200:
-                            current_app.logger.error(f"[Trello] Error al añadir etiqueta a la tarjeta: HTTP {add_label_response.status_code}")
+            # Añadir la etiqueta verde "Confirmado"; el tablero y la etiqueta salen de la caché
+            add_confirmed_label(card_id, api_key, token)
             
             current_app.logger.info(f"[Trello] Tarjeta {card_id} confirmada por usuario Discord {user_id} (Trello: {trello_user_id})")
             return True
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
-from app.services.places_service import search_places, get_place_details, subdivide_area_search, search_places_by_type, subdivide_area_search_by_type, get_place_autocomplete, get_query_autocomplete
+from app.services.places_service import search_places, get_place_details, subdivide_area_search, search_places_by_type, subdivide_area_search_by_type, get_place_autocomplete, get_query_autocomplete, run_full_search, text_query, type_query
 from app.services.geocoding_service import geocode_address
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import os
@@ -186,7 +186,6 @@ def search_full():
     try:
         # Geocodificar la dirección
         geo = geocode_address(address)
-        latlng = f"{geo['lat']},{geo['lng']}"
         
         # Aplicar límite de radio
         original_radius = radius
@@ -195,80 +194,19 @@ def search_full():
         if original_radius != radius:
             logger.info(f"Ajustando radio de búsqueda de {original_radius}m a {radius}m (límite de API)")
         
-        logger.info(f"BÚSQUEDA COMPLETA MASIVA INICIADA: '{query}' en {address} con radio={radius}m")
-        
-        # 1. Primero hacemos una búsqueda normal con fetch_all=True
-        logger.info(f"Paso 1 - Búsqueda estándar con radio {radius}m para '{query}'")
-        standard_results, _ = search_places(query, latlng, radius, 60, None, True)
-        logger.info(f"Paso 1 completado: {len(standard_results)} resultados encontrados con búsqueda estándar")
-        
-        # 2. Luego hacemos búsqueda subdividida recursiva 
-        logger.info(f"Paso 2 - Búsqueda subdividida avanzada con radio {radius}m para '{query}'")
-        
-        # Determinar profundidad máxima de recursión según el radio
-        # Para radios grandes usamos más niveles de recursión
-        max_depth = 2  # Valor por defecto
-        
-        if radius < 5000:
-            max_depth = 1  # Menos divisiones para radios pequeños
-        elif radius > 25000:
-            max_depth = 3  # Más divisiones para radios grandes
-            
-        logger.info(f"Usando profundidad máxima de recursión: {max_depth} para radio {radius}m")
-        
-        # Llamar a la función de búsqueda subdividida con recursión
-        subdivided_results, _ = subdivide_area_search(
-            query, geo['lat'], geo['lng'], radius, max_results, max_depth
-        )
-        
-        logger.info(f"Paso 2 completado: {len(subdivided_results)} resultados encontrados con búsqueda subdividida avanzada")
-        
-        # Combinar resultados y eliminar duplicados
-        all_results = []
-        place_ids = set()
-        
-        # Procesar resultados estándar
-        standard_count = 0
-        for result in standard_results:
-            place_id = result.get("place_id")
-            if place_id and place_id not in place_ids:
-                place_ids.add(place_id)
-                all_results.append(result)
-                standard_count += 1
-                
-        logger.info(f"Añadidos {standard_count} resultados únicos de la búsqueda estándar")
-                
-        # Procesar resultados de búsqueda subdividida
-        duplicados = 0
-        nuevos = 0
-        for result in subdivided_results:
-            place_id = result.get("place_id")
-            if place_id and place_id not in place_ids:
-                place_ids.add(place_id)
-                all_results.append(result)
-                nuevos += 1
-            else:
-                duplicados += 1
-        
-        logger.info(f"Combinación de resultados: {nuevos} nuevos lugares añadidos de la búsqueda subdividida, {duplicados} duplicados omitidos")
-        logger.info(f"BÚSQUEDA COMPLETA MASIVA FINALIZADA: '{query}' - Total {len(all_results)} resultados únicos")
-        
-        # Limitar resultados finales si exceden el máximo solicitado
-        if len(all_results) > max_results:
-            logger.info(f"Limitando resultados a {max_results} (de {len(all_results)} encontrados)")
-            all_results = all_results[:max_results]
+        full = run_full_search(text_query(query), geo['lat'], geo['lng'], radius, max_results)
         
         return jsonify({
-            "results": all_results,
+            "results": full['results'],
             "next_page_token": None,
             "full_search": True,
-            "total_results": len(all_results),
-            "standard_results": len(standard_results),
-            "subdivided_results": len(subdivided_results),
-            "nuevos_de_subdivision": nuevos,
+            "total_results": len(full['results']),
+            "standard_results": full['standard_results'],
+            "subdivided_results": full['subdivided_results'],
+            "nuevos_de_subdivision": full['nuevos_de_subdivision'],
             "radio_usado": radius,
             "radio_solicitado": original_radius,
-            "max_depth_usado": max_depth
+            "max_depth_usado": full['max_depth']
         })
     except Exception as e:
         logger.error(f"Error en búsqueda completa: {str(e)}")
@@ -289,7 +227,6 @@ def search_by_type_full():
     try:
         # Geocodificar la dirección
         geo = geocode_address(address)
-        latlng = f"{geo['lat']},{geo['lng']}"
         
         # Aplicar límite de radio
         original_radius = radius
@@ -298,81 +235,20 @@ def search_by_type_full():
         if original_radius != radius:
             logger.info(f"Ajustando radio de búsqueda de {original_radius}m a {radius}m (límite de API)")
         
-        logger.info(f"BÚSQUEDA COMPLETA POR TIPO INICIADA: '{place_type}' en {address} con radio={radius}m")
-        
-        # 1. Primero hacemos una búsqueda normal con fetch_all=True
-        logger.info(f"Paso 1 - Búsqueda estándar por tipo con radio {radius}m para '{place_type}'")
-        standard_results, _ = search_places_by_type(place_type, latlng, radius, 60, None, True)
-        logger.info(f"Paso 1 completado: {len(standard_results)} resultados encontrados con búsqueda estándar por tipo")
-        
-        # 2. Luego hacemos búsqueda subdividida recursiva
-        logger.info(f"Paso 2 - Búsqueda subdividida avanzada por tipo con radio {radius}m para '{place_type}'")
-        
-        # Determinar profundidad máxima de recursión según el radio
-        # Para radios grandes usamos más niveles de recursión
-        max_depth = 2  # Valor por defecto
-        
-        if radius < 5000:
-            max_depth = 1  # Menos divisiones para radios pequeños
-        elif radius > 25000:
-            max_depth = 3  # Más divisiones para radios grandes
-            
-        logger.info(f"Usando profundidad máxima de recursión: {max_depth} para radio {radius}m")
-        
-        # Llamar a la función de búsqueda subdividida con recursión
-        subdivided_results, _ = subdivide_area_search_by_type(
-            place_type, geo['lat'], geo['lng'], radius, max_results, max_depth
-        )
-        
-        logger.info(f"Paso 2 completado: {len(subdivided_results)} resultados encontrados con búsqueda subdividida avanzada por tipo")
-        
-        # Combinar resultados y eliminar duplicados
-        all_results = []
-        place_ids = set()
-        
-        # Procesar resultados estándar
-        standard_count = 0
-        for result in standard_results:
-            place_id = result.get("place_id")
-            if place_id and place_id not in place_ids:
-                place_ids.add(place_id)
-                all_results.append(result)
-                standard_count += 1
-                
-        logger.info(f"Añadidos {standard_count} resultados únicos de la búsqueda estándar por tipo")
-                
-        # Procesar resultados de búsqueda subdividida
-        duplicados = 0
-        nuevos = 0
-        for result in subdivided_results:
-            place_id = result.get("place_id")
-            if place_id and place_id not in place_ids:
-                place_ids.add(place_id)
-                all_results.append(result)
-                nuevos += 1
-            else:
-                duplicados += 1
-        
-        logger.info(f"Combinación de resultados: {nuevos} nuevos lugares añadidos de la búsqueda subdividida por tipo, {duplicados} duplicados omitidos")
-        logger.info(f"BÚSQUEDA COMPLETA POR TIPO FINALIZADA: '{place_type}' - Total {len(all_results)} resultados únicos")
-        
-        # Limitar resultados finales si exceden el máximo solicitado
-        if len(all_results) > max_results:
-            logger.info(f"Limitando resultados a {max_results} (de {len(all_results)} encontrados)")
-            all_results = all_results[:max_results]
+        full = run_full_search(type_query(place_type), geo['lat'], geo['lng'], radius, max_results)
         
         return jsonify({
-            "results": all_results,
+            "results": full['results'],
             "next_page_token": None,
             "full_search": True,
             "type": place_type,
-            "total_results": len(all_results),
-            "standard_results": len(standard_results),
-            "subdivided_results": len(subdivided_results),
-            "nuevos_de_subdivision": nuevos,
+            "total_results": len(full['results']),
+            "standard_results": full['standard_results'],
+            "subdivided_results": full['subdivided_results'],
+            "nuevos_de_subdivision": full['nuevos_de_subdivision'],
             "radio_usado": radius,
             "radio_solicitado": original_radius,
-            "max_depth_usado": max_depth
+            "max_depth_usado": full['max_depth']
         })
     except Exception as e:
         logger.error(f"Error en búsqueda completa por tipo: {str(e)}")
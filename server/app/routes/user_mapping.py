@@ -2,7 +2,9 @@ from flask import Blueprint, request, jsonify, current_app
 from bson.objectid import ObjectId
 import jwt
 from app.models.user_mapping import UserMapping
-from app.routes.integration import token_required, get_trello_service, get_discord_service
+from app.routes.integration import token_required, get_discord_service
+from app.routes.debug import get_board_member_directory
+from app.services.mapping_index import notify_mappings_changed
 
 user_mapping_bp = Blueprint('user_mapping', __name__)
 
@@ -24,16 +26,18 @@ def get_trello_users(current_user_id, integration_id):
         if not integration:
             return jsonify({'message': 'Integración no encontrada'}), 404
         
-        # Obtener usuarios de Trello
-        trello_users = get_trello_service().get_board_members(integration['trello_board_id'])
+        # Obtener usuarios de Trello del directorio de miembros del tablero (en caché)
+        trello_users = get_board_member_directory(integration['trello_board_id'])
+        if trello_users is None:
+            return jsonify({'message': 'Error al obtener usuarios de Trello'}), 500
         
         # Formatear usuarios
         formatted_users = []
         for user in trello_users:
             formatted_users.append({
-                'id': user.id,
-                'username': user.username,
-                'full_name': user.full_name
+                'id': user['id'],
+                'username': user['username'],
+                'full_name': user['fullName']
             })
         
         return jsonify({'trello_users': formatted_users}), 200
@@ -101,10 +105,10 @@ def create_user_mapping(current_user_id, integration_id):
             return jsonify({'message': 'Ya existe un mapeo para este usuario de Trello'}), 400
         
         # Obtener información de los usuarios
-        trello_users = get_trello_service().get_board_members(integration['trello_board_id'])
+        trello_users = get_board_member_directory(integration['trello_board_id']) or []
         discord_users = get_discord_service().get_guild_members_sync(integration['discord_server_id'])
         
-        trello_user = next((u for u in trello_users if u.id == data['trello_user_id']), None)
+        trello_user = next((u for u in trello_users if u['id'] == data['trello_user_id']), None)
         discord_user = next((u for u in discord_users if u['id'] == data['discord_user_id']), None)
         
         if not trello_user:
@@ -116,7 +120,7 @@ def create_user_mapping(current_user_id, integration_id):
         # Crear mapeo
         user_mapping = UserMapping(
             trello_user_id=data['trello_user_id'],
-            trello_username=trello_user.username,
+            trello_username=trello_user['username'],
             discord_user_id=data['discord_user_id'],
             discord_username=discord_user['username'],
             integration_id=ObjectId(integration_id),
@@ -125,6 +129,7 @@ def create_user_mapping(current_user_id, integration_id):
         
         # Guardar en base de datos
         mapping_id = db.user_mappings.insert_one(user_mapping.to_dict()).inserted_id
+        notify_mappings_changed(db)
         
         return jsonify({
             'message': 'Mapeo de usuario creado exitosamente',
@@ -192,6 +197,7 @@ def delete_user_mapping(current_user_id, mapping_id):
         
         # Eliminar mapeo
         db.user_mappings.delete_one({'_id': ObjectId(mapping_id)})
+        notify_mappings_changed(db)
         
         return jsonify({'message': 'Mapeo eliminado exitosamente'}), 200
     except Exception as e:
@@ -257,6 +263,7 @@ def create_direct_mapping(current_user_id):
         
         # Guardar en base de datos
         mapping_id = db.user_mappings.insert_one(user_mapping.to_dict()).inserted_id
+        notify_mappings_changed(db)
         
         current_app.logger.info(f"Mapeo directo creado con éxito, ID: {mapping_id}")
         
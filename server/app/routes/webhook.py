@@ -1,18 +1,162 @@
 from flask import Blueprint, request, jsonify, current_app
 from bson.objectid import ObjectId
+import os
 import re
+from app import app
 from app.models.card_channel_mapping import CardChannelMapping
-from app.routes.integration import get_discord_service, get_trello_service
+from app.routes.integration import get_discord_service
+from app.services import board_cards
+from app.services import card_diff
+from app.services.card_diff import diff_cards
+from app.services.webhook_queue import WebhookQueue, PermanentWebhookError
+from app.services.webhook_dedup import ActionDeduplicator
+from app.services.board_cache import board_cache
 
 webhook_bp = Blueprint('webhook', __name__)
 
+# Acciones de Trello que generan un canal de Discord
+WEBHOOK_ACTION_TYPES = ['createCard', 'updateCard', 'addMemberToCard']
+
+def extract_webhook_target(action):
+    """
+    Obtiene la tarjeta, el tablero y el miembro asignado de una acción de Trello
+    """
+    card_id = None
+    board_id = None
+    member_id = None
+    data = action.get('data', {})
+    
+    # Extraer información según el tipo de acción
+    if action['type'] == 'createCard':
+        card_id = data.get('card', {}).get('id')
+        board_id = data.get('board', {}).get('id')
+    elif action['type'] == 'updateCard':
+        card_id = data.get('card', {}).get('id')
+        board_id = data.get('board', {}).get('id')
+        # Verificar si la actualización es una asignación de miembro
+        if 'idMembers' in data.get('old', {}) and 'idMembers' in data.get('card', {}):
+            changes = diff_cards(data['old'], data['card'], fields=(card_diff.FIELD_MEMBERS,))
+            # Si se añadió un nuevo miembro
+            for change in changes:
+                if change.added:
+                    member_id = change.added[0]
+    elif action['type'] == 'addMemberToCard':
+        card_id = data.get('card', {}).get('id')
+        board_id = data.get('board', {}).get('id')
+        member_id = data.get('member', {}).get('id')
+    
+    return card_id, board_id, member_id
+
+def process_trello_webhook(data):
+    """
+    Procesa un webhook de Trello encolado: crea el canal de Discord de la tarjeta,
+    envía el mensaje inicial y guarda el mapeo. Se ejecuta en un trabajador de la
+    cola; una excepción provoca un reintento, salvo PermanentWebhookError y los
+    errores de programación, que marcan el evento como fallido.
+    """
+    action = data['action']
+    card_id, board_id, member_id = extract_webhook_target(action)
+    
+    # Buscar la integración para este tablero
+    db = current_app.config['MONGO_DB']
+    integration = db.integrations.find_one({'trello_board_id': board_id})
+    
+    if not integration:
+        return 'No existe integración para este tablero'
+    
+    # Verificar si ya existe un mapeo para esta tarjeta
+    existing_mapping = db.card_channel_mappings.find_one({
+        'trello_card_id': card_id,
+        'integration_id': integration['_id']
+    })
+    
+    if existing_mapping:
+        # Si la tarjeta ya tiene un canal asociado, no hacemos nada
+        return 'La tarjeta ya tiene un canal asociado'
+    
+    # Obtener detalles de la tarjeta
+    try:
+        card_details = board_cards.get_card(card_id, fields='name,desc,url')
+    except ValueError as e:
+        raise PermanentWebhookError(str(e))
+    except board_cards.TrelloRequestError as e:
+        # Una tarjeta borrada o sin permisos no aparecerá reintentando; los límites
+        # de peticiones y los errores del servidor de Trello sí son transitorios
+        if e.status_code and 400 <= e.status_code < 500 and e.status_code != 429:
+            raise PermanentWebhookError(str(e))
+        raise
+    
+    # Sanitizar el nombre de la tarjeta para usarlo como nombre del canal
+    card_name = card_details['name'] or ''
+    card_desc = card_details['description']
+    card_url = card_details['url']
+    
+    # Si tenemos un miembro asignado, buscar su mapeo en Discord
+    discord_user_id = None
+    if member_id:
+        user_mapping = db.user_mappings.find_one({
+            'trello_user_id': member_id,
+            'integration_id': integration['_id']
+        })
+        
+        if user_mapping:
+            discord_user_id = user_mapping['discord_user_id']
+    
+    # Crear un canal en Discord
+    channel_name = f"{card_id[-4:]}-{re.sub(r'[^a-zA-Z0-9]', '-', card_name.lower())}"
+    channel = get_discord_service().create_channel_sync(
+        integration['discord_server_id'],
+        channel_name[:32]  # Discord tiene un límite de 32 caracteres para nombres de canales
+    )
+    
+    if not channel:
+        raise RuntimeError(f'No se pudo crear el canal en Discord para la tarjeta {card_id}')
+    
+    # Enviar mensaje al canal con información de la tarjeta
+    message_content = f"**Nueva tarea de Trello: {card_name}**\n\n"
+    if card_desc:
+        message_content += f"Descripción: {card_desc}\n\n"
+    message_content += f"Enlace: {card_url}"
+    
+    message = get_discord_service().send_message_sync(
+        channel['id'],
+        message_content,
+        discord_user_id
+    )
+    
+    # Guardar el mapeo entre la tarjeta y el canal
+    card_channel_mapping = CardChannelMapping(
+        trello_card_id=card_id,
+        trello_card_name=card_name,
+        discord_channel_id=channel['id'],
+        discord_channel_name=channel['name'],
+        integration_id=integration['_id'],
+        trello_member_id=member_id,
+        discord_message_id=message['id'] if message else None,
+        created_automatically=True
+    )
+    
+    db.card_channel_mappings.insert_one(card_channel_mapping.to_dict())
+    
+    return 'Webhook procesado exitosamente'
+
+# Cola persistente de webhooks procesada en segundo plano
+webhook_queue = WebhookQueue(
+    app,
+    process_trello_webhook,
+    workers=int(os.environ.get('WEBHOOK_WORKERS', 2))
+)
+
+# Deduplicación de acciones reenviadas por Trello
+action_deduplicator = ActionDeduplicator(app.config['MONGO_DB'])
+
 @webhook_bp.route('/trello', methods=['POST'])
 def trello_webhook():
     """
-    Recibe y procesa los webhooks de Trello
+    Recibe los webhooks de Trello, los valida y los encola para procesarlos en segundo plano
     """
     try:
-        data = request.json
+        data = request.get_json(silent=True)
         
         # Verificar si el webhook es para una tarjeta y una acción que nos interese
         if not data or 'action' not in data or 'model' not in data:
@@ -20,121 +164,65 @@ def trello_webhook():
         
         action = data['action']
         
-        # Solo procesar acciones de creación o asignación de tarjetas
-        if action['type'] not in ['createCard', 'updateCard', 'addMemberToCard']:
-            return jsonify({'message': f"Acción {action['type']} no procesada"}), 200
+        # Invalidar las etiquetas, miembros y tableros en caché afectados por la acción
+        board_cache.invalidate_from_action(action)
+        if action.get('type') == 'addMemberToCard':
+            board_cache.remember_member(action.get('member'))
         
-        # Obtener la tarjeta y el tablero
-        card_id = None
-        board_id = None
-        member_id = None
+        # Solo procesar acciones de creación o asignación de tarjetas
+        if action.get('type') not in WEBHOOK_ACTION_TYPES:
+            return jsonify({'message': f"Acción {action.get('type')} no procesada"}), 200
         
-        # Extraer información según el tipo de acción
-        if action['type'] == 'createCard':
-            card_id = action['data']['card']['id']
-            board_id = action['data']['board']['id']
-        elif action['type'] == 'updateCard':
-            card_id = action['data']['card']['id']
-            board_id = action['data']['board']['id']
-            # Verificar si la actualización es una asignación de miembro
-            if 'idMembers' in action['data']['old'] and 'idMembers' in action['data']['card']:
-                old_members = set(action['data']['old'].get('idMembers', []))
-                new_members = set(action['data']['card'].get('idMembers', []))
-                # Si se añadió un nuevo miembro
-                added_members = new_members - old_members
-                if added_members:
-                    member_id = list(added_members)[0]
-        elif action['type'] == 'addMemberToCard':
-            card_id = action['data']['card']['id']
-            board_id = action['data']['board']['id']
-            member_id = action['data']['member']['id']
+        card_id, board_id, _ = extract_webhook_target(action)
         
         if not card_id or not board_id:
             return jsonify({'message': 'Datos insuficientes para procesar el webhook'}), 200
         
-        # Buscar la integración para este tablero
-        db = current_app.config['MONGO_DB']
-        integration = db.integrations.find_one({'trello_board_id': board_id})
-        
-        if not integration:
-            return jsonify({'message': 'No existe integración para este tablero'}), 200
-        
-        # Verificar si ya existe un mapeo para esta tarjeta
-        existing_mapping = db.card_channel_mappings.find_one({
-            'trello_card_id': card_id,
-            'integration_id': integration['_id']
-        })
+        # Los reenvíos de una acción ya recibida no se vuelven a procesar
+        action_id = action.get('id')
+        if not action_deduplicator.claim(action_id):
+            return jsonify({'message': 'Acción duplicada ignorada', 'action_id': action_id}), 200
         
-        if existing_mapping:
-            # Si la tarjeta ya tiene un canal asociado, no hacemos nada
-            return jsonify({'message': 'La tarjeta ya tiene un canal asociado'}), 200
+        try:
+            event_id = webhook_queue.enqueue(data)
+        except Exception:
+            # Liberar la acción para que el reintento de Trello pueda encolarla
+            action_deduplicator.release(action_id)
+            raise
         
-        # Obtener detalles de la tarjeta
-        card_details = get_trello_service().get_card(card_id)
-        
-        if not card_details:
-            return jsonify({'message': 'No se pudo obtener información de la tarjeta'}), 200
-        
-        # Sanitizar el nombre de la tarjeta para usarlo como nombre del canal
-        card_name = card_details['name']
-        card_desc = card_details.get('desc', '')
-        card_url = card_details['url']
-        
-        # Si tenemos un miembro asignado, buscar su mapeo en Discord
-        discord_user_id = None
-        if member_id:
-            user_mapping = db.user_mappings.find_one({
-                'trello_user_id': member_id,
-                'integration_id': integration['_id']
-            })
-            
-            if user_mapping:
-                discord_user_id = user_mapping['discord_user_id']
-        
-        # Crear un canal en Discord
-        channel_name = f"{card_id[-4:]}-{re.sub(r'[^a-zA-Z0-9]', '-', card_name.lower())}"
-        channel = get_discord_service().create_channel_sync(
-            integration['discord_server_id'],
-            channel_name[:32]  # Discord tiene un límite de 32 caracteres para nombres de canales
-        )
-        
-        if not channel:
-            return jsonify({'message': 'No se pudo crear el canal en Discord'}), 200
-        
-        # Enviar mensaje al canal con información de la tarjeta
-        message_content = f"**Nueva tarea de Trello: {card_name}**\n\n"
-        if card_desc:
-            message_content += f"Descripción: {card_desc}\n\n"
-        message_content += f"Enlace: {card_url}"
-        
-        message = get_discord_service().send_message_sync(
-            channel['id'],
-            message_content,
-            discord_user_id
-        )
-        
-        # Guardar el mapeo entre la tarjeta y el canal
-        card_channel_mapping = CardChannelMapping(
-            trello_card_id=card_id,
-            trello_card_name=card_name,
-            discord_channel_id=channel['id'],
-            discord_channel_name=channel['name'],
-            integration_id=integration['_id'],
-            trello_member_id=member_id,
-            discord_message_id=message['id'] if message else None,
-            created_automatically=True
-        )
-        
-        db.card_channel_mappings.insert_one(card_channel_mapping.to_dict())
-        
-        return jsonify({'message': 'Webhook procesado exitosamente'}), 200
+        return jsonify({'message': 'Webhook encolado', 'event_id': str(event_id)}), 200
     except Exception as e:
-        current_app.logger.error(f"Error al procesar webhook de Trello: {e}")
-        return jsonify({'message': f'Error al procesar webhook: {str(e)}'}), 500
+        current_app.logger.error(f"Error al encolar webhook de Trello: {e}")
+        return jsonify({'message': f'Error al encolar webhook: {str(e)}'}), 500
+
+@webhook_bp.route('/trello/queue', methods=['GET'])
+def trello_webhook_queue_status():
+    """
+    Obtiene el número de webhooks de la cola por estado
+    """
+    try:
+        return jsonify({
+            'status': 'success',
+            'queue': webhook_queue.stats(),
+            'deduplication': action_deduplicator.stats(),
+            'board_cache': board_cache.stats()
+        }), 200
+    except Exception as e:
+        current_app.logger.error(f"Error al obtener el estado de la cola de webhooks: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
 
 @webhook_bp.route('/trello', methods=['HEAD'])
 def trello_webhook_head():
     """
     Responde a las solicitudes HEAD para la verificación de webhook de Trello
     """
-    return '', 200 
\ No newline at end of file
+    return '', 200
+
+def start_webhook_workers():
+    """
+    Inicia los trabajadores de la cola. run.py la llama al arrancar para
+    procesar enseguida los eventos pendientes; con cualquier otro servidor los
+    trabajadores arrancan con el primer webhook encolado (WebhookQueue.enqueue).
+    Los índices de la cola y de deduplicación se declaran en db_indexes.
+    """
+    return webhook_queue.start()
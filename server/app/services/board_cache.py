@@ -0,0 +1,153 @@
+import logging
+import os
+
+from app.services.cache import LRUCache
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+# Acciones de Trello que modifican las etiquetas de un tablero
+LABEL_ACTION_TYPES = ('createLabel', 'updateLabel', 'deleteLabel')
+# Acciones de Trello que cambian los miembros de un tablero
+MEMBER_ACTION_TYPES = (
+    'addMemberToBoard', 'removeMemberFromBoard', 'makeAdminOfBoard',
+    'makeNormalMemberOfBoard', 'makeObserverOfBoard', 'updateMember'
+)
+# Acciones de Trello que cambian el tablero de una tarjeta
+CARD_BOARD_ACTION_TYPES = ('moveCardToBoard', 'moveCardFromBoard', 'deleteCard')
+
+class BoardCache:
+    """
+    Caché de datos de tableros de Trello que casi nunca cambian.
+
+    Guarda las etiquetas y el directorio de miembros de cada tablero y el
+    tablero de cada tarjeta para no repetir esas consultas en cada
+    confirmación o notificación. Las entradas caducan por TTL y se invalidan
+    antes al recibir los webhooks de etiquetas, de miembros del tablero o de
+    movimiento de tarjetas entre tableros.
+    """
+    def __init__(self, label_ttl=6 * 3600, card_board_ttl=24 * 3600, member_ttl=6 * 3600, maxsize=10000):
+        """
+        Args:
+            label_ttl: Segundos que se conservan las etiquetas de un tablero
+            card_board_ttl: Segundos que se conserva el tablero de una tarjeta
+            member_ttl: Segundos que se conservan los miembros de un tablero
+            maxsize: Número máximo de tarjetas y miembros en caché
+        """
+        self.labels = LRUCache(maxsize=1024, ttl=label_ttl)
+        self.card_boards = LRUCache(maxsize=maxsize, ttl=card_board_ttl)
+        self.members = LRUCache(maxsize=1024, ttl=member_ttl)
+        # Índice de miembros por ID, para resolverlos sin conocer el tablero
+        self.member_index = LRUCache(maxsize=maxsize, ttl=member_ttl)
+
+    def get_labels(self, board_id):
+        """
+        Devuelve las etiquetas en caché de un tablero o None
+        """
+        return self.labels.get(board_id)
+
+    def set_labels(self, board_id, labels):
+        self.labels.set(board_id, [
+            {'id': label.get('id'), 'name': label.get('name'), 'color': label.get('color')}
+            for label in labels
+        ])
+
+    def add_label(self, board_id, label):
+        """
+        Añade una etiqueta recién creada a las etiquetas en caché del tablero
+        """
+        labels = self.labels.get(board_id)
+        if labels is not None:
+            self.set_labels(board_id, labels + [label])
+
+    def find_label(self, board_id, name, color):
+        """
+        Busca una etiqueta por nombre y color en la caché. Devuelve su ID o None.
+        """
+        for label in self.labels.get(board_id) or []:
+            if label.get('name') == name and label.get('color') == color:
+                return label.get('id')
+        return None
+
+    def invalidate_labels(self, board_id):
+        self.labels.pop(board_id)
+
+    def get_card_board(self, card_id):
+        return self.card_boards.get(card_id)
+
+    def set_card_board(self, card_id, board_id):
+        if card_id and board_id:
+            self.card_boards.set(card_id, board_id)
+
+    def get_members(self, board_id):
+        """
+        Devuelve el directorio de miembros en caché de un tablero o None
+        """
+        return self.members.get(board_id)
+
+    def set_members(self, board_id, members):
+        members = [
+            {'id': member.get('id'), 'username': member.get('username'), 'fullName': member.get('fullName')}
+            for member in members
+        ]
+        self.members.set(board_id, members)
+        for member in members:
+            self.member_index.set(member['id'], member)
+
+    def find_member(self, member_id):
+        """
+        Busca un miembro por ID en la caché. Devuelve el miembro o None.
+        """
+        return self.member_index.get(member_id)
+
+    def remember_member(self, member):
+        """
+        Guarda un miembro obtenido por otra vía (consulta individual o webhook)
+        """
+        if member and member.get('id'):
+            self.member_index.set(member['id'], {
+                'id': member.get('id'),
+                'username': member.get('username'),
+                'fullName': member.get('fullName')
+            })
+
+    def invalidate_members(self, board_id):
+        self.members.pop(board_id)
+
+    def invalidate_from_action(self, action):
+        """
+        Invalida las entradas afectadas por una acción de webhook de Trello
+        """
+        action_type = action.get('type')
+        data = action.get('data', {})
+        if action_type in LABEL_ACTION_TYPES:
+            board_id = data.get('board', {}).get('id')
+            if board_id:
+                self.invalidate_labels(board_id)
+                logger.info(f"Etiquetas en caché del tablero {board_id} invalidadas por {action_type}")
+        elif action_type in MEMBER_ACTION_TYPES:
+            board_id = data.get('board', {}).get('id')
+            if board_id:
+                self.invalidate_members(board_id)
+            member_id = data.get('idMember') or data.get('member', {}).get('id')
+            if member_id:
+                self.member_index.pop(member_id)
+        elif action_type in CARD_BOARD_ACTION_TYPES:
+            card_id = data.get('card', {}).get('id')
+            if card_id:
+                self.card_boards.pop(card_id)
+
+    def stats(self):
+        return {
+            'labels': self.labels.stats(),
+            'card_boards': self.card_boards.stats(),
+            'members': self.members.stats(),
+            'member_index': self.member_index.stats()
+        }
+
+# Instancia compartida
+board_cache = BoardCache(
+    label_ttl=int(os.environ.get('TRELLO_LABEL_CACHE_TTL', 6 * 3600)),
+    card_board_ttl=int(os.environ.get('TRELLO_CARD_BOARD_CACHE_TTL', 24 * 3600)),
+    member_ttl=int(os.environ.get('TRELLO_MEMBER_CACHE_TTL', 6 * 3600))
+)
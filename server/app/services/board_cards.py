@@ -0,0 +1,113 @@
+import os
+
+from app.services.trello_client import trello_http
+
+# Campos de tarjeta que devuelve la API de tarjetas de un tablero
+CARD_FIELDS = 'id,name,desc,url,shortUrl,closed,idList,idBoard,due,labels'
+
+class TrelloRequestError(Exception):
+    """
+    Error de Trello al obtener datos de un tablero
+    """
+    def __init__(self, message, status_code=None, details=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.details = details
+
+def _credentials():
+    api_key = os.environ.get('TRELLO_API_KEY')
+    token = os.environ.get('TRELLO_TOKEN')
+    if not api_key or not token:
+        raise ValueError("Las credenciales de Trello no están configuradas")
+    return api_key, token
+
+def normalize_card(card):
+    """
+    Convierte una tarjeta de la API de Trello al formato de la aplicación
+    """
+    return {
+        'id': card.get('id'),
+        'name': card.get('name'),
+        'description': card.get('desc', ''),
+        'url': card.get('url'),
+        'short_url': card.get('shortUrl'),
+        'closed': card.get('closed', False),
+        'id_list': card.get('idList'),
+        'id_board': card.get('idBoard'),
+        'due': card.get('due'),
+        'labels': [{'id': label.get('id'), 'name': label.get('name', ''), 'color': label.get('color', '')}
+                   for label in card.get('labels', [])]
+    }
+
+def get_board_cards(board_id, fields=CARD_FIELDS):
+    """
+    Obtiene las tarjetas de un tablero ya normalizadas, sin pasar por la API HTTP propia
+
+    Args:
+        board_id: ID del tablero de Trello
+        fields: Campos que se piden a Trello; pedir solo los necesarios reduce la respuesta
+
+    Raises:
+        ValueError: Si las credenciales de Trello no están configuradas
+        TrelloRequestError: Si Trello responde con un error
+    """
+    api_key, token = _credentials()
+    response = trello_http.get(
+        f"boards/{board_id}/cards",
+        headers={"Accept": "application/json"},
+        params={'key': api_key, 'token': token, 'fields': fields}
+    )
+    if response.status_code != 200:
+        raise TrelloRequestError(
+            f'Error al obtener tarjetas: HTTP {response.status_code}',
+            status_code=response.status_code,
+            details=response.text
+        )
+    return [normalize_card(card) for card in response.json() or []]
+
+def get_card(card_id, fields='id,name,desc,url,idList,idBoard'):
+    """
+    Obtiene una tarjeta ya normalizada
+
+    Raises:
+        ValueError: Si las credenciales de Trello no están configuradas
+        TrelloRequestError: Si Trello responde con un error
+    """
+    api_key, token = _credentials()
+    response = trello_http.get(
+        f"cards/{card_id}",
+        headers={"Accept": "application/json"},
+        params={'key': api_key, 'token': token, 'fields': fields}
+    )
+    if response.status_code != 200:
+        raise TrelloRequestError(
+            f'Error al obtener la tarjeta {card_id}: HTTP {response.status_code}',
+            status_code=response.status_code,
+            details=response.text
+        )
+    return normalize_card(response.json() or {})
+
+def get_board_lists(board_id):
+    """
+    Obtiene las listas de un tablero: [{'id', 'name', 'closed'}]
+
+    Raises:
+        ValueError: Si las credenciales de Trello no están configuradas
+        TrelloRequestError: Si Trello responde con un error
+    """
+    api_key, token = _credentials()
+    response = trello_http.get(
+        f"boards/{board_id}/lists",
+        headers={"Accept": "application/json"},
+        params={'key': api_key, 'token': token, 'fields': 'id,name,closed'}
+    )
+    if response.status_code != 200:
+        raise TrelloRequestError(
+            f'Error al obtener listas: HTTP {response.status_code}',
+            status_code=response.status_code,
+            details=response.text
+        )
+    return [
+        {'id': lst.get('id'), 'name': lst.get('name'), 'closed': lst.get('closed', False)}
+        for lst in response.json() or []
+    ]
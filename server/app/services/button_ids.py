@@ -0,0 +1,50 @@
+import base64
+import hashlib
+import hmac
+
+# Prefijo y versión de los custom_id firmados
+PREFIX = 't2d1'
+SEPARATOR = ':'
+# Bytes de la firma HMAC-SHA256 que se conservan (96 bits)
+SIGNATURE_BYTES = 12
+# Longitud máxima de un custom_id en Discord
+MAX_CUSTOM_ID_LENGTH = 100
+
+def _sign(secret, payload):
+    digest = hmac.new(secret.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).decode('ascii').rstrip('=')
+
+def encode_button_id(trello_card_id, user_id, action, secret):
+    """
+    Codifica los datos de un botón de confirmación en un custom_id firmado.
+
+    Formato: t2d1:<trello_card_id>:<user_id>:<action>:<firma>, donde la firma
+    es un HMAC-SHA256 truncado del resto del identificador.
+    """
+    fields = [str(trello_card_id), str(user_id), str(action)]
+    if any(SEPARATOR in field for field in fields):
+        raise ValueError("Los datos del botón no pueden contener ':'")
+    payload = SEPARATOR.join([PREFIX] + fields)
+    custom_id = f"{payload}{SEPARATOR}{_sign(secret, payload)}"
+    if len(custom_id) > MAX_CUSTOM_ID_LENGTH:
+        raise ValueError(f"custom_id demasiado largo ({len(custom_id)} caracteres)")
+    return custom_id
+
+def decode_button_id(custom_id, secret):
+    """
+    Verifica y decodifica un custom_id firmado. Devuelve un diccionario con
+    trello_card_id, user_id y action, o None si no es un custom_id firmado o
+    la firma no es válida.
+    """
+    if not custom_id or not custom_id.startswith(PREFIX + SEPARATOR):
+        return None
+    payload, _, signature = custom_id.rpartition(SEPARATOR)
+    parts = payload.split(SEPARATOR)
+    if len(parts) != 4 or not hmac.compare_digest(signature, _sign(secret, payload)):
+        return None
+    _prefix, trello_card_id, user_id, action = parts
+    return {
+        'trello_card_id': trello_card_id,
+        'user_id': user_id,
+        'action': action
+    }
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Valor centinela para distinguir "no está en caché" de un valor None almacenado
+MISSING = object()
+
+class LRUCache:
+    """
+    Caché en memoria con política LRU y expiración opcional por TTL.
+
+    Es segura entre hilos y lleva contadores de aciertos y fallos para
+    poder exponerlos en los endpoints de diagnóstico.
+    """
+    def __init__(self, maxsize=1024, ttl=None):
+        """
+        Args:
+            maxsize: Número máximo de entradas antes de descartar la menos usada
+            ttl: Segundos de vida de cada entrada (None para no expirar)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """
+        Obtiene un valor y lo marca como usado recientemente
+        """
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is not MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=MISSING):
+        """
+        Guarda un valor. `ttl` permite sobrescribir el TTL por defecto de la caché.
+        """
+        ttl = self.ttl if ttl is MISSING else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, MISSING)
+        return default if entry is MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """
+        Devuelve el tamaño y los contadores de aciertos/fallos
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else None
+            }
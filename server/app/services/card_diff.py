@@ -0,0 +1,87 @@
+# Campos comparables de una tarjeta (nombres de la API de Trello)
+FIELD_NAME = 'name'
+FIELD_DESC = 'desc'
+FIELD_DUE = 'due'
+FIELD_LIST = 'idList'
+FIELD_LABELS = 'labels'
+FIELD_ATTACHMENTS = 'attachments'
+FIELD_MEMBERS = 'idMembers'
+
+ALL_FIELDS = (FIELD_NAME, FIELD_DESC, FIELD_DUE, FIELD_LIST, FIELD_LABELS, FIELD_ATTACHMENTS, FIELD_MEMBERS)
+
+# Resultado compartido cuando no hay cambios, para no crear objetos nuevos
+NO_CHANGES = ()
+
+class CardChange:
+    """
+    Cambio de un campo entre dos versiones de una tarjeta.
+
+    Los campos escalares (nombre, descripción, fecha, lista) usan `old` y `new`;
+    los campos de conjunto (etiquetas, adjuntos, miembros) usan `added` y `removed`.
+    """
+    __slots__ = ('field', 'old', 'new', 'added', 'removed')
+
+    def __init__(self, field, old=None, new=None, added=(), removed=()):
+        self.field = field
+        self.old = old
+        self.new = new
+        self.added = added
+        self.removed = removed
+
+    def to_dict(self):
+        return {
+            'field': self.field,
+            'old': self.old,
+            'new': self.new,
+            'added': list(self.added),
+            'removed': list(self.removed)
+        }
+
+    def __repr__(self):
+        return f"CardChange(field={self.field!r}, old={self.old!r}, new={self.new!r}, added={self.added!r}, removed={self.removed!r})"
+
+def _label_names(card):
+    return {label.get('name', '') for label in card.get('labels') or [] if label.get('name')}
+
+def _attachment_keys(card):
+    return {(a.get('id'), a.get('name')) for a in card.get('attachments') or []}
+
+def _diff_set(field, old_values, new_values, changes):
+    if old_values != new_values:
+        changes.append(CardChange(
+            field,
+            added=tuple(sorted(new_values - old_values, key=str)),
+            removed=tuple(sorted(old_values - new_values, key=str))
+        ))
+
+def diff_cards(old_card, new_card, fields=ALL_FIELDS, old_hash=None, new_hash=None):
+    """
+    Compara dos versiones de una tarjeta y devuelve la lista de cambios por campo.
+
+    Args:
+        old_card: Tarjeta anterior con el formato de la API de Trello
+        new_card: Tarjeta actual con el formato de la API de Trello
+        fields: Campos a comparar (por defecto todos)
+        old_hash: Hash de contenido de la tarjeta anterior, si se conoce
+        new_hash: Hash de contenido de la tarjeta actual, si se conoce
+
+    Returns:
+        Lista de CardChange, o NO_CHANGES si las tarjetas son equivalentes
+    """
+    if old_hash is not None and old_hash == new_hash:
+        return NO_CHANGES
+    changes = []
+    for field in fields:
+        if field == FIELD_LABELS:
+            _diff_set(field, _label_names(old_card), _label_names(new_card), changes)
+        elif field == FIELD_ATTACHMENTS:
+            _diff_set(field, _attachment_keys(old_card), _attachment_keys(new_card), changes)
+        elif field == FIELD_MEMBERS:
+            _diff_set(field, set(old_card.get(field) or []), set(new_card.get(field) or []), changes)
+        else:
+            default = None if field == FIELD_DUE else ''
+            old_value = old_card.get(field, default)
+            new_value = new_card.get(field, default)
+            if old_value != new_value:
+                changes.append(CardChange(field, old=old_value, new=new_value))
+    return changes or NO_CHANGES
@@ -0,0 +1,154 @@
+import logging
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+# Índices declarados por colección. Se crean de forma idempotente al arrancar:
+# create_indexes no hace nada si el índice ya existe con la misma definición.
+INDEXES = {
+    'leads': [
+        IndexModel([('place_id', ASCENDING)], name='place_id_unique', unique=True,
+                   partialFilterExpression={'place_id': {'$type': 'string'}})
+    ],
+    'custom_labels': [
+        IndexModel([('label', ASCENDING)], name='label_unique', unique=True)
+    ],
+    'users': [
+        IndexModel([('email', ASCENDING)], name='email')
+    ],
+    'integrations': [
+        IndexModel([('trello_board_id', ASCENDING)], name='trello_board_id'),
+        IndexModel([('created_by', ASCENDING)], name='created_by'),
+        IndexModel([('active', ASCENDING)], name='active')
+    ],
+    'user_mappings': [
+        IndexModel([('integration_id', ASCENDING), ('trello_user_id', ASCENDING)],
+                   name='integration_trello_user_unique', unique=True),
+        IndexModel([('trello_user_id', ASCENDING)], name='trello_user_id'),
+        IndexModel([('discord_user_id', ASCENDING)], name='discord_user_id')
+    ],
+    'card_channel_mappings': [
+        IndexModel([('integration_id', ASCENDING)], name='integration_id'),
+        IndexModel([('trello_list_id', ASCENDING)], name='trello_list_id', sparse=True),
+        IndexModel([('trello_card_id', ASCENDING)], name='trello_card_id', sparse=True),
+        IndexModel([('discord_channel_id', ASCENDING), ('integration_id', ASCENDING)], name='discord_channel_integration')
+    ],
+    'card_states': [
+        IndexModel([('integration_id', ASCENDING), ('card_id', ASCENDING)],
+                   name='integration_card_unique', unique=True),
+        IndexModel([('integration_id', ASCENDING), ('is_processed', ASCENDING)], name='integration_is_processed')
+    ],
+    'card_snapshots': [
+        IndexModel([('integration_id', ASCENDING), ('card_id', ASCENDING)],
+                   name='integration_card_unique', unique=True)
+    ],
+    # Cola de webhooks (WebhookQueue) y acciones ya vistas (ActionDeduplicator).
+    # Conservan los nombres que les daba create_index para no chocar con los
+    # índices que esos servicios creaban antes
+    'webhook_events': [
+        IndexModel([('status', ASCENDING), ('available_at', ASCENDING)], name='status_1_available_at_1'),
+        IndexModel([('expire_at', ASCENDING)], name='expire_at_1', expireAfterSeconds=0)
+    ],
+    'webhook_actions_seen': [
+        IndexModel([('expire_at', ASCENDING)], name='expire_at_1', expireAfterSeconds=0)
+    ]
+}
+
+# Consultas representativas de cada ruta caliente, para auditar sus planes con explain()
+_SAMPLE_ID = ObjectId('000000000000000000000000')
+AUDITED_QUERIES = [
+    ('leads', {'place_id': 'ChIJ-sample'}),
+    ('custom_labels', {'label': 'sample'}),
+    ('users', {'email': 'sample@example.com'}),
+    ('integrations', {'trello_board_id': 'sample'}),
+    ('integrations', {'created_by': _SAMPLE_ID}),
+    ('integrations', {'active': True}),
+    ('user_mappings', {'trello_user_id': 'sample'}),
+    ('user_mappings', {'discord_user_id': 'sample'}),
+    ('user_mappings', {'integration_id': _SAMPLE_ID, 'trello_user_id': 'sample'}),
+    ('card_channel_mappings', {'trello_list_id': 'sample'}),
+    ('card_channel_mappings', {'trello_card_id': 'sample'}),
+    ('card_channel_mappings', {'integration_id': _SAMPLE_ID}),
+    ('card_channel_mappings', {'discord_channel_id': 'sample', 'integration_id': _SAMPLE_ID}),
+    ('card_states', {'integration_id': _SAMPLE_ID}),
+    ('card_states', {'integration_id': _SAMPLE_ID, 'card_id': 'sample'}),
+    ('card_states', {'integration_id': _SAMPLE_ID, 'is_processed': False}),
+    ('card_snapshots', {'integration_id': _SAMPLE_ID}),
+    ('webhook_events', {'status': {'$in': ['pending', 'processing']}, 'available_at': {'$lte': _SAMPLE_ID.generation_time}})
+]
+
+def ensure_indexes(db):
+    """
+    Crea los índices declarados en INDEXES. Cada índice se crea por separado:
+    un fallo (por ejemplo, duplicados que impiden un índice único) se registra
+    y no impide crear los demás.
+
+    Returns:
+        Diccionario {colección: lista de nombres de índice o mensajes de error}
+    """
+    results = {}
+    for collection, indexes in INDEXES.items():
+        results[collection] = []
+        for index in indexes:
+            name = index.document['name']
+            try:
+                db[collection].create_indexes([index])
+                results[collection].append(name)
+            except PyMongoError as e:
+                logger.error(f"No se pudo crear el índice {name} de {collection}: {e}")
+                results[collection].append(f"{name}: error: {e}")
+    logger.info(f"Índices de MongoDB verificados en {len(INDEXES)} colecciones")
+    return results
+
+def _plan_stages(plan):
+    """
+    Recorre un plan de ejecución y devuelve todas sus etapas
+    """
+    stages = [plan.get('stage')]
+    for key in ('inputStage', 'outerStage', 'innerStage'):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get('inputStages', []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+def audit_query_plans(db):
+    """
+    Ejecuta explain() sobre cada consulta de AUDITED_QUERIES y marca las que
+    recorren la colección completa (COLLSCAN)
+
+    Returns:
+        Lista de {'collection', 'filter', 'stages', 'index', 'collscan'}
+    """
+    report = []
+    for collection, query in AUDITED_QUERIES:
+        entry = {'collection': collection, 'filter': str(query)}
+        try:
+            explain = db[collection].find(query).explain()
+            winning_plan = explain.get('queryPlanner', {}).get('winningPlan', {})
+            # En el motor de ejecución SBE el plan viene anidado en queryPlan
+            winning_plan = winning_plan.get('queryPlan', winning_plan)
+            stages = _plan_stages(winning_plan)
+            entry['stages'] = stages
+            entry['index'] = _index_name(winning_plan)
+            entry['collscan'] = 'COLLSCAN' in stages
+            if entry['collscan']:
+                logger.warning(f"Consulta sin índice (COLLSCAN) en {collection}: {query}")
+        except PyMongoError as e:
+            entry['error'] = str(e)
+        report.append(entry)
+    return report
+
+def _index_name(plan):
+    if plan.get('indexName'):
+        return plan['indexName']
+    for key in ('inputStage', 'outerStage', 'innerStage'):
+        if key in plan:
+            name = _index_name(plan[key])
+            if name:
+                return name
+    return None
@@ -1,9 +1,7 @@
 import os
 import discord
-import asyncio
-import threading
-from discord.ext import commands
 from app import app
+from app.discord.gateway import get_gateway
 
 class DiscordService:
     """
@@ -11,42 +9,27 @@ class DiscordService:
     """
     def __init__(self):
         """
-        Inicializa el cliente de Discord con las credenciales de la aplicación
+        Inicializa el servicio sobre la conexión compartida al gateway de Discord
         """
         self.token = os.environ.get('DISCORD_BOT_TOKEN')
         
         if not self.token:
             raise ValueError("El token del bot de Discord no está configurado")
         
-        # Cliente de Discord
-        intents = discord.Intents.default()
-        intents.guilds = True
-        intents.members = True
-        
-        self.bot = commands.Bot(command_prefix='!', intents=intents)
-        self.loop = asyncio.new_event_loop()
-        
-        # Iniciar el bot en un hilo separado
-        self._start_bot_thread()
+        # Reutilizar el mismo cliente que app.discord.bot en lugar de abrir otra sesión
+        self.gateway = get_gateway()
+        self.bot = self.gateway.bot
     
-    def _start_bot_thread(self):
-        """
-        Inicia el bot de Discord en un hilo separado
-        """
-        def run_bot():
-            asyncio.set_event_loop(self.loop)
-            self.loop.run_until_complete(self.bot.start(self.token))
-        
-        thread = threading.Thread(target=run_bot)
-        thread.daemon = True
-        thread.start()
+    @property
+    def loop(self):
+        return self.gateway.loop
     
     async def get_guild(self, guild_id):
         """
         Obtiene un servidor de Discord por su ID
         """
         try:
-            return await self.bot.fetch_guild(int(guild_id))
+            return await self.gateway.resolve_guild(guild_id)
         except Exception as e:
             app.logger.error(f"Error al obtener el servidor de Discord: {e}")
             return None
@@ -55,10 +38,7 @@ class DiscordService:
         """
         Versión sincrónica de get_guild
         """
-        future = asyncio.run_coroutine_threadsafe(
-            self.get_guild(guild_id), self.loop
-        )
-        return future.result()
+        return self.gateway.run_sync(self.get_guild(guild_id))
     
     async def get_guild_members(self, guild_id):
         """
@@ -69,8 +49,14 @@ class DiscordService:
             if not guild:
                 return []
             
+            # Si el gateway ya tiene la lista de miembros completa no hace falta pedirla por REST
+            if guild.chunked:
+                source = guild.members
+            else:
+                source = [member async for member in guild.fetch_members()]
+            
             members = []
-            async for member in guild.fetch_members():
+            for member in source:
                 if not member.bot:
                     members.append({
                         'id': str(member.id),
@@ -88,10 +74,7 @@ class DiscordService:
         """
         Versión sincrónica de get_guild_members
         """
-        future = asyncio.run_coroutine_threadsafe(
-            self.get_guild_members(guild_id), self.loop
-        )
-        return future.result()
+        return self.gateway.run_sync(self.get_guild_members(guild_id))
     
     async def create_channel(self, guild_id, channel_name):
         """
@@ -121,17 +104,14 @@ class DiscordService:
         """
         Versión sincrónica de create_channel
         """
-        future = asyncio.run_coroutine_threadsafe(
-            self.create_channel(guild_id, channel_name), self.loop
-        )
-        return future.result()
+        return self.gateway.run_sync(self.create_channel(guild_id, channel_name))
     
     async def send_message(self, channel_id, content, mention_user_id=None):
         """
         Envía un mensaje a un canal de Discord
         """
         try:
-            channel = await self.bot.fetch_channel(int(channel_id))
+            channel = await self.gateway.resolve_channel(channel_id)
             
             if mention_user_id:
                 content = f"<@{mention_user_id}> {content}"
@@ -150,10 +130,7 @@ class DiscordService:
         """
         Versión sincrónica de send_message
         """
-        future = asyncio.run_coroutine_threadsafe(
-            self.send_message(channel_id, content, mention_user_id), self.loop
-        )
-        return future.result()
+        return self.gateway.run_sync(self.send_message(channel_id, content, mention_user_id))
     
     async def get_channels(self, guild_id):
         """
@@ -165,7 +142,9 @@ class DiscordService:
                 return []
             
             channels = []
-            for channel in await guild.fetch_channels():
+            # Un servidor de la caché del gateway ya trae sus canales; uno obtenido por REST no
+            source = guild.channels or await guild.fetch_channels()
+            for channel in source:
                 if isinstance(channel, discord.TextChannel):
                     channels.append({
                         'id': str(channel.id),
@@ -181,7 +160,4 @@ class DiscordService:
         """
         Versión sincrónica de get_channels
         """
-        future = asyncio.run_coroutine_threadsafe(
-            self.get_channels(guild_id), self.loop
-        )
-        return future.result() 
\ No newline at end of file
+        return self.gateway.run_sync(self.get_channels(guild_id)) 
\ No newline at end of file
@@ -0,0 +1,281 @@
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from app.services.place_accumulator import PlaceAccumulator
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+# Límite de radio de la API de Google Places
+MAX_RADIUS = 50000
+# Resultados nuevos por punto por debajo de los cuales el punto se considera de bajo rendimiento
+MAX_NEW_RESULTS_PER_POINT = 10
+# Puntos de bajo rendimiento seguidos tras los que se abandona una subdivisión
+MAX_LOW_YIELD_POINTS = 5
+# Resultados nuevos a partir de los que un punto se subdivide
+SUBDIVIDE_MIN_NEW_RESULTS = 20
+# Google no acepta un next_page_token hasta pasados unos segundos
+PAGE_TOKEN_DELAY = 2.0
+# Reintentos de un token que Google todavía no da por válido, y espera entre ellos
+PAGE_TOKEN_RETRIES = 3
+PAGE_TOKEN_RETRY_DELAY = 1.0
+# Páginas por punto como máximo (Google devuelve hasta 3 páginas de 20 resultados)
+MAX_PAGES_PER_POINT = 3
+
+class PageTokenNotReady(Exception):
+    """
+    Google rechazó un next_page_token porque todavía no es válido
+    """
+
+def grid_for(lat, lng, radius, depth, max_depth):
+    """
+    Calcula los puntos de la cuadrícula que cubren un círculo y el radio de
+    búsqueda de cada punto
+
+    Returns:
+        Tupla (lista de (lat, lng), radio de cada punto en metros)
+    """
+    radius = min(radius, MAX_RADIUS)
+    if depth >= max_depth or radius < 5000:
+        num_divisions = 1  # 3x3 puntos
+    elif radius < 20000:
+        num_divisions = 2  # 5x5 puntos
+    else:
+        num_divisions = 3  # 7x7 puntos
+
+    # Factor de reducción de radio para evitar solapamiento excesivo
+    radius_factor = 0.7 if depth == 0 else 0.8
+    sub_radius = radius * radius_factor / (num_divisions + 1)
+
+    # Desplazamiento entre puntos en grados
+    lat_step = (radius / 111000) / (num_divisions + 0.5)
+    lng_step = lat_step / math.cos(math.radians(lat))
+
+    points = [
+        (lat + i * lat_step, lng + j * lng_step)
+        for i in range(-num_divisions, num_divisions + 1)
+        for j in range(-num_divisions, num_divisions + 1)
+    ]
+    return points, sub_radius
+
+class _Grid:
+    """
+    Estado de una cuadrícula: la principal o la subdivisión de un punto
+    """
+    def __init__(self, depth, radius):
+        self.depth = depth
+        self.radius = radius
+        self.low_yield_count = 0
+        self.stopped = False
+
+class _Point:
+    """
+    Estado de un punto de la cuadrícula mientras se obtienen sus páginas
+    """
+    def __init__(self, grid, lat, lng):
+        self.grid = grid
+        self.lat = lat
+        self.lng = lng
+        self.pages = 0
+        self.new_results = 0
+        self.token_retries = 0
+
+    @property
+    def location(self):
+        return f"{self.lat},{self.lng}"
+
+class GridSearch:
+    """
+    Búsqueda concurrente de lugares por cuadrícula.
+
+    La unidad de trabajo es una página de resultados de un punto. Las páginas
+    se reparten entre un pool de hilos compartido y sus resultados se
+    combinan a medida que llegan. Cuando una página trae next_page_token, el
+    token espera en una cola temporal hasta que Google lo acepta y mientras
+    tanto los hilos buscan otros puntos, así que las esperas de los tokens se
+    solapan en lugar de sumarse.
+
+    Las subdivisiones de los puntos con muchos resultados se encolan como
+    puntos nuevos en lugar de resolverse con recursión, así que los hilos del
+    pool nunca esperan a otros hilos. Se mantienen las reglas de la búsqueda
+    secuencial: parada al llegar a `max_results` y abandono de una
+    subdivisión tras varios puntos seguidos con pocos resultados nuevos.
+    """
+    def __init__(self, fetch_page, executor, workers=8, max_results=100, max_depth=2, callback=None, label=''):
+        """
+        Args:
+            fetch_page: Función (location, radius, page_token) -> (lugares, next_page_token).
+                Lanza PageTokenNotReady si Google aún no acepta el token.
+            executor: Pool de hilos en el que se ejecutan las búsquedas
+            workers: Páginas solicitadas a la vez como máximo para esta búsqueda
+            max_results: Número máximo de resultados (0 para sin límite)
+            max_depth: Profundidad máxima de subdivisión
+            callback: Función opcional para recibir resultados parciales
+            label: Descripción de la búsqueda para los logs
+        """
+        self.fetch_page = fetch_page
+        self.executor = executor
+        self.workers = max(1, workers)
+        self.max_results = max_results
+        self.max_depth = max_depth
+        self.callback = callback
+        self.label = label
+
+        self.results = PlaceAccumulator()
+        # Tokens de paginación pendientes: (listo_en, secuencia, punto, token)
+        self._tokens = []
+        self._sequence = itertools.count()
+
+    def _limit_reached(self):
+        return self.max_results > 0 and len(self.results) >= self.max_results
+
+    def _schedule_token(self, point, token, delay):
+        heapq.heappush(self._tokens, (time.monotonic() + delay, next(self._sequence), point, token))
+
+    def _next_job(self, pending):
+        """
+        Devuelve el siguiente (punto, token) a solicitar o None. Los tokens ya
+        válidos van primero porque completan puntos empezados.
+        """
+        while self._tokens and self._tokens[0][0] <= time.monotonic():
+            _, _, point, token = heapq.heappop(self._tokens)
+            if not point.grid.stopped:
+                return point, token
+        while pending:
+            point = pending.popleft()
+            if not point.grid.stopped:
+                return point, None
+        return None
+
+    def run(self, lat, lng, radius):
+        """
+        Ejecuta la búsqueda y devuelve la lista de resultados sin duplicados
+        """
+        points, sub_radius = grid_for(lat, lng, radius, 0, self.max_depth)
+        self.total_points = len(points)
+        self.completed_points = 0
+        logger.info(f"Búsqueda por cuadrícula {self.label}: {len(points)} puntos con radio {sub_radius:.0f}m, {self.workers} en paralelo")
+
+        root = _Grid(0, sub_radius)
+        pending = deque(_Point(root, point_lat, point_lng) for point_lat, point_lng in points)
+        in_flight = {}
+
+        while (pending or in_flight or self._tokens) and not self._limit_reached():
+            # Mantener ocupados hasta `workers` hilos con tokens maduros o puntos nuevos
+            while len(in_flight) < self.workers:
+                job = self._next_job(pending)
+                if job is None:
+                    break
+                point, token = job
+                future = self.executor.submit(self.fetch_page, point.location, point.grid.radius, token)
+                in_flight[future] = (point, token)
+
+            # Esperar a la primera página terminada o a que madure el siguiente token
+            timeout = None
+            if self._tokens:
+                timeout = max(0.0, self._tokens[0][0] - time.monotonic())
+            if not in_flight:
+                if timeout:
+                    time.sleep(timeout)
+                continue
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                point, token = in_flight.pop(future)
+                self._handle_page(future, point, token, pending)
+
+        if in_flight or self._tokens:
+            logger.info(f"Alcanzado máximo de resultados deseados ({self.max_results}). Cancelando {len(in_flight)} búsquedas en curso.")
+            for future in in_flight:
+                future.cancel()
+            self._tokens = []
+
+        if self.max_results > 0 and len(self.results) > self.max_results:
+            logger.info(f"Limitando resultados a {self.max_results} (de {len(self.results)} encontrados)")
+        results = self.results.results(self.max_results if self.max_results > 0 else None)
+
+        logger.info(f"Búsqueda por cuadrícula {self.label} completada. Total de resultados únicos: {len(results)}")
+        if self.callback:
+            self.callback({
+                "new_results": [],
+                "total_count": len(results),
+                "status": "completed",
+                "progress": {
+                    "current_point": self.total_points,
+                    "total_points": self.total_points
+                }
+            })
+        return results
+
+    def _handle_page(self, future, point, token, pending):
+        """
+        Combina una página de un punto y programa la siguiente o da el punto por terminado
+        """
+        grid = point.grid
+        try:
+            results, next_token = future.result()
+        except PageTokenNotReady:
+            if point.token_retries < PAGE_TOKEN_RETRIES:
+                point.token_retries += 1
+                self._schedule_token(point, token, PAGE_TOKEN_RETRY_DELAY)
+            else:
+                logger.warning(f"Token de paginación no aceptado en ({point.lat},{point.lng}); se omiten sus páginas restantes")
+                self._complete_point(point, pending)
+            return
+        except Exception as e:
+            logger.error(f"Error en búsqueda del punto ({point.lat},{point.lng}) nivel {grid.depth}: {str(e)}")
+            if grid.depth == 0:
+                self.completed_points += 1
+            return
+
+        point.pages += 1
+        new_results = self.results.extend(results)
+        point.new_results += len(new_results)
+
+        if next_token and point.pages < MAX_PAGES_PER_POINT:
+            self._schedule_token(point, next_token, PAGE_TOKEN_DELAY)
+        else:
+            self._complete_point(point, pending)
+
+        if self.callback and new_results:
+            progress = {
+                "current_point": self.completed_points,
+                "total_points": self.total_points
+            }
+            if grid.depth > 0:
+                progress["subdivision"] = True
+            self.callback({
+                "new_results": new_results,
+                "total_count": len(self.results),
+                "status": "in_progress",
+                "progress": progress
+            })
+
+    def _complete_point(self, point, pending):
+        """
+        Evalúa el rendimiento de un punto terminado y decide si subdividirlo o abandonar su cuadrícula
+        """
+        grid = point.grid
+        if grid.depth == 0:
+            self.completed_points += 1
+        logger.info(f"{'  ' * grid.depth}Punto ({point.lat:.5f},{point.lng:.5f}) nivel {grid.depth}: {point.new_results} nuevos resultados en {point.pages} páginas, total acumulado: {len(self.results)}")
+
+        if point.new_results < MAX_NEW_RESULTS_PER_POINT:
+            grid.low_yield_count += 1
+            if grid.depth > 0 and grid.low_yield_count >= MAX_LOW_YIELD_POINTS and not grid.stopped:
+                grid.stopped = True
+                logger.info(f"{'  ' * grid.depth}Abandonando subdivisión por bajo rendimiento ({grid.low_yield_count} puntos con pocos resultados nuevos)")
+        else:
+            grid.low_yield_count = 0
+
+        # Subdividir los puntos con muchos resultados nuevos; sus puntos van al
+        # principio de la cola para explorar primero las zonas más densas
+        if point.new_results >= SUBDIVIDE_MIN_NEW_RESULTS and grid.depth < self.max_depth and grid.low_yield_count <= 2:
+            sub_points, sub_radius = grid_for(point.lat, point.lng, grid.radius * 0.6, grid.depth + 1, self.max_depth)
+            child = _Grid(grid.depth + 1, sub_radius)
+            pending.extendleft(_Point(child, sub_lat, sub_lng) for sub_lat, sub_lng in reversed(sub_points))
+            logger.info(f"{'  ' * grid.depth}Subdividiendo punto con buenos resultados en {len(sub_points)} puntos")
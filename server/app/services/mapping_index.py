@@ -0,0 +1,203 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+# Documento con el contador de versión de los mapeos (alternativa a los change streams)
+VERSION_COLLECTION = 'mapping_versions'
+VERSION_ID = 'mappings'
+
+class MappingIndex:
+    """
+    Índice en memoria de los mapeos usuario de Trello -> usuario de Discord y
+    lista de Trello -> canal de Discord.
+
+    Se carga completo desde MongoDB y se mantiene al día con un change stream
+    sobre los mapeos que contiene (los de usuarios y los de listas; los mapeos
+    de tarjeta a canal no afectan al índice y no provocan recargas). Si el servidor no admite change streams
+    (MongoDB sin réplica), se consulta periódicamente un contador de versión
+    que incrementan los puntos de escritura con `notify_mappings_changed`.
+    Las búsquedas son consultas a diccionarios, sin acceso a MongoDB.
+    """
+    def __init__(self, app, poll_interval=5):
+        """
+        Args:
+            app: Instancia de Flask de la que se obtiene la base de datos
+            poll_interval: Segundos entre comprobaciones del contador de versión
+        """
+        self.app = app
+        self.poll_interval = poll_interval
+
+        self._users = {}
+        self._lists = {}
+        # _id de los mapeos de lista cargados, para reconocer sus borrados
+        self._list_mapping_ids = set()
+        self._version = None
+        self._loaded = False
+        self._stale = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.mode = None
+        self.reloads = 0
+
+    @property
+    def db(self):
+        return self.app.config['MONGO_DB']
+
+    def _current_version(self):
+        doc = self.db[VERSION_COLLECTION].find_one({'_id': VERSION_ID})
+        return doc.get('version', 0) if doc else 0
+
+    def reload(self):
+        """
+        Reconstruye el índice completo desde MongoDB
+        """
+        version = self._current_version()
+        users = {}
+        lists = {}
+        list_mapping_ids = set()
+        for mapping in self.db.user_mappings.find({}, {'trello_user_id': 1, 'discord_user_id': 1}):
+            if not mapping.get('trello_user_id') or not mapping.get('discord_user_id'):
+                continue
+            users.setdefault(mapping['trello_user_id'], mapping['discord_user_id'])
+        for mapping in self.db.card_channel_mappings.find(
+            {'trello_list_id': {'$exists': True}},
+            {'trello_list_id': 1, 'discord_channel_id': 1}
+        ):
+            list_mapping_ids.add(mapping['_id'])
+            if not mapping.get('trello_list_id') or not mapping.get('discord_channel_id'):
+                continue
+            lists.setdefault(mapping['trello_list_id'], mapping['discord_channel_id'])
+        with self._lock:
+            self._users = users
+            self._lists = lists
+            self._list_mapping_ids = list_mapping_ids
+            self._version = version
+            self._loaded = True
+            self.reloads += 1
+        logger.info(f"Índice de mapeos cargado: {len(users)} usuarios, {len(lists)} listas")
+
+    def _ensure_loaded(self):
+        if self._stale.is_set() or not self._loaded:
+            self._stale.clear()
+            self.reload()
+            self.start()
+
+    def invalidate(self):
+        """
+        Marca el índice para recargarlo en la siguiente búsqueda
+        """
+        self._stale.set()
+
+    def discord_user_id(self, trello_user_id):
+        self._ensure_loaded()
+        return self._users.get(trello_user_id)
+
+    def channel_for_list(self, trello_list_id):
+        self._ensure_loaded()
+        return self._lists.get(trello_list_id)
+
+    def start(self):
+        """
+        Inicia el hilo que mantiene el índice al día
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._watch, name='mapping-index')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _affects_index(self, change):
+        """
+        Indica si un evento del change stream afecta a los mapeos del índice.
+        Los borrados no traen el documento: se reconocen por el _id.
+        """
+        if change.get('ns', {}).get('coll') == 'user_mappings':
+            return True
+        if change.get('operationType') == 'delete':
+            return change.get('documentKey', {}).get('_id') in self._list_mapping_ids
+        return True
+
+    def _watch(self):
+        # Los mapeos de tarjeta a canal se escriben con frecuencia y no están en el
+        # índice: solo se reciben los eventos de mapeos de lista (con el documento
+        # completo gracias a updateLookup) y los borrados, que se filtran por _id
+        pipeline = [{'$match': {'$or': [
+            {'ns.coll': 'user_mappings'},
+            {'ns.coll': 'card_channel_mappings', 'operationType': 'delete'},
+            {'ns.coll': 'card_channel_mappings', 'fullDocument.trello_list_id': {'$exists': True}}
+        ]}}]
+        while True:
+            try:
+                with self.db.watch(pipeline, full_document='updateLookup') as stream:
+                    self.mode = 'change_stream'
+                    # Recargar por si hubo cambios entre la carga inicial y la apertura del stream
+                    self.invalidate()
+                    for change in stream:
+                        if not self._affects_index(change):
+                            continue
+                        logger.info(f"Cambio en {change.get('ns', {}).get('coll')}: se recargará el índice de mapeos")
+                        self.invalidate()
+            except OperationFailure as e:
+                logger.info(f"Change streams no disponibles ({e}); se usará el contador de versión")
+                self._poll_versions()
+                return
+            except PyMongoError as e:
+                logger.warning(f"Change stream de mapeos interrumpido: {e}. Reintentando")
+                self.invalidate()
+                time.sleep(self.poll_interval)
+
+    def _poll_versions(self):
+        self.mode = 'version_poll'
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                if self._current_version() != self._version:
+                    self.invalidate()
+            except PyMongoError as e:
+                logger.warning(f"Error al comprobar la versión de los mapeos: {e}")
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'users': len(self._users),
+            'lists': len(self._lists),
+            'version': self._version,
+            'reloads': self.reloads
+        }
+
+# Índice compartido del proceso
+mapping_index = None
+
+def get_mapping_index(app):
+    """
+    Obtiene el índice de mapeos compartido, creándolo si es necesario
+    """
+    global mapping_index
+    if mapping_index is None:
+        mapping_index = MappingIndex(app)
+    return mapping_index
+
+def notify_mappings_changed(db):
+    """
+    Debe llamarse tras escribir en user_mappings o en los mapeos de lista de
+    card_channel_mappings:
+    incrementa el contador de versión para los demás procesos e invalida el
+    índice de este proceso.
+    """
+    try:
+        db[VERSION_COLLECTION].update_one(
+            {'_id': VERSION_ID},
+            {'$inc': {'version': 1}, '$set': {'updated_at': datetime.utcnow()}},
+            upsert=True
+        )
+    except PyMongoError as e:
+        logger.error(f"No se pudo incrementar la versión de los mapeos: {e}")
+    if mapping_index is not None:
+        mapping_index.invalidate()
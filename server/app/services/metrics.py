@@ -0,0 +1,103 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites superiores (segundos) de los buckets de latencia por defecto
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+class LatencyHistogram:
+    """
+    Histograma de latencias con buckets fijos, seguro entre hilos.
+
+    Los percentiles se estiman con el límite superior del bucket en el que
+    caen, suficiente para vigilar colas y regresiones sin guardar muestras.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """
+        Registra una latencia en segundos
+        """
+        with self._lock:
+            for index, upper in enumerate(self.buckets):
+                if seconds <= upper:
+                    self.counts[index] += 1
+                    break
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    @contextmanager
+    def time(self):
+        """
+        Mide la duración del bloque `with` y la registra
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def _percentile(self, fraction):
+        threshold = fraction * self.count
+        cumulative = 0
+        for upper, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            if cumulative >= threshold:
+                return self.max if math.isinf(upper) else upper
+        return self.max
+
+    def stats(self):
+        """
+        Devuelve el recuento, la media, el máximo, percentiles estimados y los buckets
+        """
+        with self._lock:
+            if not self.count:
+                return {'count': 0}
+            return {
+                'count': self.count,
+                'avg_ms': round(self.total / self.count * 1000, 2),
+                'max_ms': round(self.max * 1000, 2),
+                'p50_ms': round(self._percentile(0.5) * 1000, 2),
+                'p95_ms': round(self._percentile(0.95) * 1000, 2),
+                'p99_ms': round(self._percentile(0.99) * 1000, 2),
+                'buckets': {
+                    ('+Inf' if math.isinf(upper) else f"{upper:g}"): bucket_count
+                    for upper, bucket_count in zip(self.buckets, self.counts)
+                }
+            }
+
+# Registro de histogramas del proceso, por nombre
+_histograms = {}
+_registry_lock = threading.Lock()
+
+def histogram(name):
+    """
+    Obtiene el histograma con ese nombre, creándolo si no existe
+    """
+    with _registry_lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = LatencyHistogram()
+        return hist
+
+def timed(name):
+    """
+    Atajo para medir un bloque: `with timed('trello.comment'): ...`
+    """
+    return histogram(name).time()
+
+def snapshot():
+    """
+    Devuelve las estadísticas de todos los histogramas registrados
+    """
+    with _registry_lock:
+        items = list(_histograms.items())
+    return {name: hist.stats() for name, hist in sorted(items)}
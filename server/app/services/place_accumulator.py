@@ -0,0 +1,39 @@
+class PlaceAccumulator:
+    """
+    Acumula lugares sin duplicados por place_id, conservando el orden de
+    llegada. Comprobar si un lugar ya existe cuesta O(1) en lugar de recorrer
+    la lista de resultados.
+    """
+    def __init__(self, places=None):
+        self._places = {}
+        if places:
+            self.extend(places)
+
+    def add(self, place):
+        """
+        Añade un lugar si su place_id no estaba. Devuelve True si se añadió.
+        """
+        place_id = place.get("place_id")
+        if not place_id or place_id in self._places:
+            return False
+        self._places[place_id] = place
+        return True
+
+    def extend(self, places):
+        """
+        Añade varios lugares y devuelve la lista de los que eran nuevos
+        """
+        return [place for place in places if self.add(place)]
+
+    def results(self, limit=None):
+        """
+        Devuelve los lugares acumulados, como mucho `limit` si se indica
+        """
+        places = list(self._places.values())
+        return places[:limit] if limit else places
+
+    def __contains__(self, place_id):
+        return place_id in self._places
+
+    def __len__(self):
+        return len(self._places)
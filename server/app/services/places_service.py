@@ -2,8 +2,13 @@ import requests
 import os
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import math
+
+from app.services.grid_search import GridSearch, PageTokenNotReady
+from app.services.metrics import timed
+from app.services.place_accumulator import PlaceAccumulator
+from app.services.rate_limit import TokenBucket
 
 # Configurar logger
 logger = logging.getLogger(__name__)
@@ -21,25 +26,135 @@ PLACES_SEARCH_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
 PLACES_DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
 PLACES_NEARBY_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
 
-def search_places(query, location, radius=5000, max_results=20, next_page_token=None, fetch_all=False):
+# Búsquedas de puntos de cuadrícula simultáneas y solicitudes por segundo a Google Places
+SEARCH_WORKERS = int(os.getenv("PLACES_SEARCH_WORKERS", 8))
+PLACES_QPS = int(os.getenv("PLACES_QPS", 10))
+# Timeout de cada solicitud a Google Places (conexión, lectura) en segundos
+PLACES_TIMEOUT = (5, 20)
+
+# Pool compartido para las búsquedas por cuadrícula y límite global de solicitudes
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix='places-search')
+places_rate_limiter = TokenBucket(PLACES_QPS, 1.0)
+
+def _fetch_page(url, params, page_token=None):
     """
-    Buscar lugares según el query y la ubicación, soportando paginación y cantidad máxima
+    Solicita una página de resultados a Google Places
+    
+    Returns:
+        Tupla (resultados sin formatear, next_page_token)
+    
+    Raises:
+        PageTokenNotReady: Si Google todavía no acepta el token de paginación
+        Exception: Si la API responde con un error o no responde a tiempo
     """
-    params = {
-        "query": query,
-        "location": location,
-        "radius": min(radius, 50000),  # Google Places API tiene un límite máximo de 50000 metros
-        "key": API_KEY
+    params = dict(params)
+    if page_token:
+        params["pagetoken"] = page_token
+    places_rate_limiter.acquire()
+    try:
+        response = requests.get(url, params=params, timeout=PLACES_TIMEOUT)
+    except requests.Timeout:
+        # Sin timeout un hilo colgado bloquearía para siempre un hueco del pool compartido
+        logger.error(f"Tiempo de espera agotado en la API de Google Places ({url})")
+        raise Exception("Tiempo de espera agotado en la API de Google Places")
+    data = response.json()
+    
+    # Google responde INVALID_REQUEST a los tokens que aún no son válidos
+    if page_token and data.get("status") == "INVALID_REQUEST":
+        raise PageTokenNotReady("El token de paginación todavía no es válido")
+    
+    if data.get("status") not in ["OK", "ZERO_RESULTS"]:
+        error_message = data.get("error_message", "Error desconocido en la API de Google Places")
+        logger.error(f"Error en API: {error_message}")
+        raise Exception(f"Error en la API de Google Places: {error_message}")
+    
+    return data.get("results", []), data.get("next_page_token")
+
+def _text_search_place(result):
+    return {
+        "place_id": result.get("place_id"),
+        "name": result.get("name"),
+        "address": result.get("formatted_address"),
+        "rating": result.get("rating"),
+        "location": result.get("geometry", {}).get("location")
     }
-    results = []
+
+def _nearby_search_place(result):
+    # La API de nearby search no devuelve la dirección formateada, solo la geometría
+    return {
+        "place_id": result.get("place_id"),
+        "name": result.get("name"),
+        "address": result.get("vicinity", ""),  # vicinity es similar a formatted_address
+        "rating": result.get("rating"),
+        "location": result.get("geometry", {}).get("location")
+    }
+
+class PlacesQuery:
+    """
+    Estrategia de consulta a Google Places: qué endpoint se usa, con qué
+    parámetros y cómo se formatea cada resultado. Todas las búsquedas
+    (paginada y por cuadrícula) comparten el mismo motor y solo cambian de
+    estrategia.
+    """
+    def __init__(self, kind, url, params, to_place, label):
+        """
+        Args:
+            kind: Nombre corto de la estrategia, usado en las métricas
+            url: Endpoint de Google Places
+            params: Parámetros propios de la consulta (query, type...)
+            to_place: Función que formatea un resultado de la API
+            label: Descripción de la consulta para los logs
+        """
+        self.kind = kind
+        self.url = url
+        self.params = params
+        self.to_place = to_place
+        self.label = label
+
+    def fetch_page(self, location, radius, page_token=None):
+        """
+        Obtiene una página de resultados ya formateados
+
+        Returns:
+            Tupla (lugares, next_page_token)
+        """
+        params = {
+            **self.params,
+            "location": location,
+            "radius": min(radius, 50000),  # Google Places API tiene un límite máximo de 50000 metros
+            "key": API_KEY
+        }
+        with timed(f"places.{self.kind}.page"):
+            page_results, next_token = _fetch_page(self.url, params, page_token)
+        return [self.to_place(result) for result in page_results], next_token
+
+def text_query(query):
+    """
+    Búsqueda de texto (textsearch)
+    """
+    return PlacesQuery('text', PLACES_SEARCH_URL, {"query": query}, _text_search_place, f"query={query}")
+
+def type_query(place_type):
+    """
+    Búsqueda por tipo de establecimiento (nearbysearch)
+    """
+    return PlacesQuery('nearby', PLACES_NEARBY_URL, {"type": place_type}, _nearby_search_place, f"type={place_type}")
+
+def run_search(strategy, location, radius=5000, max_results=20, next_page_token=None, fetch_all=False):
+    """
+    Motor de búsqueda paginada en un punto, soportando paginación y cantidad máxima
+    
+    Returns:
+        Tupla (lugares, next_page_token para continuar o None)
+    """
+    results = PlaceAccumulator()
     token = next_page_token
-    fetched = 0
     
     # Variable para evitar bucles infinitos por error de la API
     max_iterations = 10
     iteration = 0
     
-    logger.info(f"Iniciando búsqueda: query={query}, location={location}, radius={radius}m")
+    logger.info(f"Iniciando búsqueda: {strategy.label}, location={location}, radius={radius}m")
     
     while True:
         iteration += 1
@@ -48,144 +163,121 @@ def search_places(query, location, radius=5000, max_results=20, next_page_token=
             break
             
         if token:
-            params["pagetoken"] = token
             # Google recomienda esperar antes de usar el next_page_token
             time.sleep(2)
-            logger.info(f"Usando token de paginación para obtener más resultados")
-        else:
-            params.pop("pagetoken", None)
+            logger.info("Usando token de paginación para obtener más resultados")
             
-        response = requests.get(PLACES_SEARCH_URL, params=params)
-        data = response.json()
+        page_results, next_token = strategy.fetch_page(location, radius, token)
+        logger.info(f"Se encontraron {len(page_results)} lugares en esta página")
         
-        if data.get("status") not in ["OK", "ZERO_RESULTS"]:
-            error_message = data.get("error_message", "Error desconocido en la API de Google Places")
-            logger.error(f"Error en API: {error_message}")
-            raise Exception(f"Error en la API de Google Places: {error_message}")
-            
-        # Verificar si hay resultados en esta página
-        page_results = data.get("results", [])
-        new_results_count = len(page_results)
-        logger.info(f"Se encontraron {new_results_count} lugares en esta página")
-        
-        for result in page_results:
-            # Verificar si el resultado ya existe en nuestra lista por place_id
-            place_id = result.get("place_id")
-            if not any(r.get("place_id") == place_id for r in results):
-                place = {
-                    "place_id": place_id,
-                    "name": result.get("name"),
-                    "address": result.get("formatted_address"),
-                    "rating": result.get("rating"),
-                    "location": result.get("geometry", {}).get("location")
-                }
-                results.append(place)
-                fetched += 1
+        for place in page_results:
+            # Los duplicados por place_id se descartan en el acumulador
+            results.add(place)
             
-            if not fetch_all and fetched >= max_results:
+            if not fetch_all and len(results) >= max_results:
                 logger.info(f"Se alcanzó el máximo de resultados solicitados: {max_results}")
                 break
                 
         # Si no hay más resultados o alcanzamos el máximo
-        token = data.get("next_page_token")
+        token = next_token
         if not token:
             logger.info("No hay más páginas de resultados disponibles")
             break
             
-        if not fetch_all and fetched >= max_results:
+        if not fetch_all and len(results) >= max_results:
             logger.info(f"Se alcanzó el máximo de resultados solicitados: {max_results}")
             break
     
     # Limitar resultados si no es fetch_all
-    if not fetch_all and len(results) > max_results:
-        results = results[:max_results]
+    results = results.results(None if fetch_all else max_results)
         
-    logger.info(f"Búsqueda completada. Total de resultados: {len(results)}")
+    logger.info(f"Búsqueda completada ({strategy.label}). Total de resultados: {len(results)}")
     return results, token
 
+def run_subdivided_search(strategy, lat, lng, radius, max_results=100, max_depth=2, callback=None):
+    """
+    Motor de búsqueda por cuadrícula: divide un área grande en puntos más
+    pequeños, subdividiendo las zonas densas, y busca los puntos y sus
+    páginas en paralelo (ver GridSearch)
+    
+    Returns:
+        Lista de resultados combinados y eliminados duplicados
+    """
+    logger.info(f"Iniciando búsqueda subdividida: {strategy.label}, centro=({lat},{lng}), radio={radius}m")
+    search = GridSearch(
+        strategy.fetch_page, search_executor,
+        workers=SEARCH_WORKERS,
+        max_results=max_results,
+        max_depth=max_depth,
+        callback=callback,
+        label=strategy.label
+    )
+    return search.run(lat, lng, radius)
+
+def full_search_depth(radius):
+    """
+    Profundidad máxima de subdivisión para una búsqueda completa según el radio
+    """
+    if radius < 5000:
+        return 1  # Menos divisiones para radios pequeños
+    if radius > 25000:
+        return 3  # Más divisiones para radios grandes
+    return 2
+
+def run_full_search(strategy, lat, lng, radius, max_results=500):
+    """
+    Búsqueda completa: búsqueda paginada en el centro más búsqueda por
+    cuadrícula, ejecutadas a la vez y combinadas sin duplicados
+    
+    Returns:
+        Diccionario con 'results', 'standard_results', 'subdivided_results',
+        'nuevos_de_subdivision' y 'max_depth'
+    """
+    max_depth = full_search_depth(radius)
+    logger.info(f"BÚSQUEDA COMPLETA INICIADA: {strategy.label} en ({lat},{lng}) con radio={radius}m y profundidad {max_depth}")
+    
+    # 1. Búsqueda estándar con todas sus páginas, en el pool compartido: sus
+    # esperas entre páginas se solapan con la búsqueda por cuadrícula
+    standard_future = search_executor.submit(run_search, strategy, f"{lat},{lng}", radius, 60, None, True)
+    
+    # 2. Búsqueda subdividida por cuadrícula
+    subdivided_results = run_subdivided_search(strategy, lat, lng, radius, max_results, max_depth)
+    logger.info(f"Búsqueda subdividida completada: {len(subdivided_results)} resultados")
+    
+    standard_results, _ = standard_future.result()
+    logger.info(f"Búsqueda estándar completada: {len(standard_results)} resultados")
+    
+    # Combinar resultados y eliminar duplicados
+    merged = PlaceAccumulator(standard_results)
+    nuevos = len(merged.extend(subdivided_results))
+    logger.info(f"Combinación de resultados: {nuevos} nuevos lugares añadidos de la búsqueda subdividida, {len(subdivided_results) - nuevos} duplicados omitidos")
+    
+    # Limitar resultados finales si exceden el máximo solicitado
+    if len(merged) > max_results:
+        logger.info(f"Limitando resultados a {max_results} (de {len(merged)} encontrados)")
+    results = merged.results(max_results)
+    logger.info(f"BÚSQUEDA COMPLETA FINALIZADA: {strategy.label} - Total {len(results)} resultados únicos")
+    
+    return {
+        'results': results,
+        'standard_results': len(standard_results),
+        'subdivided_results': len(subdivided_results),
+        'nuevos_de_subdivision': nuevos,
+        'max_depth': max_depth
+    }
+
+def search_places(query, location, radius=5000, max_results=20, next_page_token=None, fetch_all=False):
+    """
+    Buscar lugares según el query y la ubicación, soportando paginación y cantidad máxima
+    """
+    return run_search(text_query(query), location, radius, max_results, next_page_token, fetch_all)
+
 def search_places_by_type(place_type, location, radius=5000, max_results=20, next_page_token=None, fetch_all=False):
     """
     Buscar lugares según el tipo de negocio/establecimiento y la ubicación, 
     utilizando la API de nearby search que soporta filtro por tipo
     """
-    params = {
-        "type": place_type,
-        "location": location,
-        "radius": min(radius, 50000),  # Google Places API tiene un límite máximo de 50000 metros
-        "key": API_KEY
-    }
-    results = []
-    token = next_page_token
-    fetched = 0
-    
-    # Variable para evitar bucles infinitos por error de la API
-    max_iterations = 10
-    iteration = 0
-    
-    logger.info(f"Iniciando búsqueda por tipo: type={place_type}, location={location}, radius={radius}m")
-    
-    while True:
-        iteration += 1
-        if iteration > max_iterations:
-            logger.warning(f"Se alcanzó el máximo de iteraciones ({max_iterations}). Terminando búsqueda.")
-            break
-            
-        if token:
-            params["pagetoken"] = token
-            # Google recomienda esperar antes de usar el next_page_token
-            time.sleep(2)
-            logger.info(f"Usando token de paginación para obtener más resultados")
-        else:
-            params.pop("pagetoken", None)
-            
-        response = requests.get(PLACES_NEARBY_URL, params=params)
-        data = response.json()
-        
-        if data.get("status") not in ["OK", "ZERO_RESULTS"]:
-            error_message = data.get("error_message", "Error desconocido en la API de Google Places")
-            logger.error(f"Error en API: {error_message}")
-            raise Exception(f"Error en la API de Google Places: {error_message}")
-            
-        # Verificar si hay resultados en esta página
-        page_results = data.get("results", [])
-        new_results_count = len(page_results)
-        logger.info(f"Se encontraron {new_results_count} lugares en esta página")
-        
-        for result in page_results:
-            # Verificar si el resultado ya existe en nuestra lista por place_id
-            place_id = result.get("place_id")
-            if not any(r.get("place_id") == place_id for r in results):
-                # La API de nearby search no devuelve la dirección formateada, solo la geometría
-                place = {
-                    "place_id": place_id,
-                    "name": result.get("name"),
-                    "address": result.get("vicinity", ""),  # vicinity es similar a formatted_address
-                    "rating": result.get("rating"),
-                    "location": result.get("geometry", {}).get("location")
-                }
-                results.append(place)
-                fetched += 1
-            
-            if not fetch_all and fetched >= max_results:
-                logger.info(f"Se alcanzó el máximo de resultados solicitados: {max_results}")
-                break
-                
-        # Si no hay más resultados o alcanzamos el máximo
-        token = data.get("next_page_token")
-        if not token:
-            logger.info("No hay más páginas de resultados disponibles")
-            break
-            
-        if not fetch_all and fetched >= max_results:
-            logger.info(f"Se alcanzó el máximo de resultados solicitados: {max_results}")
-            break
-    
-    # Limitar resultados si no es fetch_all
-    if not fetch_all and len(results) > max_results:
-        results = results[:max_results]
-        
-    logger.info(f"Búsqueda por tipo completada. Total de resultados: {len(results)}")
-    return results, token
+    return run_search(type_query(place_type), location, radius, max_results, next_page_token, fetch_all)
 
 def subdivide_area_search(query, lat, lng, radius, max_results=100, max_depth=2, current_depth=0, callback=None):
     """
@@ -199,190 +291,19 @@ def subdivide_area_search(query, lat, lng, radius, max_results=100, max_depth=2,
         radius: Radio original en metros
         max_results: Número máximo de resultados a devolver (0 para sin límite)
         max_depth: Profundidad máxima de subdivisión recursiva
-        current_depth: Profundidad actual de la recursión
+        current_depth: Profundidad inicial de la subdivisión
         callback: Función opcional para recibir resultados parciales
         
     Returns:
         Lista de resultados combinados y eliminados duplicados
     """
-    depth_str = "  " * current_depth
-    logger.info(f"{depth_str}Iniciando búsqueda subdividida (nivel {current_depth}): query={query}, centro=({lat},{lng}), radio={radius}m")
-    
-    # Asegurarse de que el radio no exceda el límite de la API
-    radius = min(radius, 50000)
-    
-    # Número máximo de resultados a buscar en cada punto antes de considerar que es suficiente
-    max_new_results_per_point = 10
-    
-    # Número máximo de puntos consecutivos con pocos resultados nuevos antes de detenerse
-    max_low_yield_points = 5
-    low_yield_count = 0
-    
-    # Definir límites para la profundidad de recursión
-    if current_depth >= max_depth:
-        num_divisions = 1  # 2x2 = 4 cuadrantes en niveles profundos
-    else:
-        if radius < 5000:
-            num_divisions = 1  # 2x2 = 4 cuadrantes
-        elif radius < 20000:
-            num_divisions = 2  # 3x3 = 9 cuadrantes
-        else:
-            num_divisions = 3  # 4x4 = 16 cuadrantes (reducido para evitar exceso de llamadas)
-    
-    # Factor de reducción de radio para evitar solapamiento excesivo
-    radius_factor = 0.7 if current_depth == 0 else 0.8
-    sub_radius = radius * radius_factor / (num_divisions + 1)
-    
-    grid_size = num_divisions * 2 + 1
-    logger.info(f"{depth_str}Usando cuadrícula {grid_size}x{grid_size} ({grid_size*grid_size} puntos) con radio {sub_radius}m")
-    
-    # Calculamos el desplazamiento base en grados
-    lat_step = (radius / 111000) / (num_divisions + 0.5)
-    lng_step = lat_step / math.cos(math.radians(lat))
-    
-    # Generar los puntos de la cuadrícula
-    grid_points = []
-    
-    # Crear una cuadrícula de puntos alrededor del centro
-    for i in range(-num_divisions, num_divisions+1):
-        for j in range(-num_divisions, num_divisions+1):
-            grid_points.append({
-                "lat": lat + i * lat_step,
-                "lng": lng + j * lng_step
-            })
-    
-    logger.info(f"{depth_str}Generados {len(grid_points)} puntos de búsqueda")
-    
-    all_results = []
-    place_ids = set()
-    
-    # Para cada punto de la cuadrícula
-    for i, point in enumerate(grid_points):
-        # Si llevamos varios puntos con pocos resultados nuevos, saltar el resto
-        if low_yield_count >= max_low_yield_points and current_depth > 0:
-            logger.info(f"{depth_str}Saltando puntos restantes debido a bajo rendimiento ({low_yield_count} puntos con pocos resultados nuevos)")
-            break
-            
-        logger.info(f"{depth_str}Buscando en punto {i+1}/{len(grid_points)}: centro=({point['lat']},{point['lng']}), radio={sub_radius}m")
-        try:
-            # Convertir coordenadas al formato requerido por la API
-            location = f"{point['lat']},{point['lng']}"
-            
-            # Buscar en este punto con el radio correspondiente
-            results, _ = search_places(query, location, sub_radius, 60, None, True)
-            
-            # Agregar resultados no duplicados
-            new_results_count = 0
-            new_results = []  # Para almacenar solo los resultados nuevos
-            
-            for result in results:
-                place_id = result.get("place_id")
-                if place_id and place_id not in place_ids:
-                    place_ids.add(place_id)
-                    all_results.append(result)
-                    new_results.append(result)
-                    new_results_count += 1
-            
-            logger.info(f"{depth_str}Punto {i+1}/{len(grid_points)}: {new_results_count} nuevos resultados, total acumulado: {len(all_results)}")
-            
-            # Si hay callback y estamos en el nivel principal, enviar resultados parciales
-            if callback and current_depth == 0 and new_results:
-                callback({
-                    "new_results": new_results,
-                    "total_count": len(all_results),
-                    "status": "in_progress",
-                    "progress": {
-                        "current_point": i + 1,
-                        "total_points": len(grid_points)
-                    }
-                })
-            
-            # Evaluar si vale la pena continuar con más puntos
-            if new_results_count < max_new_results_per_point:
-                low_yield_count += 1
-            else:
-                low_yield_count = 0  # Reiniciar contador si encontramos suficientes resultados nuevos
-            
-            # Si estamos en un nivel no demasiado profundo y hemos encontrado muchos resultados,
-            # podemos intentar subdividir solo si tiene sentido (pocos puntos con bajo rendimiento)
-            if new_results_count >= 20 and current_depth < max_depth and low_yield_count <= 2:
-                logger.info(f"{depth_str}Encontrado punto con buenos resultados. Subdividiendo para buscar más.")
-                
-                # Calcular un radio más pequeño para la subdivisión
-                smaller_radius = sub_radius * 0.6
-                
-                # Llamada recursiva para este punto específico
-                sub_results, _ = subdivide_area_search(
-                    query, point['lat'], point['lng'], 
-                    smaller_radius, max_results,
-                    max_depth, current_depth + 1,
-                    callback if current_depth == 0 else None  # Solo pasar callback en nivel principal
-                )
-                
-                # Agregar resultados no duplicados de la subdivisión
-                sub_new_count = 0
-                sub_new_results = []
-                
-                for result in sub_results:
-                    place_id = result.get("place_id")
-                    if place_id and place_id not in place_ids:
-                        place_ids.add(place_id)
-                        all_results.append(result)
-                        sub_new_results.append(result)
-                        sub_new_count += 1
-                
-                logger.info(f"{depth_str}Subdivisión añadió {sub_new_count} nuevos resultados, total: {len(all_results)}")
-                
-                # Si hay callback y estamos en el nivel principal, enviar resultados de subdivisión
-                if callback and current_depth == 0 and sub_new_results:
-                    callback({
-                        "new_results": sub_new_results,
-                        "total_count": len(all_results),
-                        "status": "in_progress",
-                        "progress": {
-                            "current_point": i + 1,
-                            "total_points": len(grid_points),
-                            "subdivision": True
-                        }
-                    })
-            
-            # Esperar entre solicitudes para no exceder los límites de la API
-            time.sleep(0.5)
-            
-            # Si ya tenemos suficientes resultados, detenemos la búsqueda
-            # Solo si max_results > 0 (si es 0, no hay límite)
-            if max_results > 0 and len(all_results) >= max_results and current_depth == 0:
-                logger.info(f"{depth_str}Alcanzado máximo de resultados deseados ({max_results}). Deteniendo búsqueda.")
-                break
-                
-        except Exception as e:
-            logger.error(f"{depth_str}Error en búsqueda del punto {i+1}: {str(e)}")
-    
-    logger.info(f"{depth_str}Búsqueda subdividida (nivel {current_depth}) completada. Total de resultados únicos: {len(all_results)}")
-    
-    # Limitar a max_results si es necesario y no estamos en llamada recursiva
-    if current_depth == 0 and max_results > 0 and len(all_results) > max_results:
-        logger.info(f"{depth_str}Limitando resultados a {max_results} (de {len(all_results)} encontrados)")
-        all_results = all_results[:max_results]
-    
-    # Si hay callback y hemos terminado la búsqueda principal, enviar evento de finalización
-    if callback and current_depth == 0:
-        callback({
-            "new_results": [],
-            "total_count": len(all_results),
-            "status": "completed",
-            "progress": {
-                "current_point": len(grid_points),
-                "total_points": len(grid_points)
-            }
-        })
-        
-    return all_results, None  # No hay token de paginación en búsquedas subdivididas
+    results = run_subdivided_search(text_query(query), lat, lng, radius, max_results, max_depth - current_depth, callback)
+    return results, None  # No hay token de paginación en búsquedas subdivididas
 
 def subdivide_area_search_by_type(place_type, lat, lng, radius, max_results=100, max_depth=2, current_depth=0, callback=None):
     """
     Divide un área grande en cuadrantes más pequeños para obtener más resultados
-    cuando se busca por tipo de establecimiento, usando estrategia recursiva.
+    cuando se busca por tipo de establecimiento.
     
     Args:
         place_type: Tipo de establecimiento a buscar
@@ -391,182 +312,11 @@ def subdivide_area_search_by_type(place_type, lat, lng, radius, max_results=100,
         radius: Radio original en metros
         max_results: Número máximo de resultados a devolver (0 para sin límite)
         max_depth: Profundidad máxima de subdivisión recursiva
-        current_depth: Profundidad actual de la recursión
+        current_depth: Profundidad inicial de la subdivisión
         callback: Función opcional para recibir resultados parciales
     """
-    depth_str = "  " * current_depth
-    logger.info(f"{depth_str}Iniciando búsqueda por tipo subdividida (nivel {current_depth}): type={place_type}, centro=({lat},{lng}), radio={radius}m")
-    
-    # Asegurarse de que el radio no exceda el límite de la API
-    radius = min(radius, 50000)
-    
-    # Número máximo de resultados a buscar en cada punto antes de considerar que es suficiente
-    max_new_results_per_point = 10
-    
-    # Número máximo de puntos consecutivos con pocos resultados nuevos antes de detenerse
-    max_low_yield_points = 5
-    low_yield_count = 0
-    
-    # Definir límites para la profundidad de recursión
-    if current_depth >= max_depth:
-        num_divisions = 1  # 2x2 = 4 cuadrantes en niveles profundos
-    else:
-        if radius < 5000:
-            num_divisions = 1  # 2x2 = 4 cuadrantes
-        elif radius < 20000:
-            num_divisions = 2  # 3x3 = 9 cuadrantes
-        else:
-            num_divisions = 3  # 4x4 = 16 cuadrantes (reducido para evitar exceso de llamadas)
-    
-    # Factor de reducción de radio para evitar solapamiento excesivo
-    radius_factor = 0.7 if current_depth == 0 else 0.8
-    sub_radius = radius * radius_factor / (num_divisions + 1)
-    
-    grid_size = num_divisions * 2 + 1
-    logger.info(f"{depth_str}Usando cuadrícula {grid_size}x{grid_size} ({grid_size*grid_size} puntos) con radio {sub_radius}m")
-    
-    # Calculamos el desplazamiento base en grados
-    lat_step = (radius / 111000) / (num_divisions + 0.5)
-    lng_step = lat_step / math.cos(math.radians(lat))
-    
-    # Generar los puntos de la cuadrícula
-    grid_points = []
-    
-    # Crear una cuadrícula de puntos alrededor del centro
-    for i in range(-num_divisions, num_divisions+1):
-        for j in range(-num_divisions, num_divisions+1):
-            grid_points.append({
-                "lat": lat + i * lat_step,
-                "lng": lng + j * lng_step
-            })
-    
-    logger.info(f"{depth_str}Generados {len(grid_points)} puntos de búsqueda para tipo {place_type}")
-    
-    all_results = []
-    place_ids = set()
-    
-    # Para cada punto de la cuadrícula
-    for i, point in enumerate(grid_points):
-        # Si llevamos varios puntos con pocos resultados nuevos, saltar el resto
-        if low_yield_count >= max_low_yield_points and current_depth > 0:
-            logger.info(f"{depth_str}Saltando puntos restantes debido a bajo rendimiento ({low_yield_count} puntos con pocos resultados nuevos)")
-            break
-            
-        logger.info(f"{depth_str}Buscando en punto {i+1}/{len(grid_points)}: centro=({point['lat']},{point['lng']}), radio={sub_radius}m")
-        try:
-            # Convertir coordenadas al formato requerido por la API
-            location = f"{point['lat']},{point['lng']}"
-            
-            # Buscar en este punto con el radio correspondiente
-            results, _ = search_places_by_type(place_type, location, sub_radius, 60, None, True)
-            
-            # Agregar resultados no duplicados
-            new_results_count = 0
-            new_results = []  # Para almacenar solo los resultados nuevos
-            
-            for result in results:
-                place_id = result.get("place_id")
-                if place_id and place_id not in place_ids:
-                    place_ids.add(place_id)
-                    all_results.append(result)
-                    new_results.append(result)
-                    new_results_count += 1
-            
-            logger.info(f"{depth_str}Punto {i+1}/{len(grid_points)}: {new_results_count} nuevos resultados, total acumulado: {len(all_results)}")
-            
-            # Si hay callback y estamos en el nivel principal, enviar resultados parciales
-            if callback and current_depth == 0 and new_results:
-                callback({
-                    "new_results": new_results,
-                    "total_count": len(all_results),
-                    "status": "in_progress",
-                    "progress": {
-                        "current_point": i + 1,
-                        "total_points": len(grid_points)
-                    }
-                })
-            
-            # Evaluar si vale la pena continuar con más puntos
-            if new_results_count < max_new_results_per_point:
-                low_yield_count += 1
-            else:
-                low_yield_count = 0  # Reiniciar contador si encontramos suficientes resultados nuevos
-            
-            # Si estamos en un nivel no demasiado profundo y hemos encontrado muchos resultados,
-            # podemos intentar subdividir solo si tiene sentido (pocos puntos con bajo rendimiento)
-            if new_results_count >= 20 and current_depth < max_depth and low_yield_count <= 2:
-                logger.info(f"{depth_str}Encontrado punto con buenos resultados. Subdividiendo para buscar más.")
-                
-                # Calcular un radio más pequeño para la subdivisión
-                smaller_radius = sub_radius * 0.6
-                
-                # Llamada recursiva para este punto específico
-                sub_results, _ = subdivide_area_search_by_type(
-                    place_type, point['lat'], point['lng'], 
-                    smaller_radius, max_results,
-                    max_depth, current_depth + 1,
-                    callback if current_depth == 0 else None  # Solo pasar callback en nivel principal
-                )
-                
-                # Agregar resultados no duplicados de la subdivisión
-                sub_new_count = 0
-                sub_new_results = []
-                
-                for result in sub_results:
-                    place_id = result.get("place_id")
-                    if place_id and place_id not in place_ids:
-                        place_ids.add(place_id)
-                        all_results.append(result)
-                        sub_new_results.append(result)
-                        sub_new_count += 1
-                
-                logger.info(f"{depth_str}Subdivisión añadió {sub_new_count} nuevos resultados, total: {len(all_results)}")
-                
-                # Si hay callback y estamos en el nivel principal, enviar resultados de subdivisión
-                if callback and current_depth == 0 and sub_new_results:
-                    callback({
-                        "new_results": sub_new_results,
-                        "total_count": len(all_results),
-                        "status": "in_progress",
-                        "progress": {
-                            "current_point": i + 1,
-                            "total_points": len(grid_points),
-                            "subdivision": True
-                        }
-                    })
-            
-            # Esperar entre solicitudes para no exceder los límites de la API
-            time.sleep(0.5)
-            
-            # Si ya tenemos suficientes resultados, detenemos la búsqueda
-            # Solo si max_results > 0 (si es 0, no hay límite)
-            if max_results > 0 and len(all_results) >= max_results and current_depth == 0:
-                logger.info(f"{depth_str}Alcanzado máximo de resultados deseados ({max_results}). Deteniendo búsqueda.")
-                break
-                
-        except Exception as e:
-            logger.error(f"{depth_str}Error en búsqueda del punto {i+1}: {str(e)}")
-    
-    logger.info(f"{depth_str}Búsqueda por tipo subdividida (nivel {current_depth}) completada. Total de resultados únicos: {len(all_results)}")
-    
-    # Limitar a max_results si es necesario y no estamos en llamada recursiva
-    if current_depth == 0 and max_results > 0 and len(all_results) > max_results:
-        logger.info(f"{depth_str}Limitando resultados a {max_results} (de {len(all_results)} encontrados)")
-        all_results = all_results[:max_results]
-    
-    # Si hay callback y hemos terminado la búsqueda principal, enviar evento de finalización
-    if callback and current_depth == 0:
-        callback({
-            "new_results": [],
-            "total_count": len(all_results),
-            "status": "completed",
-            "progress": {
-                "current_point": len(grid_points),
-                "total_points": len(grid_points)
-            }
-        })
-        
-    return all_results, None  # No hay token de paginación en búsquedas subdivididas
+    results = run_subdivided_search(type_query(place_type), lat, lng, radius, max_results, max_depth - current_depth, callback)
+    return results, None  # No hay token de paginación en búsquedas subdivididas
 
 def get_place_details(place_id):
     """
@@ -0,0 +1,244 @@
+import heapq
+import logging
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from bson.objectid import ObjectId
+
+from app.models.integration import Integration
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+class PollingScheduler:
+    """
+    Planificador que realiza el polling de todas las integraciones activas
+    usando un único pool de hilos.
+
+    Cada integración se ejecuta según su propio `polling_interval`. La primera
+    ejecución de cada tablero se desplaza de forma determinista dentro de su
+    intervalo y cada reprogramación añade un pequeño jitter, de modo que las
+    llamadas a Trello se reparten en el tiempo en lugar de llegar en ráfagas.
+    """
+    def __init__(self, app, poll_fn, max_workers=4, refresh_interval=30, min_interval=10, jitter=0.1):
+        """
+        Args:
+            app: Instancia de Flask usada para crear el contexto de aplicación
+            poll_fn: Función que recibe el documento de la integración y procesa sus cambios
+            max_workers: Número de hilos del pool compartido
+            refresh_interval: Segundos entre recargas de la colección de integraciones
+            min_interval: Intervalo mínimo de polling en segundos
+            jitter: Fracción del intervalo usada como variación aleatoria
+        """
+        self.app = app
+        self.poll_fn = poll_fn
+        self.max_workers = max_workers
+        self.refresh_interval = refresh_interval
+        self.min_interval = min_interval
+        self.jitter = jitter
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        # Se incrementa en cada start() y stop(); un hilo del planificador
+        # termina en cuanto deja de ser de la generación actual
+        self._generation = 0
+        self._thread = None
+        self._executor = None
+        # Cola de prioridad con tuplas (próxima_ejecución, integration_id)
+        self._heap = []
+        # integration_id -> {'board_id', 'interval'}
+        self._integrations = {}
+        # Integraciones con una entrada pendiente en el heap
+        self._scheduled = set()
+        self._in_flight = set()
+        self._last_refresh = 0
+        self._last_runs = {}
+
+    def start(self):
+        """
+        Inicia el hilo del planificador y el pool de trabajadores
+        """
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+            self._generation += 1
+            # Cada generación espera en su propio evento: si compartieran uno, el
+            # hilo nuevo podría consumir el aviso de stop() dirigido al anterior
+            self._wakeup = threading.Event()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='trello-poll')
+            self._thread = threading.Thread(target=self._run, args=(self._generation, self._wakeup), name='trello-poll-scheduler')
+            self._thread.daemon = True
+            self._thread.start()
+        logger.info(f"Planificador de polling iniciado con {self.max_workers} trabajadores")
+        return True
+
+    def stop(self):
+        """
+        Detiene el planificador. Las verificaciones en curso terminan normalmente.
+        """
+        with self._lock:
+            if not self._running:
+                return False
+            self._running = False
+            self._generation += 1
+            executor = self._executor
+            self._executor = None
+            self._heap = []
+            self._scheduled = set()
+            self._integrations = {}
+            self._last_refresh = 0
+        self._wakeup.set()
+        if executor:
+            executor.shutdown(wait=False)
+        logger.info("Planificador de polling detenido")
+        return True
+
+    @property
+    def running(self):
+        return self._running
+
+    def refresh(self):
+        """
+        Fuerza la recarga de las integraciones activas en la próxima iteración
+        """
+        with self._lock:
+            self._last_refresh = 0
+        self._wakeup.set()
+
+    def status(self):
+        """
+        Devuelve un resumen del estado del planificador
+        """
+        with self._lock:
+            now = time.time()
+            boards = []
+            for integration_id, info in self._integrations.items():
+                last_run = self._last_runs.get(integration_id)
+                boards.append({
+                    'integration_id': integration_id,
+                    'trello_board_id': info['board_id'],
+                    'polling_interval': info['interval'],
+                    'in_flight': integration_id in self._in_flight,
+                    'last_run': datetime.utcfromtimestamp(last_run).isoformat() if last_run else None
+                })
+            next_run = self._heap[0][0] - now if self._heap else None
+            return {
+                'active': self._running,
+                'workers': self.max_workers,
+                'integrations': boards,
+                'next_run_in': max(next_run, 0) if next_run is not None else None
+            }
+
+    def _initial_offset(self, integration_id, interval):
+        """
+        Desplazamiento estable dentro del intervalo para repartir los tableros
+        """
+        bucket = zlib.crc32(integration_id.encode('utf-8')) % 1000
+        return interval * bucket / 1000.0
+
+    def _next_delay(self, interval):
+        spread = interval * self.jitter
+        return interval + random.uniform(-spread, spread)
+
+    def _is_current(self, generation):
+        return self._generation == generation
+
+    def _load_integrations(self, generation):
+        """
+        Sincroniza la agenda con las integraciones activas de la base de datos
+        """
+        with self.app.app_context():
+            db = self.app.config['MONGO_DB']
+            docs = list(db.integrations.find(
+                {'active': True},
+                {'_id': 1, 'trello_board_id': 1, 'polling_interval': 1}
+            ))
+
+        now = time.time()
+        with self._lock:
+            # Un hilo de una generación anterior no debe tocar la agenda nueva
+            if not self._is_current(generation):
+                return
+            current = {}
+            for doc in docs:
+                integration = Integration.from_dict(doc)
+                if not integration.trello_board_id:
+                    continue
+                integration_id = str(integration._id)
+                interval = max(int(integration.polling_interval or 0), self.min_interval)
+                current[integration_id] = {
+                    'board_id': integration.trello_board_id,
+                    'interval': interval
+                }
+                if integration_id not in self._scheduled and integration_id not in self._in_flight:
+                    offset = self._initial_offset(integration_id, interval)
+                    heapq.heappush(self._heap, (now + offset, integration_id))
+                    self._scheduled.add(integration_id)
+                    logger.info(f"Integración {integration_id} añadida al polling (tablero {integration.trello_board_id}, cada {interval}s)")
+            for integration_id in set(self._integrations) - set(current):
+                logger.info(f"Integración {integration_id} eliminada del polling")
+                self._last_runs.pop(integration_id, None)
+            # Las entradas de integraciones eliminadas se descartan al salir del heap
+            self._integrations = current
+            self._last_refresh = now
+
+    def _run(self, generation, wakeup):
+        while self._is_current(generation):
+            try:
+                if time.time() - self._last_refresh >= self.refresh_interval:
+                    self._load_integrations(generation)
+                self._dispatch_due(generation)
+            except Exception as e:
+                logger.error(f"Error en el planificador de polling: {e}")
+                import traceback
+                logger.error(traceback.format_exc())
+
+            with self._lock:
+                now = time.time()
+                wait = self.refresh_interval - (now - self._last_refresh)
+                if self._heap:
+                    wait = min(wait, self._heap[0][0] - now)
+            wakeup.wait(timeout=max(wait, 0.1))
+            wakeup.clear()
+
+    def _dispatch_due(self, generation):
+        now = time.time()
+        with self._lock:
+            if not self._is_current(generation) or not self._executor:
+                return
+            while self._heap and self._heap[0][0] <= now:
+                _, integration_id = heapq.heappop(self._heap)
+                self._scheduled.discard(integration_id)
+                if integration_id not in self._integrations:
+                    continue
+                self._in_flight.add(integration_id)
+                self._executor.submit(self._poll_integration, integration_id)
+
+    def _poll_integration(self, integration_id):
+        started = time.time()
+        try:
+            with self.app.app_context():
+                db = self.app.config['MONGO_DB']
+                integration = db.integrations.find_one({'_id': ObjectId(integration_id)})
+                if integration and integration.get('active', True):
+                    self.poll_fn(integration)
+        except Exception as e:
+            logger.error(f"Error en el polling de la integración {integration_id}: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+        finally:
+            elapsed = time.time() - started
+            with self._lock:
+                self._in_flight.discard(integration_id)
+                self._last_runs[integration_id] = started
+                info = self._integrations.get(integration_id)
+                if info and self._running and integration_id not in self._scheduled:
+                    heapq.heappush(self._heap, (started + self._next_delay(info['interval']), integration_id))
+                    self._scheduled.add(integration_id)
+            logger.debug(f"Polling de la integración {integration_id} completado en {elapsed:.2f}s")
+            self._wakeup.set()
@@ -0,0 +1,41 @@
+import threading
+import time
+
+class TokenBucket:
+    """
+    Limitador de tipo token bucket, seguro entre hilos
+    """
+    def __init__(self, rate, period):
+        self.capacity = rate
+        self.fill_rate = rate / period
+        self.tokens = float(rate)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.fill_rate)
+        self.updated_at = now
+
+    def acquire(self):
+        """
+        Toma un token, esperando si no hay. Devuelve los segundos esperados.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.fill_rate
+            time.sleep(wait)
+            waited += wait
+
+    def limit_to(self, remaining):
+        """
+        Ajusta los tokens disponibles al cupo restante que informa el servidor
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, max(float(remaining), 0.0))
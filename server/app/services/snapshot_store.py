@@ -0,0 +1,110 @@
+import logging
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.models.card_snapshot import CardSnapshot
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+# Campos necesarios para reconstruir una tarjeta al comparar cambios
+SNAPSHOT_FIELDS = {
+    '_id': 0,
+    'card_id': 1,
+    'name': 1,
+    'id_list': 1,
+    'description': 1,
+    'labels': 1,
+    'due': 1,
+    'members': 1,
+    'attachments': 1,
+    'short_url': 1,
+    'date_last_activity': 1,
+    'content_hash': 1,
+    'pending_update': 1,
+    'pending_since': 1
+}
+
+class SnapshotStore:
+    """
+    Almacén persistente del último estado visto de cada tablero.
+
+    Las tarjetas se guardan en la colección `card_snapshots` (una instantánea
+    compacta con su hash de contenido) y los IDs de listas conocidas en el
+    propio documento de la integración. La colección es exclusiva del
+    polling: `card_states` sigue siendo de la revisión de cambios pendientes
+    y ninguno de los dos procesos pisa los campos del otro. Así un proceso reiniciado, u otro
+    trabajador, puede seguir comparando cambios sin perder eventos.
+    """
+    def __init__(self, db):
+        self.db = db
+
+    def load(self, integration_id):
+        """
+        Carga la instantánea de una integración.
+
+        Returns:
+            Tupla (list_ids, cards). list_ids es None si la integración todavía
+            no tiene instantánea; cards es un diccionario card_id -> CardSnapshot.
+        """
+        integration_oid = ObjectId(str(integration_id))
+        integration = self.db.integrations.find_one({'_id': integration_oid}, {'snapshot_list_ids': 1})
+        if not integration or integration.get('snapshot_list_ids') is None:
+            return None, {}
+        cards = {}
+        for doc in self.db.card_snapshots.find({'integration_id': integration_oid}, SNAPSHOT_FIELDS):
+            cards[doc['card_id']] = CardSnapshot.from_dict(doc)
+        return set(integration['snapshot_list_ids']), cards
+
+    def save(self, integration_id, list_ids, changed_cards, removed_card_ids=None, cursor=None, pending_updates=None):
+        """
+        Persiste los cambios de la instantánea de una integración.
+
+        Args:
+            integration_id: ID de la integración
+            list_ids: IDs de las listas abiertas del tablero
+            changed_cards: Tarjetas de Trello nuevas o modificadas
+            removed_card_ids: IDs de tarjetas que ya no existen en el tablero
+            cursor: Fecha de la última acción de Trello aplicada
+            pending_updates: Diccionario card_id -> tarjeta anterior de las
+                actualizaciones que quedan pendientes de notificar. Si la tarjeta
+                ya tenía una pendiente se conserva la más antigua.
+        """
+        integration_oid = ObjectId(str(integration_id))
+        now = datetime.utcnow()
+        operations = []
+        for card in changed_cards:
+            state = CardSnapshot.from_trello_card(integration_oid, card).to_dict()
+            state.pop('_id')
+            operations.append(UpdateOne(
+                {'integration_id': integration_oid, 'card_id': card['id']},
+                {'$set': state},
+                upsert=True
+            ))
+        for card_id, old_card in (pending_updates or {}).items():
+            operations.append(UpdateOne(
+                {'integration_id': integration_oid, 'card_id': card_id, 'pending_update': None},
+                {'$set': {'pending_update': old_card, 'pending_since': now}}
+            ))
+        if operations:
+            self.db.card_snapshots.bulk_write(operations, ordered=False)
+        if removed_card_ids:
+            self.db.card_snapshots.delete_many({
+                'integration_id': integration_oid,
+                'card_id': {'$in': list(removed_card_ids)}
+            })
+        integration_update = {'snapshot_list_ids': sorted(list_ids), 'last_check': now}
+        if cursor:
+            integration_update['actions_cursor'] = cursor
+        self.db.integrations.update_one({'_id': integration_oid}, {'$set': integration_update})
+        logger.debug(f"Instantánea guardada para la integración {integration_id}: {len(operations) - len(pending_updates or {})} tarjetas actualizadas, {len(removed_card_ids or [])} eliminadas")
+
+    def clear_pending(self, integration_id, card_id):
+        """
+        Marca como notificada la actualización pendiente de una tarjeta
+        """
+        self.db.card_snapshots.update_one(
+            {'integration_id': ObjectId(str(integration_id)), 'card_id': card_id},
+            {'$unset': {'pending_update': '', 'pending_since': ''}}
+        )
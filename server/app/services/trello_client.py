@@ -0,0 +1,239 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.services.metrics import histogram
+from app.services.rate_limit import TokenBucket
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+TRELLO_API_URL = "https://api.trello.com/1"
+
+# Límite de Trello por token: 100 solicitudes cada 10 segundos
+DEFAULT_RATE = 100
+DEFAULT_PERIOD = 10.0
+# Timeout por defecto (conexión, lectura) en segundos
+DEFAULT_TIMEOUT = (5, 30)
+# Estados que justifican reintentar una solicitud idempotente
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+# Rutas máximas por llamada a /batch
+BATCH_MAX_ROUTES = 10
+
+# IDs de Trello (24 caracteres hexadecimales) para agrupar métricas por endpoint
+_ID_PATTERN = re.compile(r'/[0-9a-f]{24}(?=/|$)')
+
+class TrelloHttpClient:
+    """
+    Cliente HTTP compartido para la API de Trello.
+
+    Reutiliza conexiones con una `requests.Session` (keep-alive y pool), limita
+    el ritmo con un token bucket por API key, respeta las respuestas 429 y las
+    cabeceras `x-rate-limit-*` de Trello, reintenta con espera exponencial con
+    jitter y aplica timeouts a todas las solicitudes. Su método `request` tiene
+    la misma firma que `requests.request`, así que también sirve como
+    `http_service` de py-trello.
+    """
+    def __init__(self, rate=DEFAULT_RATE, period=DEFAULT_PERIOD, timeout=DEFAULT_TIMEOUT,
+                 max_retries=3, backoff_base=0.5, backoff_max=10.0, pool_size=20):
+        """
+        Args:
+            rate: Solicitudes permitidas por API key dentro de `period`
+            period: Ventana del límite en segundos
+            timeout: Timeout por defecto (conexión, lectura)
+            max_retries: Reintentos ante 429, errores 5xx o de conexión
+            backoff_base: Espera base en segundos del backoff exponencial
+            backoff_max: Espera máxima entre reintentos
+            pool_size: Conexiones mantenidas abiertas con Trello
+        """
+        self.rate = rate
+        self.period = period
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            'requests': 0, 'retries': 0, 'throttled': 0, 'errors': 0, 'rate_limit_wait_s': 0.0,
+            'batch_calls': 0, 'batched_routes': 0
+        }
+
+    def _bucket(self, api_key):
+        with self._lock:
+            bucket = self._buckets.get(api_key)
+            if bucket is None:
+                bucket = self._buckets[api_key] = TokenBucket(self.rate, self.period)
+            return bucket
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _backoff(self, attempt, response=None):
+        """
+        Calcula la espera antes de un reintento: Retry-After si Trello lo indica,
+        si no backoff exponencial con jitter completo
+        """
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _update_limits(self, bucket, response):
+        """
+        Reduce el cupo local si Trello informa de que quedan pocas solicitudes
+        """
+        for header in ('x-rate-limit-api-token-remaining', 'x-rate-limit-api-key-remaining'):
+            remaining = response.headers.get(header)
+            if remaining is not None:
+                try:
+                    bucket.limit_to(int(remaining))
+                except ValueError:
+                    pass
+
+    @staticmethod
+    def endpoint(url):
+        """
+        Nombre del endpoint para métricas: ruta sin dominio y con los IDs sustituidos
+        """
+        path = url.split('api.trello.com/1', 1)[-1].split('?', 1)[0]
+        return _ID_PATTERN.sub('/:id', path) or '/'
+
+    def request(self, method, url, params=None, timeout=None, **kwargs):
+        """
+        Realiza una solicitud a Trello. Acepta URLs absolutas o rutas relativas
+        a https://api.trello.com/1 y devuelve el `requests.Response` final.
+        """
+        method = method.upper()
+        if not url.startswith('http'):
+            url = f"{TRELLO_API_URL}/{url.lstrip('/')}"
+        api_key = (params or {}).get('key') or os.environ.get('TRELLO_API_KEY') or ''
+        bucket = self._bucket(api_key)
+        latency = histogram(f"trello.http {method} {self.endpoint(url)}")
+        timeout = timeout or self.timeout
+
+        attempt = 0
+        while True:
+            waited = bucket.acquire()
+            if waited:
+                self._count('rate_limit_wait_s', waited)
+            self._count('requests')
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, params=params, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                latency.observe(time.perf_counter() - start)
+                # Sin respuesta solo se reintentan métodos idempotentes o fallos al conectar
+                retriable = method in IDEMPOTENT_METHODS or isinstance(e, requests.ConnectTimeout)
+                if attempt >= self.max_retries or not retriable:
+                    self._count('errors')
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"Error de red con Trello ({method} {self.endpoint(url)}): {e}. Reintento en {delay:.2f}s")
+            else:
+                latency.observe(time.perf_counter() - start)
+                self._update_limits(bucket, response)
+                if response.status_code == 429:
+                    self._count('throttled')
+                    bucket.limit_to(0)
+                # Un 429 no se ha procesado, así que se puede reintentar cualquier método
+                retriable = response.status_code == 429 or (
+                    response.status_code in RETRY_STATUSES and method in IDEMPOTENT_METHODS
+                )
+                if not retriable or attempt >= self.max_retries:
+                    if response.status_code >= 400:
+                        self._count('errors')
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.warning(f"Trello respondió {response.status_code} a {method} {self.endpoint(url)}. Reintento en {delay:.2f}s")
+            attempt += 1
+            self._count('retries')
+            time.sleep(delay)
+
+    def get(self, url, params=None, **kwargs):
+        return self.request('GET', url, params=params, **kwargs)
+
+    def post(self, url, params=None, **kwargs):
+        return self.request('POST', url, params=params, **kwargs)
+
+    def put(self, url, params=None, **kwargs):
+        return self.request('PUT', url, params=params, **kwargs)
+
+    def delete(self, url, params=None, **kwargs):
+        return self.request('DELETE', url, params=params, **kwargs)
+
+    @staticmethod
+    def batch_route(path, **query):
+        """
+        Construye una ruta para /batch: relativa a /1 y con las comas de los
+        parámetros codificadas para no confundirlas con el separador de rutas
+        """
+        route = '/' + path.lstrip('/')
+        if query:
+            route += '?' + '&'.join(f"{key}={str(value).replace(',', '%2C')}" for key, value in query.items())
+        return route
+
+    def batch(self, routes, params=None):
+        """
+        Ejecuta varios GET en llamadas a /batch de hasta 10 rutas cada una.
+
+        Args:
+            routes: Rutas construidas con `batch_route`
+            params: Parámetros comunes de la llamada (key y token)
+
+        Returns:
+            Lista alineada con `routes` de tuplas (status, body). Si una llamada
+            a /batch falla, sus rutas se devuelven con el estado de esa llamada
+            y body None.
+        """
+        results = []
+        for offset in range(0, len(routes), BATCH_MAX_ROUTES):
+            chunk = routes[offset:offset + BATCH_MAX_ROUTES]
+            self._count('batch_calls')
+            self._count('batched_routes', len(chunk))
+            response = self.get('batch', params={**(params or {}), 'urls': ','.join(chunk)})
+            if response.status_code != 200:
+                logger.error(f"Error en /batch de Trello: HTTP {response.status_code}")
+                results.extend((response.status_code, None) for _ in chunk)
+                continue
+            for item in response.json():
+                # Cada resultado es {"<status>": cuerpo}
+                status, body = next(iter(item.items()))
+                try:
+                    status = int(status)
+                except ValueError:
+                    # Trello devuelve {"name": ..., "message": ...} en algunos errores
+                    status, body = 500, item
+                results.append((status, body if status == 200 else None))
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['rate_limit_wait_s'] = round(stats['rate_limit_wait_s'], 3)
+        return stats
+
+# Instancia compartida por todos los módulos
+trello_http = TrelloHttpClient(
+    rate=int(os.environ.get('TRELLO_RATE_LIMIT', DEFAULT_RATE)),
+    pool_size=int(os.environ.get('TRELLO_POOL_SIZE', 20))
+)
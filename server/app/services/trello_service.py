@@ -1,7 +1,7 @@
 import os
-import requests
 from trello import TrelloClient
 from app import app
+from app.services.trello_client import trello_http
 
 class TrelloService:
     """
@@ -21,7 +21,8 @@ class TrelloService:
         # Cliente oficial de Trello
         self.client = TrelloClient(
             api_key=self.api_key,
-            token=self.token
+            token=self.token,
+            http_service=trello_http
         )
     
     def get_board(self, board_id):
@@ -79,7 +80,7 @@ class TrelloService:
                 'description': 'Webhook para integración Trello-Discord',
             }
             
-            response = requests.post(url, params=params)
+            response = trello_http.post(url, params=params)
             response.raise_for_status()
             
             return response.json()
@@ -98,7 +99,7 @@ class TrelloService:
                 'token': self.token
             }
             
-            response = requests.delete(url, params=params)
+            response = trello_http.delete(url, params=params)
             response.raise_for_status()
             
             return True
@@ -117,7 +118,7 @@ class TrelloService:
                 'token': self.token
             }
             
-            response = requests.get(url, params=params)
+            response = trello_http.get(url, params=params)
             response.raise_for_status()
             
             return response.json()
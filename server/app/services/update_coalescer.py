@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+
+from app.services.card_diff import diff_cards
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+class UpdateCoalescer:
+    """
+    Agrupa las actualizaciones de una misma tarjeta dentro de una ventana de tiempo.
+
+    La primera actualización de una tarjeta abre una ventana de `window_seconds`;
+    las siguientes solo sustituyen la versión nueva. Al cerrarse la ventana se
+    notifica una única vez comparando la versión anterior a la primera
+    actualización con la más reciente, de modo que varias ediciones seguidas
+    producen un solo mensaje resumen y las que se deshacen no producen ninguno.
+
+    Las ventanas solo viven en memoria. Quien registra una actualización debe
+    haberla persistido antes (ver SnapshotStore.save); `on_done` se llama
+    cuando la ventana se ha resuelto para que pueda borrarla, así que un
+    reinicio dentro de la ventana no pierde la notificación.
+    """
+    def __init__(self, app, flush_fn, window_seconds=60, on_done=None):
+        """
+        Args:
+            app: Instancia de Flask usada para crear el contexto de aplicación
+            flush_fn: Función que recibe (old_card, new_card) y envía la notificación
+            window_seconds: Segundos que se acumulan cambios de una tarjeta (0 desactiva la agrupación)
+            on_done: Función opcional que recibe (card_id, integration_id) cuando la
+                actualización se ha notificado o se ha descartado por revertida
+        """
+        self.app = app
+        self.flush_fn = flush_fn
+        self.window_seconds = window_seconds
+        self.on_done = on_done
+
+        # card_id -> {'old', 'new', 'integration_id', 'deadline', 'events'}; el orden
+        # de inserción coincide con el de vencimiento porque la ventana es fija
+        self._pending = {}
+        # Tarjetas cuya ventana ya venció y se está notificando
+        self._flushing = set()
+        self._condition = threading.Condition()
+        self._thread = None
+        self.counters = {'events': 0, 'flushed': 0, 'reverted': 0}
+
+    def add(self, card_id, old_card, new_card, integration_id=None):
+        """
+        Registra una actualización de tarjeta
+        """
+        if self.window_seconds <= 0:
+            with self._condition:
+                self.counters['events'] += 1
+                self._flushing.add(card_id)
+            self._flush_entry(card_id, {'old': old_card, 'new': new_card, 'integration_id': integration_id, 'events': 1})
+            return
+        with self._condition:
+            self.counters['events'] += 1
+            entry = self._pending.get(card_id)
+            if entry is None:
+                self._pending[card_id] = {
+                    'old': old_card,
+                    'new': new_card,
+                    'integration_id': integration_id,
+                    'deadline': time.monotonic() + self.window_seconds,
+                    'events': 1
+                }
+            else:
+                entry['new'] = new_card
+                entry['events'] += 1
+            self._ensure_thread()
+            self._condition.notify()
+
+    def is_pending(self, card_id):
+        """
+        Indica si la tarjeta tiene una ventana abierta o notificándose
+        """
+        with self._condition:
+            return card_id in self._pending or card_id in self._flushing
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='update-coalescer')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _take_due(self):
+        """
+        Espera a que venza al menos una ventana y devuelve las entradas vencidas
+        """
+        with self._condition:
+            while True:
+                if not self._pending:
+                    self._condition.wait()
+                    continue
+                now = time.monotonic()
+                first_deadline = next(iter(self._pending.values()))['deadline']
+                if first_deadline > now:
+                    self._condition.wait(first_deadline - now)
+                    continue
+                due = []
+                for card_id, entry in list(self._pending.items()):
+                    if entry['deadline'] > now:
+                        break
+                    due.append((card_id, self._pending.pop(card_id)))
+                    self._flushing.add(card_id)
+                return due
+
+    def _run(self):
+        while True:
+            for card_id, entry in self._take_due():
+                self._flush_entry(card_id, entry)
+
+    def _flush_entry(self, card_id, entry):
+        try:
+            with self.app.app_context():
+                if not diff_cards(entry['old'], entry['new']):
+                    with self._condition:
+                        self.counters['reverted'] += 1
+                    logger.info(f"Cambios de la tarjeta {card_id} revertidos dentro de la ventana; no se notifica")
+                else:
+                    if entry['events'] > 1:
+                        logger.info(f"Agrupadas {entry['events']} actualizaciones de la tarjeta {card_id} en un mensaje")
+                    self.flush_fn(entry['old'], entry['new'])
+                    with self._condition:
+                        self.counters['flushed'] += 1
+                if self.on_done:
+                    self.on_done(card_id, entry.get('integration_id'))
+        except Exception as e:
+            # La actualización sigue persistida y se recuperará más tarde
+            logger.error(f"Error al notificar la actualización agrupada de la tarjeta {card_id}: {e}")
+        finally:
+            with self._condition:
+                self._flushing.discard(card_id)
+
+    def flush_all(self):
+        """
+        Notifica inmediatamente todas las actualizaciones pendientes
+        """
+        with self._condition:
+            pending = list(self._pending.items())
+            self._pending.clear()
+            self._flushing.update(card_id for card_id, _ in pending)
+        for card_id, entry in pending:
+            self._flush_entry(card_id, entry)
+
+    def stats(self):
+        with self._condition:
+            return dict(self.counters, pending=len(self._pending), window_seconds=self.window_seconds)
@@ -0,0 +1,71 @@
+import logging
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+
+from app.services.cache import LRUCache
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+class ActionDeduplicator:
+    """
+    Detecta acciones de Trello repetidas por su `action['id']`.
+
+    Una caché LRU en memoria evita consultar MongoDB para los reenvíos más
+    habituales. La fuente de verdad es una colección con TTL en la que el
+    `_id` del documento es el ID de la acción: la inserción es atómica, así
+    que si varios procesos reciben la misma acción solo uno la reclama.
+    """
+    def __init__(self, db, collection='webhook_actions_seen', ttl_hours=48, maxsize=10000):
+        """
+        Args:
+            db: Base de datos de MongoDB
+            collection: Nombre de la colección con las acciones vistas
+            ttl_hours: Horas que se recuerda una acción
+            maxsize: Número máximo de acciones en la caché en memoria
+        """
+        self.db = db
+        self.collection = db[collection]
+        self.ttl_hours = ttl_hours
+        self.seen = LRUCache(maxsize=maxsize, ttl=ttl_hours * 3600)
+        self.duplicates = 0
+
+    def claim(self, action_id):
+        """
+        Reclama una acción. Devuelve True si es la primera vez que se ve y
+        False si es un reenvío que debe ignorarse.
+        """
+        if not action_id:
+            return True
+        if action_id in self.seen:
+            self.duplicates += 1
+            return False
+        now = datetime.utcnow()
+        try:
+            self.collection.insert_one({
+                '_id': action_id,
+                'created_at': now,
+                'expire_at': now + timedelta(hours=self.ttl_hours)
+            })
+        except DuplicateKeyError:
+            self.seen.set(action_id, True)
+            self.duplicates += 1
+            logger.info(f"Acción de Trello duplicada ignorada: {action_id}")
+            return False
+        self.seen.set(action_id, True)
+        return True
+
+    def release(self, action_id):
+        """
+        Libera una acción reclamada cuyo procesamiento no llegó a encolarse
+        """
+        if not action_id:
+            return
+        self.seen.pop(action_id)
+        self.collection.delete_one({'_id': action_id})
+
+    def stats(self):
+        return {
+            'duplicates': self.duplicates,
+            'cache': self.seen.stats()
+        }
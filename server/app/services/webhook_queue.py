@@ -0,0 +1,225 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, ReturnDocument
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_PROCESSING = 'processing'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+class PermanentWebhookError(Exception):
+    """
+    Error que no se resuelve reintentando (por ejemplo, una tarjeta que ya no
+    existe). El evento se marca como fallido sin agotar los reintentos.
+    """
+
+# Excepciones que indican un fallo determinista del manejador: reintentar
+# solo repetiría el mismo error hasta agotar max_attempts
+PERMANENT_ERRORS = (PermanentWebhookError, TypeError, KeyError, AttributeError)
+
+class WebhookQueue:
+    """
+    Cola persistente de webhooks de Trello respaldada por una colección de MongoDB.
+
+    El endpoint solo valida y encola el payload; un pool de hilos reclama los
+    eventos y los procesa en segundo plano. Cada reclamación concede un plazo
+    (`lease_seconds`): si el trabajador muere antes de confirmar, el evento
+    vuelve a estar disponible al vencer el plazo, por lo que la entrega es
+    al menos una vez (at-least-once) también entre varios procesos. Mientras
+    el manejador se ejecuta, el plazo se renueva periódicamente para que otro
+    trabajador no reclame un evento que sigue en curso.
+
+    Los trabajadores no arrancan al importar el módulo sino con el primer
+    `enqueue()` del proceso, así que funcionan igual con `python run.py`,
+    `flask run` o gunicorn. `start()` permite arrancarlos antes para procesar
+    los eventos que quedaron pendientes.
+    """
+    def __init__(self, app, handler, collection='webhook_events', workers=2,
+                 lease_seconds=120, max_attempts=5, retention_hours=72, poll_interval=1.0,
+                 permanent_errors=PERMANENT_ERRORS):
+        """
+        Args:
+            app: Instancia de Flask usada para crear el contexto de aplicación
+            handler: Función que recibe el payload del webhook y lo procesa
+            collection: Nombre de la colección de MongoDB usada como cola
+            workers: Número de hilos trabajadores
+            lease_seconds: Segundos que un evento queda reservado por un trabajador
+            max_attempts: Intentos antes de marcar un evento como fallido
+            retention_hours: Horas que se conservan los eventos procesados
+            poll_interval: Segundos de espera cuando la cola está vacía
+            permanent_errors: Excepciones que marcan el evento como fallido sin reintentos
+        """
+        self.app = app
+        self.handler = handler
+        self.collection_name = collection
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_hours = retention_hours
+        self.poll_interval = poll_interval
+        self.permanent_errors = permanent_errors
+
+        self._wakeup = threading.Event()
+        self._running = False
+        self._threads = []
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        return self.app.config['MONGO_DB'][self.collection_name]
+
+    def enqueue(self, payload):
+        """
+        Guarda un webhook en la cola y despierta a un trabajador
+        """
+        action = payload.get('action', {})
+        now = datetime.utcnow()
+        result = self.collection.insert_one({
+            'payload': payload,
+            'action_id': action.get('id'),
+            'action_type': action.get('type'),
+            'status': STATUS_PENDING,
+            'attempts': 0,
+            'available_at': now,
+            'created_at': now
+        })
+        if not self._running:
+            self.start()
+        self._wakeup.set()
+        return result.inserted_id
+
+    def start(self):
+        """
+        Inicia los hilos trabajadores
+        """
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"webhook-worker-{index}")
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Cola de webhooks iniciada con {self.workers} trabajadores")
+        return True
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            self._threads = []
+        self._wakeup.set()
+
+    def stats(self):
+        """
+        Devuelve el número de eventos por estado
+        """
+        pipeline = [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]
+        return {doc['_id']: doc['count'] for doc in self.collection.aggregate(pipeline)}
+
+    def _claim(self):
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {
+                'status': {'$in': [STATUS_PENDING, STATUS_PROCESSING]},
+                'available_at': {'$lte': now}
+            },
+            {
+                '$set': {
+                    'status': STATUS_PROCESSING,
+                    'available_at': now + timedelta(seconds=self.lease_seconds),
+                    'claimed_at': now
+                },
+                '$inc': {'attempts': 1}
+            },
+            sort=[('available_at', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _renew_lease(self, event, done):
+        """
+        Renueva el plazo del evento cada tercio de `lease_seconds` hasta que
+        el manejador termine. Solo se renueva mientras la reclamación sea la
+        nuestra (mismo `claimed_at`).
+        """
+        interval = max(self.lease_seconds / 3.0, 1.0)
+        while not done.wait(interval):
+            try:
+                self.collection.update_one(
+                    {'_id': event['_id'], 'status': STATUS_PROCESSING, 'claimed_at': event['claimed_at']},
+                    {'$set': {'available_at': datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+                )
+            except Exception as e:
+                logger.warning(f"No se pudo renovar el plazo del webhook {event.get('action_id')}: {e}")
+
+    def _ack(self, event, result):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {'_id': event['_id']},
+            {'$set': {
+                'status': STATUS_DONE,
+                'result': result,
+                'processed_at': now,
+                'expire_at': now + timedelta(hours=self.retention_hours)
+            }}
+        )
+
+    def _nack(self, event, error, permanent=False):
+        now = datetime.utcnow()
+        if permanent or event.get('attempts', 1) >= self.max_attempts:
+            update = {
+                'status': STATUS_FAILED,
+                'error': error,
+                'processed_at': now,
+                'expire_at': now + timedelta(hours=self.retention_hours)
+            }
+            if permanent:
+                logger.error(f"Webhook {event.get('action_id')} descartado por un error no recuperable: {error}")
+            else:
+                logger.error(f"Webhook {event.get('action_id')} descartado tras {event.get('attempts')} intentos: {error}")
+        else:
+            # Reintento con espera exponencial
+            delay = min(2 ** event.get('attempts', 1), 300)
+            update = {
+                'status': STATUS_PENDING,
+                'error': error,
+                'available_at': now + timedelta(seconds=delay)
+            }
+            logger.warning(f"Webhook {event.get('action_id')} reintentará en {delay}s: {error}")
+        self.collection.update_one({'_id': event['_id']}, {'$set': update})
+
+    def _worker(self):
+        while self._running:
+            try:
+                event = self._claim()
+            except Exception as e:
+                logger.error(f"Error al reclamar eventos de la cola de webhooks: {e}")
+                time.sleep(self.poll_interval)
+                continue
+            if not event:
+                self._wakeup.wait(timeout=self.poll_interval)
+                self._wakeup.clear()
+                continue
+            done = threading.Event()
+            heartbeat = threading.Thread(target=self._renew_lease, args=(event, done), name='webhook-lease')
+            heartbeat.daemon = True
+            heartbeat.start()
+            try:
+                with self.app.app_context():
+                    result = self.handler(event['payload'])
+                done.set()
+                self._ack(event, result)
+            except Exception as e:
+                done.set()
+                logger.error(f"Error al procesar webhook {event.get('action_id')}: {e}")
+                import traceback
+                logger.error(traceback.format_exc())
+                try:
+                    self._nack(event, str(e), permanent=isinstance(e, self.permanent_errors))
+                except Exception as nack_error:
+                    logger.error(f"Error al reprogramar webhook {event.get('action_id')}: {nack_error}")
@@ -0,0 +1,96 @@
+"""
+Micro-benchmark del motor de comparación de tarjetas (app/services/card_diff.py)
+y del hash de contenido (app/models/card_hash.py).
+
+Simula un tablero de 10.000 tarjetas y mide:
+  - comparación de tarjetas sin cambios usando el hash de contenido
+  - comparación campo a campo de tarjetas sin cambios (sin hash)
+  - comparación de un tablero con un 1% de tarjetas modificadas
+  - cálculo de los hashes de contenido
+
+Uso (desde el directorio server):
+    python benchmarks/card_diff_benchmark.py [num_tarjetas]
+"""
+import copy
+import importlib.util
+import os
+import random
+import sys
+import time
+
+# Cargar los módulos directamente para no inicializar la aplicación Flask ni MongoDB
+APP_PATH = os.path.join(os.path.dirname(__file__), '..', 'app')
+
+def load_module(name, *path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(APP_PATH, *path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+card_diff = load_module('card_diff', 'services', 'card_diff.py')
+card_hash = load_module('card_hash', 'models', 'card_hash.py')
+
+def make_card(index):
+    return {
+        'id': f"card{index:020d}",
+        'name': f"Tarea número {index}",
+        'desc': "Descripción de ejemplo " * random.randint(1, 10),
+        'idList': f"list{index % 12:020d}",
+        'due': None if index % 3 else "2024-05-22T15:00:00.000Z",
+        'idMembers': [f"member{m:018d}" for m in random.sample(range(40), random.randint(0, 3))],
+        'labels': [{'id': f"label{l}", 'name': f"Etiqueta {l}"} for l in random.sample(range(8), random.randint(0, 2))],
+        'attachments': [{'id': f"att{index}-{a}", 'name': f"archivo{a}.pdf"} for a in range(random.randint(0, 2))],
+        'shortUrl': f"https://trello.com/c/{index}",
+        'dateLastActivity': "2024-05-22T15:00:00.000Z"
+    }
+
+def mutate(card):
+    card = copy.deepcopy(card)
+    choice = random.randint(0, 3)
+    if choice == 0:
+        card['name'] += " (editada)"
+    elif choice == 1:
+        card['idMembers'].append("memberNEW")
+    elif choice == 2:
+        card['labels'].append({'id': 'labelNEW', 'name': 'Urgente'})
+    else:
+        card['due'] = "2030-01-01T00:00:00.000Z"
+    return card
+
+def measure(label, func, repeat=5):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<45} {best * 1000:9.2f} ms")
+    return result
+
+def main():
+    num_cards = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    random.seed(42)
+    old_cards = [make_card(i) for i in range(num_cards)]
+    same_cards = [copy.deepcopy(card) for card in old_cards]
+    changed_cards = [mutate(card) if i % 100 == 0 else copy.deepcopy(card) for i, card in enumerate(old_cards)]
+
+    old_hashes = measure(f"content_hash x{num_cards}", lambda: [card_hash.content_hash(c) for c in old_cards])
+    same_hashes = [card_hash.content_hash(c) for c in same_cards]
+    changed_hashes = [card_hash.content_hash(c) for c in changed_cards]
+
+    def diff_with_hash(new_cards, new_hashes):
+        return sum(
+            len(card_diff.diff_cards(old, new, old_hash=oh, new_hash=nh))
+            for old, new, oh, nh in zip(old_cards, new_cards, old_hashes, new_hashes)
+        )
+
+    def diff_without_hash(new_cards):
+        return sum(len(card_diff.diff_cards(old, new)) for old, new in zip(old_cards, new_cards))
+
+    measure("sin cambios, con hash (cortocircuito)", lambda: diff_with_hash(same_cards, same_hashes))
+    measure("sin cambios, campo a campo", lambda: diff_without_hash(same_cards))
+    changes = measure("1% modificadas, con hash", lambda: diff_with_hash(changed_cards, changed_hashes))
+    print(f"Cambios detectados: {changes} en {num_cards // 100} tarjetas modificadas")
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
-from app import app
+from app import app, init_database
+from app.routes.webhook import start_webhook_workers
 import os
 
 if __name__ == '__main__':
@@ -11,5 +12,13 @@ if __name__ == '__main__':
     print(f"Modo debug: {debug}")
     print("Presiona CTRL+C para detener el servidor")
     
+    # Con el recargador de Flask este script se ejecuta en dos procesos; los
+    # índices y los trabajadores en segundo plano solo se preparan en el que
+    # atiende peticiones. Arrancar aquí los trabajadores solo adelanta el
+    # procesamiento de la cola pendiente: si no, arrancan con el primer webhook
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        init_database()
+        start_webhook_workers()
+    
     # Ejecutar la aplicación
     app.run(host=host, port=port, debug=debug) 
\ No newline at end of file
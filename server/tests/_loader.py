@@ -0,0 +1,25 @@
+"""
+Carga módulos de la aplicación directamente desde su fichero, como hace
+benchmarks/card_diff_benchmark.py, para no ejecutar app/__init__.py (que
+configura Flask y se conecta a MongoDB).
+"""
+import importlib.util
+import os
+import sys
+
+APP_PATH = os.path.join(os.path.dirname(__file__), '..', 'app')
+
+def load_app_module(dotted_name):
+    """
+    Carga `app.<paquete>.<módulo>` y lo registra en sys.modules con ese nombre,
+    para que los módulos que lo importan lo encuentren ya cargado
+    """
+    if dotted_name in sys.modules:
+        return sys.modules[dotted_name]
+    parts = dotted_name.split('.')[1:]
+    path = os.path.join(APP_PATH, *parts[:-1], parts[-1] + '.py')
+    spec = importlib.util.spec_from_file_location(dotted_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[dotted_name] = module
+    spec.loader.exec_module(module)
+    return module
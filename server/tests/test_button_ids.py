@@ -0,0 +1,44 @@
+import pytest
+
+from _loader import load_app_module
+
+button_ids = load_app_module('app.services.button_ids')
+
+SECRET = 'secreto-de-prueba'
+
+def test_roundtrip():
+    custom_id = button_ids.encode_button_id('5f1a2b3c4d5e6f7a8b9c0d1e', '123456789012345678', 'confirm', SECRET)
+    assert custom_id.startswith(button_ids.PREFIX + button_ids.SEPARATOR)
+    assert len(custom_id) <= button_ids.MAX_CUSTOM_ID_LENGTH
+    assert button_ids.decode_button_id(custom_id, SECRET) == {
+        'trello_card_id': '5f1a2b3c4d5e6f7a8b9c0d1e',
+        'user_id': '123456789012345678',
+        'action': 'confirm'
+    }
+
+def test_tampered_payload_is_rejected():
+    custom_id = button_ids.encode_button_id('card1', 'user1', 'confirm', SECRET)
+    tampered = custom_id.replace('user1', 'user2')
+    assert button_ids.decode_button_id(tampered, SECRET) is None
+
+def test_tampered_signature_is_rejected():
+    custom_id = button_ids.encode_button_id('card1', 'user1', 'confirm', SECRET)
+    payload, _, signature = custom_id.rpartition(button_ids.SEPARATOR)
+    forged = payload + button_ids.SEPARATOR + ('A' if signature[0] != 'A' else 'B') + signature[1:]
+    assert button_ids.decode_button_id(forged, SECRET) is None
+
+def test_other_secret_is_rejected():
+    custom_id = button_ids.encode_button_id('card1', 'user1', 'confirm', SECRET)
+    assert button_ids.decode_button_id(custom_id, 'otro-secreto') is None
+
+@pytest.mark.parametrize('custom_id', ['', None, 'a1b2c3d4-legacy-uuid', 't2d1:card1:user1:sin-firma'])
+def test_unsigned_ids_are_not_decoded(custom_id):
+    assert button_ids.decode_button_id(custom_id, SECRET) is None
+
+def test_separator_in_fields_is_refused():
+    with pytest.raises(ValueError):
+        button_ids.encode_button_id('card:1', 'user1', 'confirm', SECRET)
+
+def test_too_long_id_is_refused():
+    with pytest.raises(ValueError):
+        button_ids.encode_button_id('c' * 90, 'user1', 'confirm', SECRET)
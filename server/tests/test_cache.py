@@ -0,0 +1,64 @@
+import pytest
+
+from _loader import load_app_module
+
+cache_module = load_app_module('app.services.cache')
+LRUCache = cache_module.LRUCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', fake)
+    return fake
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    # Leer 'a' la convierte en la más reciente: se descarta 'b'
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+def test_entries_expire_after_ttl(clock):
+    cache = LRUCache(maxsize=10, ttl=30)
+    cache.set('a', 1)
+    clock.now += 29
+    assert cache.get('a') == 1
+    clock.now += 2
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+def test_ttl_can_be_overridden_per_entry(clock):
+    cache = LRUCache(maxsize=10, ttl=30)
+    cache.set('corta', 1, ttl=5)
+    cache.set('eterna', 2, ttl=None)
+    clock.now += 10
+    assert cache.get('corta') is None
+    clock.now += 10 ** 6
+    assert cache.get('eterna') == 2
+
+def test_none_values_are_cached():
+    cache = LRUCache()
+    cache.set('vacío', None)
+    assert 'vacío' in cache
+    assert cache.get('vacío', 'por defecto') is None
+
+def test_stats_count_hits_and_misses():
+    cache = LRUCache(maxsize=10)
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('b')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 1, 1)
+    assert stats['hit_ratio'] == 0.5
@@ -0,0 +1,72 @@
+from _loader import load_app_module
+
+card_diff = load_app_module('app.services.card_diff')
+card_hash = load_app_module('app.models.card_hash')
+
+def make_card(**overrides):
+    card = {
+        'id': 'card1',
+        'name': 'Tarea',
+        'desc': 'Descripción',
+        'idList': 'list1',
+        'due': None,
+        'idMembers': ['m1', 'm2'],
+        'labels': [{'id': 'l1', 'name': 'Urgente'}],
+        'attachments': [{'id': 'a1', 'name': 'plano.pdf'}]
+    }
+    card.update(overrides)
+    return card
+
+def fields(changes):
+    return {change.field: change for change in changes}
+
+def test_identical_cards_have_no_changes():
+    assert card_diff.diff_cards(make_card(), make_card()) is card_diff.NO_CHANGES
+
+def test_equal_hashes_short_circuit():
+    # Con hashes iguales no se comparan los campos
+    changes = card_diff.diff_cards(make_card(), make_card(name='Otra'), old_hash='h', new_hash='h')
+    assert changes is card_diff.NO_CHANGES
+
+def test_scalar_changes():
+    changes = fields(card_diff.diff_cards(make_card(), make_card(name='Nueva', idList='list2')))
+    assert set(changes) == {card_diff.FIELD_NAME, card_diff.FIELD_LIST}
+    assert (changes['name'].old, changes['name'].new) == ('Tarea', 'Nueva')
+    assert (changes['idList'].old, changes['idList'].new) == ('list1', 'list2')
+
+def test_set_changes():
+    new_card = make_card(
+        idMembers=['m2', 'm3'],
+        labels=[{'id': 'l2', 'name': 'Revisión'}],
+        attachments=[{'id': 'a1', 'name': 'plano.pdf'}, {'id': 'a2', 'name': 'foto.png'}]
+    )
+    changes = fields(card_diff.diff_cards(make_card(), new_card))
+    assert changes['idMembers'].added == ('m3',)
+    assert changes['idMembers'].removed == ('m1',)
+    assert changes['labels'].added == ('Revisión',)
+    assert changes['labels'].removed == ('Urgente',)
+    assert changes['attachments'].added == (('a2', 'foto.png'),)
+    assert changes['attachments'].removed == ()
+
+def test_fields_restricts_comparison():
+    changes = card_diff.diff_cards(make_card(), make_card(name='Nueva', idMembers=['m9']), fields=(card_diff.FIELD_MEMBERS,))
+    assert [change.field for change in changes] == [card_diff.FIELD_MEMBERS]
+
+def test_hash_ignores_order_and_duplicates():
+    reordered = make_card(
+        idMembers=['m2', 'm1'],
+        labels=[{'id': 'l1', 'name': 'Urgente'}, {'id': 'l1', 'name': 'Urgente'}]
+    )
+    assert card_hash.content_hash(make_card()) == card_hash.content_hash(reordered)
+
+def test_hash_changes_with_content():
+    assert card_hash.content_hash(make_card()) != card_hash.content_hash(make_card(desc='Otra descripción'))
+    assert card_hash.content_hash(make_card()) != card_hash.content_hash(make_card(due='2030-01-01T00:00:00.000Z'))
+
+def test_hash_is_versioned():
+    value = card_hash.content_hash(make_card())
+    assert value.startswith(f"{card_hash.HASH_VERSION}:")
+    assert card_hash.is_current_hash(value)
+    # Hash sin versión, como los calculados antes de versionar el algoritmo
+    assert not card_hash.is_current_hash(value.split(':', 1)[1])
+    assert not card_hash.is_current_hash(None)
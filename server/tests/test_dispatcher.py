@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from _loader import load_app_module
+
+dispatcher_module = load_app_module('app.discord.dispatcher')
+OutboundDispatcher = dispatcher_module.OutboundDispatcher
+
+class FakeGateway:
+    """
+    Gateway con un bucle de asyncio propio en un hilo, como el de Discord
+    """
+    def __init__(self, available=True):
+        self.available = available
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def start(self):
+        return self.available
+
+    async def wait_until_ready_async(self):
+        return True
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=1.0)
+
+@pytest.fixture
+def gateway():
+    gateway = FakeGateway()
+    yield gateway
+    gateway.close()
+
+def recording_job(sent, channel_id, message, result=True):
+    async def job():
+        sent.append((channel_id, message, time.monotonic()))
+        return result
+    return job
+
+def test_messages_of_a_channel_keep_their_order(gateway):
+    dispatcher = OutboundDispatcher(gateway, rate=100, period=1.0)
+    sent = []
+    handles = [dispatcher.enqueue('c1', recording_job(sent, 'c1', i)) for i in range(10)]
+
+    assert [handle.result(timeout=2.0) for handle in handles] == [True] * 10
+    assert [message for _, message, _ in sent] == list(range(10))
+    assert dispatcher.stats()['sent'] == 10
+
+def test_channel_is_paced_to_its_rate_limit(gateway):
+    dispatcher = OutboundDispatcher(gateway, rate=2, period=0.2)
+    sent = []
+    handles = [dispatcher.enqueue('c1', recording_job(sent, 'c1', i)) for i in range(4)]
+    for handle in handles:
+        handle.result(timeout=2.0)
+
+    times = [sent_at for _, _, sent_at in sent]
+    # El tercer y el cuarto envío esperan a que se libere la ventana
+    assert times[2] - times[0] >= 0.19
+    assert times[3] - times[1] >= 0.19
+
+def test_channels_are_paced_independently(gateway):
+    dispatcher = OutboundDispatcher(gateway, rate=1, period=0.5)
+    sent = []
+    slow = [dispatcher.enqueue('c1', recording_job(sent, 'c1', i)) for i in range(2)]
+    other = dispatcher.enqueue('c2', recording_job(sent, 'c2', 0))
+
+    other.result(timeout=2.0)
+    for handle in slow:
+        handle.result(timeout=2.0)
+    first_c1 = next(sent_at for channel, _, sent_at in sent if channel == 'c1')
+    c2_sent_at = next(sent_at for channel, _, sent_at in sent if channel == 'c2')
+    assert c2_sent_at - first_c1 < 0.25
+
+def test_failures_are_reported_on_the_handle(gateway):
+    dispatcher = OutboundDispatcher(gateway)
+
+    async def failing_job():
+        raise RuntimeError('canal no encontrado')
+
+    sent = []
+    failed = dispatcher.enqueue('c1', failing_job)
+    rejected = dispatcher.enqueue('c1', recording_job(sent, 'c1', 'x', result=False))
+    with pytest.raises(RuntimeError):
+        failed.result(timeout=2.0)
+    assert rejected.result(timeout=2.0) is False
+    assert dispatcher.stats()['failed'] == 2
+
+def test_unavailable_gateway_fails_immediately():
+    gateway = FakeGateway(available=False)
+    try:
+        handle = OutboundDispatcher(gateway).enqueue('c1', recording_job([], 'c1', 'x'))
+        with pytest.raises(RuntimeError):
+            handle.result(timeout=0)
+    finally:
+        gateway.close()
@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from _loader import load_app_module
+
+# grid_search importa place_accumulator: se carga antes desde su fichero
+load_app_module('app.services.place_accumulator')
+grid_search = load_app_module('app.services.grid_search')
+
+def place(place_id):
+    return {'place_id': place_id, 'name': place_id}
+
+def test_grid_search_caps_results_at_max_results():
+    # Cada punto devuelve 20 lugares propios y 5 compartidos con el resto
+    counter = iter(range(10 ** 6))
+
+    def fetch_page(location, radius, page_token):
+        own = [place(f"{location}-{next(counter)}") for _ in range(20)]
+        shared = [place(f"compartido-{i}") for i in range(5)]
+        return own + shared, None
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        search = grid_search.GridSearch(fetch_page, executor, workers=4, max_results=50, max_depth=0)
+        results = search.run(40.4168, -3.7038, 3000)
+
+    ids = [p['place_id'] for p in results]
+    assert len(results) == 50
+    assert len(set(ids)) == len(ids)
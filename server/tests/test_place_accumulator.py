@@ -0,0 +1,33 @@
+from _loader import load_app_module
+
+place_accumulator = load_app_module('app.services.place_accumulator')
+PlaceAccumulator = place_accumulator.PlaceAccumulator
+
+def place(place_id, name=None):
+    return {'place_id': place_id, 'name': name or place_id}
+
+def test_deduplicates_by_place_id_keeping_first():
+    places = PlaceAccumulator([place('a', 'primero'), place('b')])
+    assert places.add(place('a', 'segundo')) is False
+    assert places.add(place('c')) is True
+    assert [p['place_id'] for p in places.results()] == ['a', 'b', 'c']
+    assert places.results()[0]['name'] == 'primero'
+    assert 'a' in places and 'z' not in places
+
+def test_places_without_id_are_ignored():
+    places = PlaceAccumulator()
+    assert places.add({'name': 'sin id'}) is False
+    assert places.add({'place_id': None}) is False
+    assert len(places) == 0
+
+def test_extend_returns_only_new_places():
+    places = PlaceAccumulator([place('a')])
+    new = places.extend([place('a'), place('b'), place('b'), place('c')])
+    assert [p['place_id'] for p in new] == ['b', 'c']
+    assert len(places) == 3
+
+def test_results_limit():
+    places = PlaceAccumulator([place(str(i)) for i in range(10)])
+    assert len(places.results(4)) == 4
+    assert len(places.results()) == 10
+    assert len(places.results(None)) == 10
@@ -0,0 +1,88 @@
+import contextlib
+import threading
+import time
+
+from bson.objectid import ObjectId
+
+from _loader import load_app_module
+
+# polling_scheduler importa el modelo Integration: se carga antes desde su fichero
+load_app_module('app.models.integration')
+polling_scheduler = load_app_module('app.services.polling_scheduler')
+PollingScheduler = polling_scheduler.PollingScheduler
+
+INTEGRATION_ID = ObjectId('64b000000000000000000001')
+
+class FakeIntegrations:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        return [doc for doc in self.docs if doc.get('active')]
+
+    def find_one(self, query):
+        return next((doc for doc in self.docs if doc['_id'] == query['_id']), None)
+
+class FakeDb:
+    def __init__(self, docs):
+        self.integrations = FakeIntegrations(docs)
+
+class FakeApp:
+    def __init__(self, docs):
+        self.config = {'MONGO_DB': FakeDb(docs)}
+
+    def app_context(self):
+        return contextlib.nullcontext()
+
+def make_scheduler(poll_fn, polling_interval=0):
+    docs = [{'_id': INTEGRATION_ID, 'trello_board_id': 'board1', 'polling_interval': polling_interval, 'active': True}]
+    return PollingScheduler(FakeApp(docs), poll_fn, max_workers=1, refresh_interval=60, min_interval=0, jitter=0)
+
+def test_polls_active_integrations():
+    polled = threading.Event()
+    boards = []
+
+    def poll(integration):
+        boards.append(integration['trello_board_id'])
+        polled.set()
+
+    scheduler = make_scheduler(poll)
+    scheduler.start()
+    try:
+        assert polled.wait(2.0)
+    finally:
+        scheduler.stop()
+    assert boards[0] == 'board1'
+
+def test_restart_stops_the_previous_scheduler_thread():
+    scheduler = make_scheduler(lambda integration: None, polling_interval=3600)
+    scheduler.start()
+    first_thread = scheduler._thread
+    scheduler.stop()
+    scheduler.start()
+    try:
+        first_thread.join(timeout=2.0)
+        assert not first_thread.is_alive()
+        assert scheduler._thread.is_alive()
+    finally:
+        scheduler.stop()
+
+def test_stale_generation_does_not_touch_the_schedule():
+    scheduler = make_scheduler(lambda integration: None, polling_interval=3600)
+    scheduler.start()
+    stale_generation = scheduler._generation
+    scheduler.stop()
+    scheduler.start()
+    try:
+        # Esperar a que el hilo nuevo cargue su agenda
+        deadline = time.monotonic() + 2.0
+        while not scheduler._integrations and time.monotonic() < deadline:
+            time.sleep(0.01)
+        heap = list(scheduler._heap)
+        with scheduler._lock:
+            scheduler._integrations = {}
+        scheduler._load_integrations(stale_generation)
+        assert scheduler._integrations == {}
+        assert scheduler._heap == heap
+    finally:
+        scheduler.stop()
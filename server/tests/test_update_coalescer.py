@@ -0,0 +1,92 @@
+import contextlib
+import threading
+
+from _loader import load_app_module
+
+# update_coalescer importa card_diff: se carga antes desde su fichero
+load_app_module('app.services.card_diff')
+update_coalescer = load_app_module('app.services.update_coalescer')
+UpdateCoalescer = update_coalescer.UpdateCoalescer
+
+class FakeApp:
+    def app_context(self):
+        return contextlib.nullcontext()
+
+class Recorder:
+    """
+    Registra las notificaciones y las llamadas a on_done
+    """
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.flushed = []
+        self.done = []
+        self.finished = threading.Event()
+
+    def flush(self, old_card, new_card):
+        if self.fail:
+            raise RuntimeError('Discord no responde')
+        self.flushed.append((old_card, new_card))
+
+    def on_done(self, card_id, integration_id):
+        self.done.append((card_id, integration_id))
+        self.finished.set()
+
+def card(name, id_list='list1'):
+    return {'id': 'card1', 'name': name, 'idList': id_list}
+
+def make_coalescer(recorder, window_seconds=0.05):
+    return UpdateCoalescer(FakeApp(), recorder.flush, window_seconds=window_seconds, on_done=recorder.on_done)
+
+def test_burst_is_notified_once_with_first_and_last_versions():
+    recorder = Recorder()
+    coalescer = make_coalescer(recorder)
+    coalescer.add('card1', card('v1'), card('v2'), 'integration1')
+    coalescer.add('card1', card('v2'), card('v3'), 'integration1')
+    coalescer.add('card1', card('v3'), card('v4', 'list2'), 'integration1')
+    assert coalescer.is_pending('card1')
+
+    assert recorder.finished.wait(2.0)
+    assert recorder.flushed == [(card('v1'), card('v4', 'list2'))]
+    assert recorder.done == [('card1', 'integration1')]
+    assert coalescer.stats()['events'] == 3
+    assert coalescer.stats()['flushed'] == 1
+
+def test_reverted_changes_are_not_notified_but_are_done():
+    recorder = Recorder()
+    coalescer = make_coalescer(recorder)
+    coalescer.add('card1', card('v1'), card('v2'), 'integration1')
+    coalescer.add('card1', card('v2'), card('v1'), 'integration1')
+
+    assert recorder.finished.wait(2.0)
+    assert recorder.flushed == []
+    assert recorder.done == [('card1', 'integration1')]
+    assert coalescer.stats()['reverted'] == 1
+
+def test_failed_notification_is_not_marked_done():
+    recorder = Recorder(fail=True)
+    coalescer = make_coalescer(recorder, window_seconds=0)
+    coalescer.add('card1', card('v1'), card('v2'), 'integration1')
+
+    # Sin on_done la actualización sigue persistida y se recupera más tarde
+    assert recorder.done == []
+    assert not coalescer.is_pending('card1')
+
+def test_zero_window_notifies_immediately():
+    recorder = Recorder()
+    coalescer = make_coalescer(recorder, window_seconds=0)
+    coalescer.add('card1', card('v1'), card('v2'), 'integration1')
+
+    assert recorder.flushed == [(card('v1'), card('v2'))]
+    assert recorder.done == [('card1', 'integration1')]
+
+def test_flush_all_notifies_open_windows():
+    recorder = Recorder()
+    coalescer = make_coalescer(recorder, window_seconds=60)
+    coalescer.add('card1', card('v1'), card('v2'), 'integration1')
+    coalescer.add('card2', {'id': 'card2', 'name': 'a'}, {'id': 'card2', 'name': 'b'}, 'integration1')
+
+    coalescer.flush_all()
+    assert len(recorder.flushed) == 2
+    assert sorted(recorder.done) == [('card1', 'integration1'), ('card2', 'integration1')]
+    assert not coalescer.is_pending('card1')
+    assert coalescer.stats()['pending'] == 0
@@ -0,0 +1,228 @@
+import contextlib
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from _loader import load_app_module
+
+webhook_queue = load_app_module('app.services.webhook_queue')
+WebhookQueue = webhook_queue.WebhookQueue
+
+class FakeCollection:
+    """
+    Colección en memoria con lo que usa WebhookQueue: igualdad, $in y $lte en
+    los filtros, $set e $inc en las actualizaciones
+    """
+    def __init__(self):
+        self.docs = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _matches(doc, query):
+        for key, expected in query.items():
+            value = doc.get(key)
+            if isinstance(expected, dict):
+                if '$in' in expected and value not in expected['$in']:
+                    return False
+                if '$lte' in expected and not (value is not None and value <= expected['$lte']):
+                    return False
+            elif value != expected:
+                return False
+        return True
+
+    @staticmethod
+    def _apply(doc, update):
+        doc.update(update.get('$set', {}))
+        for key, amount in update.get('$inc', {}).items():
+            doc[key] = doc.get(key, 0) + amount
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def insert_one(self, doc):
+        with self._lock:
+            doc = dict(doc, _id=next(self._ids))
+            self.docs.append(doc)
+            return type('InsertOneResult', (), {'inserted_id': doc['_id']})()
+
+    def find_one(self, query):
+        with self._lock:
+            return next((dict(doc) for doc in self.docs if self._matches(doc, query)), None)
+
+    def find_one_and_update(self, query, update, sort=None, return_document=None):
+        with self._lock:
+            matches = [doc for doc in self.docs if self._matches(doc, query)]
+            if sort:
+                key = sort[0][0]
+                matches.sort(key=lambda doc: doc[key])
+            if not matches:
+                return None
+            self._apply(matches[0], update)
+            return dict(matches[0])
+
+    def update_one(self, query, update):
+        with self._lock:
+            for doc in self.docs:
+                if self._matches(doc, query):
+                    self._apply(doc, update)
+                    return
+
+class FakeApp:
+    def __init__(self, collection):
+        self.config = {'MONGO_DB': {'webhook_events': collection}}
+
+    def app_context(self):
+        return contextlib.nullcontext()
+
+class FakeDone:
+    """
+    Sustituye al threading.Event del latido: deja pasar `beats` renovaciones
+    """
+    def __init__(self, beats):
+        self.beats = beats
+
+    def wait(self, timeout):
+        self.beats -= 1
+        return self.beats < 0
+
+@pytest.fixture
+def collection():
+    return FakeCollection()
+
+def make_queue(collection, handler=lambda payload: 'ok', **kwargs):
+    kwargs.setdefault('workers', 1)
+    kwargs.setdefault('poll_interval', 0.01)
+    return WebhookQueue(FakeApp(collection), handler, **kwargs)
+
+def enqueue_without_workers(queue, monkeypatch, action_id='a1'):
+    monkeypatch.setattr(queue, 'start', lambda: False)
+    return queue.enqueue({'action': {'id': action_id, 'type': 'updateCard'}})
+
+def wait_for_status(collection, event_id, status, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        event = collection.find_one({'_id': event_id})
+        if event['status'] == status:
+            return event
+        time.sleep(0.01)
+    raise AssertionError(f"El evento no llegó a {status}: {collection.find_one({'_id': event_id})}")
+
+def test_claim_leases_the_event(collection, monkeypatch):
+    queue = make_queue(collection, lease_seconds=60)
+    event_id = enqueue_without_workers(queue, monkeypatch)
+
+    event = queue._claim()
+    assert event['_id'] == event_id
+    assert event['status'] == webhook_queue.STATUS_PROCESSING
+    assert event['attempts'] == 1
+    assert event['available_at'] - event['claimed_at'] == timedelta(seconds=60)
+    # Mientras dura el plazo nadie más puede reclamarlo
+    assert queue._claim() is None
+
+def test_expired_lease_is_claimed_again(collection, monkeypatch):
+    queue = make_queue(collection)
+    event_id = enqueue_without_workers(queue, monkeypatch)
+    queue._claim()
+    collection.update_one({'_id': event_id}, {'$set': {'available_at': datetime.utcnow() - timedelta(seconds=1)}})
+
+    event = queue._claim()
+    assert event['_id'] == event_id
+    assert event['attempts'] == 2
+
+def test_renew_lease_extends_the_current_claim(collection, monkeypatch):
+    queue = make_queue(collection, lease_seconds=60)
+    enqueue_without_workers(queue, monkeypatch)
+    event = queue._claim()
+    collection.update_one({'_id': event['_id']}, {'$set': {'available_at': event['claimed_at']}})
+
+    queue._renew_lease(event, FakeDone(beats=1))
+    renewed = collection.find_one({'_id': event['_id']})
+    assert renewed['available_at'] > datetime.utcnow() + timedelta(seconds=50)
+
+def test_renew_lease_ignores_a_claim_taken_by_another_worker(collection, monkeypatch):
+    queue = make_queue(collection, lease_seconds=60)
+    enqueue_without_workers(queue, monkeypatch)
+    event = queue._claim()
+    other_claim = event['claimed_at'] + timedelta(seconds=1)
+    collection.update_one({'_id': event['_id']}, {'$set': {'claimed_at': other_claim, 'available_at': other_claim}})
+
+    queue._renew_lease(event, FakeDone(beats=1))
+    assert collection.find_one({'_id': event['_id']})['available_at'] == other_claim
+
+def test_nack_retries_with_backoff(collection, monkeypatch):
+    queue = make_queue(collection, max_attempts=3)
+    enqueue_without_workers(queue, monkeypatch)
+    event = queue._claim()
+
+    queue._nack(event, 'timeout')
+    retried = collection.find_one({'_id': event['_id']})
+    assert retried['status'] == webhook_queue.STATUS_PENDING
+    assert retried['error'] == 'timeout'
+    assert retried['available_at'] > datetime.utcnow() + timedelta(seconds=1)
+    assert 'expire_at' not in retried
+
+def test_nack_fails_after_max_attempts(collection, monkeypatch):
+    queue = make_queue(collection, max_attempts=2)
+    event_id = enqueue_without_workers(queue, monkeypatch)
+    collection.update_one({'_id': event_id}, {'$set': {'attempts': 1}})
+    event = queue._claim()
+
+    queue._nack(event, 'timeout')
+    failed = collection.find_one({'_id': event_id})
+    assert failed['status'] == webhook_queue.STATUS_FAILED
+    assert 'expire_at' in failed
+
+def test_permanent_nack_fails_on_first_attempt(collection, monkeypatch):
+    queue = make_queue(collection, max_attempts=5)
+    event_id = enqueue_without_workers(queue, monkeypatch)
+    event = queue._claim()
+
+    queue._nack(event, 'card not found', permanent=True)
+    assert collection.find_one({'_id': event_id})['status'] == webhook_queue.STATUS_FAILED
+
+def test_enqueue_starts_the_workers_once(collection):
+    payloads = []
+    queue = make_queue(collection, handler=payloads.append, workers=2)
+    try:
+        first = queue.enqueue({'action': {'id': 'a1'}})
+        second = queue.enqueue({'action': {'id': 'a2'}})
+        wait_for_status(collection, first, webhook_queue.STATUS_DONE)
+        wait_for_status(collection, second, webhook_queue.STATUS_DONE)
+        assert len(queue._threads) == 2
+        assert sorted(p['action']['id'] for p in payloads) == ['a1', 'a2']
+    finally:
+        queue.stop()
+
+@pytest.mark.parametrize('error', [KeyError('id'), TypeError('bad'), webhook_queue.PermanentWebhookError('404')])
+def test_worker_fails_permanent_errors_without_retrying(collection, error):
+    def handler(payload):
+        raise error
+
+    queue = make_queue(collection, handler=handler, max_attempts=5)
+    try:
+        event_id = queue.enqueue({'action': {'id': 'a1'}})
+        event = wait_for_status(collection, event_id, webhook_queue.STATUS_FAILED)
+        assert event['attempts'] == 1
+    finally:
+        queue.stop()
+
+def test_worker_retries_transient_errors(collection):
+    def handler(payload):
+        raise RuntimeError('Trello no responde')
+
+    queue = make_queue(collection, handler=handler, max_attempts=5)
+    try:
+        event_id = queue.enqueue({'action': {'id': 'a1'}})
+        deadline = time.monotonic() + 2.0
+        while collection.find_one({'_id': event_id}).get('error') is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        queue.stop()
+    event = collection.find_one({'_id': event_id})
+    assert event['status'] == webhook_queue.STATUS_PENDING
+    assert event['attempts'] == 1
+    assert event['error'] == 'Trello no responde'